@@ -0,0 +1,7 @@
+"""Throughput benchmarks for mailcombine/mailcore.
+
+Run from the repository root:
+
+    python -m benchmarks.corpus DIR ...        generate a deterministic corpus
+    python -m benchmarks.suite --out run.json  time every pipeline stage on it
+"""
@@ -0,0 +1,430 @@
+"""Deterministic synthetic mail corpus for the benchmarks.
+
+    python -m benchmarks.corpus /tmp/corpus --messages 2000 --seed 1
+
+The same ``--seed`` and options always produce byte-identical files, so two commits can be
+measured on exactly the same input. The corpus has three parts:
+
+* ``eml/``: messages whose MIME structure ranges from a single text part to multipart
+  trees with a forwarded ``message/rfc822`` and attachments. Attachment sizes run from
+  empty up to ``--max-attachment-kb``.
+* ``msg/``: the same kind of content as Outlook .msg files, written by a small Compound
+  File Binary writer, so no Outlook is needed.
+* ``readpst/``: a nested folder tree of numbered ``.eml`` files, laid out the way
+  ``readpst -r -e`` writes them.
+
+A ``manifest.json`` records the options plus file and byte counts.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import struct
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+MANIFEST = "manifest.json"
+
+_WORDS = (
+    "account agenda approval budget client contract deadline delivery draft estimate follow invoice "
+    "meeting minutes network office payment project quarter report review schedule shipment status "
+    "summary support team update vendor warehouse weekly"
+).split()
+_NAMES = ["Alice Archer", "Bob Baker", "Carol Chen", "Dan Diaz", "Erin Evans", "Frank Fox", "Grace Gill", "Hal Hunt"]
+_ATTACHMENT_TYPES = [("report", "pdf", "application/pdf"), ("photo", "jpg", "image/jpeg"), ("data", "csv", "text/csv"), ("notes", "txt", "text/plain")]
+_READPST_FOLDERS = ["Inbox", "Inbox/Projects", "Inbox/Projects/Archive", "Sent Items", "Deleted Items"]
+_EPOCH = datetime(2023, 1, 2, 9, 0, tzinfo=timezone.utc)
+
+
+def _address(name: str) -> str:
+    return name.split()[0].lower() + "@example.com"
+
+
+class _Spec:
+    """Everything about one generated message, drawn from the seeded RNG."""
+
+    def __init__(self, rng: random.Random, index: int, max_attachment_kb: int, body_kb: int):
+        self.index = index
+        self.sender = rng.choice(_NAMES)
+        self.to = rng.sample(_NAMES, rng.randint(1, 3))
+        self.cc = rng.sample(_NAMES, rng.randint(0, 2))
+        self.subject = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 8))).capitalize() + f" #{index}"
+        self.date = _EPOCH + timedelta(minutes=rng.randint(0, 525600))
+        self.message_id = f"<bench-{index}-{rng.getrandbits(32):08x}@example.com>"
+        words = [rng.choice(_WORDS) for _ in range(max(8, rng.randint(body_kb * 100, body_kb * 250)))]
+        self.paragraphs = [" ".join(words[i:i + 60]).capitalize() + "." for i in range(0, len(words), 60)]
+        self.html = rng.random() < 0.6
+        # 0: single part, 1: alternative, 2: mixed with attachments, 3: mixed + forwarded message
+        self.depth = rng.choice((0, 1, 1, 2, 2, 2, 3))
+        self.attachments: List[Tuple[str, str, bytes]] = []
+        if self.depth >= 2:
+            for n in range(rng.randint(1, 3)):
+                stem, ext, ctype = rng.choice(_ATTACHMENT_TYPES)
+                kb = rng.choice((0, 1, 4, 16, 64, max_attachment_kb))
+                size = min(kb, max_attachment_kb) * 1024 + rng.randint(0, 1023)
+                self.attachments.append((f"{stem}{index}_{n}.{ext}", ctype, rng.randbytes(size)))
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(self.paragraphs) + "\n"
+
+    @property
+    def html_body(self) -> str:
+        paras = "".join(f"<p>{p}</p>" for p in self.paragraphs)
+        return f"<html><head><style>p {{ margin: 0 }}</style></head><body><table><tr><td>{paras}</td></tr></table></body></html>"
+
+
+# ---- .eml ----
+def _eml(spec: _Spec) -> bytes:
+    msg = EmailMessage()
+    msg["From"] = f"{spec.sender} <{_address(spec.sender)}>"
+    msg["To"] = ", ".join(f"{n} <{_address(n)}>" for n in spec.to)
+    if spec.cc:
+        msg["Cc"] = ", ".join(f"{n} <{_address(n)}>" for n in spec.cc)
+    msg["Subject"] = spec.subject
+    msg["Date"] = format_datetime(spec.date)
+    msg["Message-ID"] = spec.message_id
+    msg.set_content(spec.text)
+    if spec.depth >= 1 and spec.html:
+        msg.add_alternative(spec.html_body, subtype="html")
+    if spec.depth == 3:
+        inner = EmailMessage()
+        inner["From"] = f"{spec.to[0]} <{_address(spec.to[0])}>"
+        inner["Subject"] = "Original: " + spec.subject
+        inner["Date"] = format_datetime(spec.date - timedelta(days=1))
+        inner.set_content(spec.paragraphs[0] + "\n")
+        msg.add_attachment(inner)
+    for name, ctype, data in spec.attachments:
+        maintype, subtype = ctype.split("/")
+        msg.add_attachment(data, maintype=maintype, subtype=subtype, filename=name)
+    # The default boundaries are random; fixed ones keep the output reproducible.
+    for n, part in enumerate(msg.walk()):
+        if part.is_multipart():
+            part.set_boundary(f"bench-{spec.index}-{n}")
+    return msg.as_bytes()
+
+
+# ---- .msg (Compound File Binary) ----
+_FREESECT = 0xFFFFFFFF
+_ENDOFCHAIN = 0xFFFFFFFE
+_FATSECT = 0xFFFFFFFD
+_NOSTREAM = 0xFFFFFFFF
+_SECTOR = 512
+_MINI_SECTOR = 64
+_MINI_CUTOFF = 4096
+
+_Tree = Dict[str, Union[bytes, "_Tree"]]
+
+
+class _Entry:
+    def __init__(self, name: str, kind: int, data: bytes = b""):
+        self.name = name
+        self.kind = kind  # 1 storage, 2 stream, 5 root
+        self.data = data
+        self.children: List["_Entry"] = []
+        self.left = self.right = self.child = _NOSTREAM
+        self.start = _ENDOFCHAIN
+        self.sid = 0
+
+
+def _sibling_tree(entries: List[_Entry]) -> int:
+    """Link ``entries`` into a balanced binary tree in CFB name order; returns the root id."""
+    if not entries:
+        return _NOSTREAM
+    mid = len(entries) // 2
+    node = entries[mid]
+    node.left = _sibling_tree(entries[:mid])
+    node.right = _sibling_tree(entries[mid + 1:])
+    return node.sid
+
+
+def _chain(fat: List[int], start: int, count: int) -> None:
+    for i in range(count):
+        fat[start + i] = start + i + 1 if i + 1 < count else _ENDOFCHAIN
+
+
+def build_cfb(tree: _Tree) -> bytes:
+    """Serialize nested ``{name: bytes | dict}`` as a version 3 compound file."""
+    root = _Entry("Root Entry", 5)
+    order = [root]
+
+    def add(parent: _Entry, node: _Tree) -> None:
+        for name, value in node.items():
+            entry = _Entry(name, 2, value) if isinstance(value, bytes) else _Entry(name, 1)
+            entry.sid = len(order)
+            order.append(entry)
+            parent.children.append(entry)
+            if not isinstance(value, bytes):
+                add(entry, value)
+
+    add(root, tree)
+    for entry in order:
+        entry.children.sort(key=lambda e: (len(e.name), e.name.upper()))
+        entry.child = _sibling_tree(entry.children)
+
+    # Small streams live in the mini stream (64-byte sectors), the rest in regular sectors.
+    mini = bytearray()
+    minifat: List[int] = []
+    big: List[_Entry] = []
+    for entry in order:
+        if entry.kind != 2 or not entry.data:
+            continue
+        if len(entry.data) < _MINI_CUTOFF:
+            entry.start = len(minifat)
+            count = -(-len(entry.data) // _MINI_SECTOR)
+            minifat.extend(range(entry.start + 1, entry.start + count))
+            minifat.append(_ENDOFCHAIN)
+            mini += entry.data + b"\0" * (count * _MINI_SECTOR - len(entry.data))
+        else:
+            big.append(entry)
+
+    def sectors(n: int) -> int:
+        return -(-n // _SECTOR)
+
+    dir_sectors = sectors(len(order) * 128)
+    minifat_sectors = sectors(len(minifat) * 4)
+    mini_sectors = sectors(len(mini))
+    data_sectors = dir_sectors + minifat_sectors + mini_sectors + sum(sectors(len(e.data)) for e in big)
+    fat_sectors = 1
+    while fat_sectors * (_SECTOR // 4) < data_sectors + fat_sectors:
+        fat_sectors += 1
+    if fat_sectors > 109:
+        raise ValueError("Compound file too large for a header-only DIFAT")
+
+    fat = [_FREESECT] * (fat_sectors * _SECTOR // 4)
+    for i in range(fat_sectors):
+        fat[i] = _FATSECT
+    nxt = fat_sectors
+    dir_start = nxt
+    _chain(fat, nxt, dir_sectors)
+    nxt += dir_sectors
+    minifat_start = nxt if minifat_sectors else _ENDOFCHAIN
+    _chain(fat, nxt, minifat_sectors)
+    nxt += minifat_sectors
+    root.start = nxt if mini_sectors else _ENDOFCHAIN
+    root.data = bytes(mini)
+    _chain(fat, nxt, mini_sectors)
+    nxt += mini_sectors
+    for entry in big:
+        entry.start = nxt
+        count = sectors(len(entry.data))
+        _chain(fat, nxt, count)
+        nxt += count
+
+    header = bytearray(_SECTOR)
+    header[0:8] = bytes.fromhex("D0CF11E0A1B11AE1")
+    struct.pack_into("<HHHHH", header, 24, 0x003E, 0x0003, 0xFFFE, 9, 6)
+    struct.pack_into(
+        "<IIIIIIII", header, 40, 0, fat_sectors, dir_start, 0, _MINI_CUTOFF, minifat_start, minifat_sectors, _ENDOFCHAIN
+    )
+    struct.pack_into("<I", header, 72, 0)
+    difat = list(range(fat_sectors)) + [_FREESECT] * (109 - fat_sectors)
+    struct.pack_into("<109I", header, 76, *difat)
+
+    directory = bytearray()
+    for entry in order:
+        name = entry.name.encode("utf-16-le") + b"\0\0"
+        directory += struct.pack(
+            "<64sHBBIII16sIQQIQ",
+            name,
+            len(name),
+            entry.kind,
+            1,  # black
+            entry.left,
+            entry.right,
+            entry.child,
+            b"\0" * 16,
+            0,
+            0,
+            0,
+            entry.start if (entry.data or entry.kind == 5) else _ENDOFCHAIN,
+            len(entry.data),
+        )
+    directory += b"\0" * (dir_sectors * _SECTOR - len(directory))
+    # Unused directory slots must be marked empty (no siblings/child).
+    for offset in range(len(order) * 128, len(directory), 128):
+        struct.pack_into("<III", directory, offset + 68, _NOSTREAM, _NOSTREAM, _NOSTREAM)
+
+    out = bytearray(header)
+    out += struct.pack(f"<{len(fat)}I", *fat)
+    out += directory
+    out += struct.pack(f"<{len(minifat)}I", *minifat) + b"\xff" * (minifat_sectors * _SECTOR - len(minifat) * 4)
+    out += mini + b"\0" * (mini_sectors * _SECTOR - len(mini))
+    for entry in big:
+        out += entry.data + b"\0" * (sectors(len(entry.data)) * _SECTOR - len(entry.data))
+    return bytes(out)
+
+
+_PT_LONG = 0x0003
+_PT_SYSTIME = 0x0040
+_PT_UNICODE = 0x001F
+_PT_BINARY = 0x0102
+_FILETIME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+_Prop = Tuple[int, int, Union[int, str, bytes, datetime]]
+
+
+def _properties(props: List[_Prop], header: bytes) -> _Tree:
+    """A ``__properties_version1.0`` stream plus one ``__substg1.0_`` stream per variable-size value."""
+    node: _Tree = {}
+    stream = bytearray(header)
+    for prop_id, prop_type, value in props:
+        tag = (prop_id << 16) | prop_type
+        if prop_type == _PT_LONG:
+            stream += struct.pack("<IIiI", tag, 6, value, 0)
+        elif prop_type == _PT_SYSTIME:
+            ticks = int((value - _FILETIME_EPOCH).total_seconds()) * 10_000_000
+            stream += struct.pack("<IIQ", tag, 6, ticks)
+        else:
+            data = value.encode("utf-16-le") if prop_type == _PT_UNICODE else value
+            node[f"__substg1.0_{tag:08X}"] = data
+            # A string's size counts its terminator, which the stream itself leaves out.
+            stream += struct.pack("<IIII", tag, 6, len(data) + (2 if prop_type == _PT_UNICODE else 0), 0)
+    node["__properties_version1.0"] = bytes(stream)
+    return node
+
+
+def _transport_headers(spec: _Spec) -> str:
+    lines = [
+        f"From: {spec.sender} <{_address(spec.sender)}>",
+        "To: " + ", ".join(f"{n} <{_address(n)}>" for n in spec.to),
+        f"Subject: {spec.subject}",
+        f"Date: {format_datetime(spec.date)}",
+        f"Message-ID: {spec.message_id}",
+        "MIME-Version: 1.0",
+    ]
+    if spec.cc:
+        lines.insert(2, "Cc: " + ", ".join(f"{n} <{_address(n)}>" for n in spec.cc))
+    return "\r\n".join(lines) + "\r\n\r\n"
+
+
+def _msg(spec: _Spec) -> bytes:
+    recipients = [(n, 1) for n in spec.to] + [(n, 2) for n in spec.cc]
+    props: List[_Prop] = [
+        (0x001A, _PT_UNICODE, "IPM.Note"),
+        (0x0037, _PT_UNICODE, spec.subject),
+        (0x0039, _PT_SYSTIME, spec.date),
+        (0x0E06, _PT_SYSTIME, spec.date),
+        (0x007D, _PT_UNICODE, _transport_headers(spec)),
+        (0x0C1A, _PT_UNICODE, spec.sender),
+        (0x0C1F, _PT_UNICODE, _address(spec.sender)),
+        (0x5D01, _PT_UNICODE, _address(spec.sender)),
+        (0x0E04, _PT_UNICODE, "; ".join(spec.to)),
+        (0x0E03, _PT_UNICODE, "; ".join(spec.cc)),
+        (0x1035, _PT_UNICODE, spec.message_id),
+        (0x1000, _PT_UNICODE, spec.text),
+    ]
+    if spec.html:
+        props.append((0x1013, _PT_BINARY, spec.html_body.encode("utf-8")))
+    header = struct.pack("<8xIIII8x", len(recipients), len(spec.attachments), len(recipients), len(spec.attachments))
+    tree = _properties(props, header)
+    tree["__nameid_version1.0"] = {"__substg1.0_00020102": b"", "__substg1.0_00030102": b"", "__substg1.0_00040102": b""}
+    for i, (name, kind) in enumerate(recipients):
+        tree[f"__recip_version1.0_#{i:08X}"] = _properties(
+            [
+                (0x3001, _PT_UNICODE, name),
+                (0x3002, _PT_UNICODE, "SMTP"),
+                (0x3003, _PT_UNICODE, _address(name)),
+                (0x39FE, _PT_UNICODE, _address(name)),
+                (0x0C15, _PT_LONG, kind),
+            ],
+            b"\0" * 8,
+        )
+    for i, (name, ctype, data) in enumerate(spec.attachments):
+        tree[f"__attach_version1.0_#{i:08X}"] = _properties(
+            [
+                (0x3705, _PT_LONG, 1),
+                (0x3707, _PT_UNICODE, name),
+                (0x3704, _PT_UNICODE, name[:12]),
+                (0x3703, _PT_UNICODE, "." + name.rsplit(".", 1)[-1]),
+                (0x370E, _PT_UNICODE, ctype),
+                (0x3701, _PT_BINARY, data),
+            ],
+            b"\0" * 8,
+        )
+    return build_cfb(tree)
+
+
+# ---- corpus ----
+def generate(
+    dest: Path,
+    *,
+    messages: int = 1000,
+    seed: int = 1,
+    msg_share: float = 0.25,
+    readpst_share: float = 0.25,
+    max_attachment_kb: int = 1024,
+    body_kb: int = 4,
+) -> Dict[str, object]:
+    """Write a corpus under ``dest`` and return its manifest."""
+    dest = Path(dest)
+    rng = random.Random(seed)
+    counts = {"eml": 0, "msg": 0, "readpst": 0}
+    sizes = {"eml": 0, "msg": 0, "readpst": 0}
+    readpst_numbers: Dict[str, int] = {}
+    for index in range(messages):
+        spec = _Spec(rng, index, max_attachment_kb, body_kb)
+        roll = rng.random()
+        if roll < msg_share:
+            kind, path, data = "msg", dest / "msg" / f"{index // 500:03d}" / f"m{index:06d}.msg", _msg(spec)
+        elif roll < msg_share + readpst_share:
+            folder = rng.choice(_READPST_FOLDERS)
+            readpst_numbers[folder] = readpst_numbers.get(folder, 0) + 1
+            kind = "readpst"
+            path = dest / "readpst" / "store" / "Top of Personal Folders" / folder / f"{readpst_numbers[folder]}.eml"
+            data = _eml(spec)
+        else:
+            kind, path, data = "eml", dest / "eml" / f"{index // 500:03d}" / f"m{index:06d}.eml", _eml(spec)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        counts[kind] += 1
+        sizes[kind] += len(data)
+    manifest = {
+        "seed": seed,
+        "messages": messages,
+        "msg_share": msg_share,
+        "readpst_share": readpst_share,
+        "max_attachment_kb": max_attachment_kb,
+        "body_kb": body_kb,
+        "files": counts,
+        "bytes": sizes,
+    }
+    (dest / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def load_manifest(dest: Path) -> Optional[Dict[str, object]]:
+    try:
+        return json.loads((Path(dest) / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dest", type=Path)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--msg-share", type=float, default=0.25, help="Fraction written as .msg")
+    parser.add_argument("--readpst-share", type=float, default=0.25, help="Fraction written into the readpst-style tree")
+    parser.add_argument("--max-attachment-kb", type=int, default=1024)
+    parser.add_argument("--body-kb", type=int, default=4)
+    args = parser.parse_args()
+    manifest = generate(
+        args.dest,
+        messages=args.messages,
+        seed=args.seed,
+        msg_share=args.msg_share,
+        readpst_share=args.readpst_share,
+        max_attachment_kb=args.max_attachment_kb,
+        body_kb=args.body_kb,
+    )
+    print(json.dumps(manifest))
+
+
+if __name__ == "__main__":
+    main()
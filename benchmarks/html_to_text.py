@@ -0,0 +1,82 @@
+"""Time html_to_text on large and pathological HTML, against the old regex chain.
+
+    python benchmarks/html_to_text.py --kb 256 512 1024
+
+Each case is generated at every size. If the time roughly doubles when the size doubles,
+the converter is linear. The regex chain is skipped once a single run of it takes longer
+than ``--regex-limit`` seconds. Both converters run in the same process.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from mailcombine.extractors import clean_text, html_to_text  # noqa: E402
+
+
+def regex_html_to_text(html: str) -> str:
+    """The converter html_to_text replaced, kept verbatim for comparison."""
+    if not html: return ""
+    textish = re.sub(r"(?is)<(script|style).*?</\1>", "", html)
+    textish = re.sub(r"(?is)<br\s*/?>", "\n", textish)
+    textish = re.sub(r"(?is)</p\s*>", "\n\n", textish)
+    textish = re.sub(r"(?is)<.*?>", "", textish)
+    return clean_text(textish)
+
+
+def _repeat(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+CASES = {
+    # Nested layout tables, inline styles and tracking pixels, like a marketing newsletter.
+    "newsletter": lambda n: "<html><head><style>td{padding:0}</style></head><body>" + _repeat(
+        '<table width="600"><tr><td style="font-family:Arial;color:#333">'
+        '<p>Big <b>sale</b> &amp; more&nbsp;offers</p><img src="https://t.example.com/p.gif" width="1">'
+        '<a href="https://example.com/?utm_source=mail">Shop now</a></td></tr></table>\n', n) + "</body></html>",
+    # Every '<' opens a tag that is never closed: no '>' anywhere.
+    "unclosed_tags": lambda n: _repeat("<div class=x text ", n),
+    # Many <script> openers without a matching </script>.
+    "unclosed_script": lambda n: _repeat("<script>var a = 1; ", n),
+    # <style> that is never closed, followed by ordinary markup.
+    "unclosed_style": lambda n: "<style>" + _repeat("<p>text</p> ", n),
+    # Opened comments that never end.
+    "unclosed_comments": lambda n: _repeat("<!-- note ", n),
+    # Plain text with a bare '<' every few characters.
+    "bare_lt": lambda n: _repeat("a < b ", n),
+}
+
+
+def _time(fn, html: str) -> float:
+    start = time.perf_counter()
+    fn(html)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kb", type=int, nargs="+", default=[256, 512, 1024], help="Input sizes in KB")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--regex-limit", type=float, default=10.0)
+    args = parser.parse_args()
+
+    for case in args.cases:
+        regex_ok = True
+        for kb in args.kb:
+            html = CASES[case](kb * 1024)
+            result = {"case": case, "kb": kb, "streaming_s": round(_time(html_to_text, html), 4)}
+            if regex_ok:
+                result["regex_s"] = round(_time(regex_html_to_text, html), 4)
+                regex_ok = result["regex_s"] < args.regex_limit
+            print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
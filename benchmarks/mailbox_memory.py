@@ -0,0 +1,73 @@
+"""Measure the memory a fully loaded Mailbox takes.
+
+    python -m benchmarks.corpus /tmp/c100k --messages 100000 --msg-share 0 --max-attachment-kb 16 --body-kb 2
+    python -m benchmarks.mailbox_memory /tmp/c100k
+
+Loads the source with ``mailcore.load_mailbox`` (a directory, PST or single file) and
+prints JSON with the load time, the peak RSS during the load and the RSS still held once
+it is done (both relative to the process before loading), in MB and per message.
+``--tracemalloc`` also lists the source lines holding the most memory afterwards. It
+slows the load down severalfold.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from mailcore import load_mailbox
+
+from .suite import _peak_rss_mb, _reset_peak_rss
+
+
+def _rss_mb() -> float:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return _peak_rss_mb()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", type=Path)
+    parser.add_argument("--tracemalloc", action="store_true", help="Report the top allocation sites still alive after loading")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    gc.collect()
+    if args.tracemalloc:
+        tracemalloc.start()
+    base = _rss_mb()
+    scope = "stage" if _reset_peak_rss() else "process"
+    start = time.perf_counter()
+    mailbox = load_mailbox(args.source)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    count = sum(1 for _ in mailbox.all_messages())
+    peak, held = _peak_rss_mb() - base, _rss_mb() - base
+    result = {
+        "source": str(args.source),
+        "messages": count,
+        "seconds": round(elapsed, 2),
+        "peak_rss_mb": round(peak, 1),
+        "held_rss_mb": round(held, 1),
+        "held_bytes_per_message": round(held * 1024 * 1024 / count) if count else None,
+        "rss_scope": scope,
+    }
+    if args.tracemalloc:
+        stats = tracemalloc.take_snapshot().statistics("lineno")
+        result["top_allocations"] = [
+            {"where": str(stat.traceback), "mb": round(stat.size / (1024 * 1024), 2), "blocks": stat.count} for stat in stats[: args.top]
+        ]
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+"""Compare the lean .msg reader with the extract_msg path on a directory of .msg files.
+
+    python -m benchmarks.corpus /tmp/bench --messages 2000 --msg-share 1
+    python -m benchmarks.msg_reader /tmp/bench
+
+Times ``extract_from_msg`` (extract_msg) and ``read_msg_record`` (the lean reader in
+``mailcore.adapters.msg``, falling back to extract_msg) over the same files. It prints
+JSON with messages/s for both, the speedup, how many files the lean reader handed to the
+fallback, and how many records differ between the two paths (there should be none).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from mailcombine.extractors import extract_from_msg
+from mailcore.adapters import msg as msg_adapter
+
+
+def _record(extract: Callable[..., Dict[str, Any]], path: Path) -> Any:
+    # Files extract_msg rejects fail on both paths; compare the error type instead.
+    try:
+        return extract(path)
+    except Exception as exc:
+        return type(exc)
+
+
+def _time(extract: Callable[..., Dict[str, Any]], files: List[Path], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in files:
+            _record(extract, path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", type=Path, help="Directory searched recursively for .msg files")
+    parser.add_argument("--limit", type=int, help="Use at most this many files")
+    parser.add_argument("--repeat", type=int, default=1, help="Keep the fastest of several runs")
+    args = parser.parse_args(argv)
+
+    files = sorted(args.source.rglob("*.msg"))[: args.limit]
+    fallbacks = mismatches = 0
+    for path in files:
+        try:
+            msg_adapter._lean_record(path, False)
+        except msg_adapter._FALLBACK_ERRORS:
+            fallbacks += 1
+        mismatches += _record(extract_from_msg, path) != _record(msg_adapter.read_msg_record, path)
+
+    old = _time(extract_from_msg, files, args.repeat)
+    new = _time(msg_adapter.read_msg_record, files, args.repeat)
+    result = {
+        "source": str(args.source),
+        "messages": len(files),
+        "mb": round(sum(p.stat().st_size for p in files) / (1024 * 1024), 1),
+        "extract_msg_seconds": round(old, 3),
+        "lean_seconds": round(new, 3),
+        "extract_msg_msgs_per_s": round(len(files) / old, 1) if old else None,
+        "lean_msgs_per_s": round(len(files) / new, 1) if new else None,
+        "speedup": round(old / new, 2) if new else None,
+        "fallbacks": fallbacks,
+        "mismatches": mismatches,
+    }
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+"""Compare the RPC bridge's line-JSON and binary framing on a generated mailbox.
+
+    python benchmarks/rpc_transport.py --messages 500 --attachment-kb 256
+
+For each mode, the script starts ``python -m mailcore.rpc_server`` and loads the mailbox once
+(untimed, so parsing and attachment reads are excluded). It then times a full ``load_mailbox`` with attachment
+data and one ``get_message`` per message. Times include decoding on the client side, and
+for line mode that means base64 decoding the attachments.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from email.message import EmailMessage
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from mailcore.service.framing import read_message, write_message  # noqa: E402
+
+
+def build_corpus(dest: Path, count: int, attachment_kb: int, body_kb: int) -> None:
+    rnd = os.urandom(attachment_kb * 1024)
+    body = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (body_kb * 1024 // 56 + 1))[: body_kb * 1024]
+    for i in range(count):
+        msg = EmailMessage()
+        msg["From"] = "Sender <sender@example.com>"
+        msg["To"] = "recipient@example.com"
+        msg["Subject"] = f"Benchmark message {i}"
+        msg["Message-ID"] = f"<bench-{i}@example.com>"
+        msg["Date"] = "Mon, 01 Jan 2024 00:00:00 +0000"
+        msg.set_content(body)
+        msg.add_attachment(rnd, maintype="application", subtype="octet-stream", filename=f"blob{i}.bin")
+        (dest / f"m{i:05d}.eml").write_bytes(msg.as_bytes())
+
+
+class Client:
+    def __init__(self, binary: bool):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "mailcore.rpc_server"], cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self.binary = False
+        self.received = 0
+        self._id = 0
+        if binary:
+            result = self.call("hello", {"framing": "binary"})
+            self.binary = result["framing"] == "binary"
+
+    def call(self, method: str, params: dict):
+        self._id += 1
+        request = {"jsonrpc": "2.0", "id": self._id, "method": method, "params": params}
+        if self.binary:
+            write_message(self.proc.stdin, request)
+        else:
+            self.proc.stdin.write(json.dumps(request).encode("utf-8") + b"\n")
+        self.proc.stdin.flush()
+        if self.binary:
+            response = read_message(_Counting(self.proc.stdout, self))
+        else:
+            line = self.proc.stdout.readline()
+            self.received += len(line)
+            response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"]["message"])
+        return response["result"]
+
+    def close(self) -> None:
+        self.call("shutdown", {})
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+class _Counting:
+    def __init__(self, stream, client: Client):
+        self.stream = stream
+        self.client = client
+
+    def read(self, size: int) -> bytes:
+        data = self.stream.read(size)
+        self.client.received += len(data)
+        return data
+
+
+def _attachment_bytes(att: dict) -> bytes:
+    if "Data" in att:
+        return att["Data"] or b""
+    return base64.b64decode(att["DataBase64"]) if att.get("DataBase64") else b""
+
+
+def run(mode: str, corpus: Path) -> dict:
+    client = Client(binary=mode == "binary")
+    # Warm-up: parse once and keep attachment bytes server-side, so only the transport is timed.
+    handle = client.call("load_mailbox", {"path": str(corpus), "include_attachment_data": True})["Handle"]
+    client.received = 0
+
+    start = time.perf_counter()
+    mailbox = client.call("load_mailbox", {"path": str(corpus), "include_attachment_data": True})
+    messages = mailbox["Folders"][0]["Messages"]
+    attachment_bytes = sum(len(_attachment_bytes(a)) for m in messages for a in m["Attachments"])
+    load_seconds = time.perf_counter() - start
+    load_bytes = client.received
+
+    client.received = 0
+    start = time.perf_counter()
+    page = client.call("list_messages", {"mailbox": handle, "folder_id": mailbox["Folders"][0]["Id"], "limit": len(messages)})
+    for row in page["Messages"]:
+        msg = client.call("get_message", {"mailbox": handle, "key": row["Key"], "include_attachment_data": True})
+        for att in msg["Attachments"]:
+            _attachment_bytes(att)
+    get_seconds = time.perf_counter() - start
+    get_bytes = client.received
+    client.close()
+    return {
+        "mode": mode,
+        "messages": len(messages),
+        "load_mailbox_s": round(load_seconds, 3),
+        "load_mailbox_wire_mb": round(load_bytes / 1e6, 1),
+        "get_message_s": round(get_seconds, 3),
+        "get_message_wire_mb": round(get_bytes / 1e6, 1),
+        "attachment_mb": round(attachment_bytes / 1e6, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--attachment-kb", type=int, default=256)
+    parser.add_argument("--body-kb", type=int, default=16)
+    parser.add_argument("--corpus", type=Path, help="Existing mailbox/directory to use instead of a generated one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="mailcore_bench_") as tmp:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = Path(tmp)
+            build_corpus(corpus, args.messages, args.attachment_kb, args.body_kb)
+        for mode in ("lines", "binary"):
+            print(json.dumps(run(mode, corpus)))
+
+
+if __name__ == "__main__":
+    main()
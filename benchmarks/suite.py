@@ -0,0 +1,328 @@
+"""Time each conversion stage on a synthetic corpus and write the results as JSON.
+
+    python -m benchmarks.suite --messages 2000 --out before.json
+    python -m benchmarks.suite --corpus /tmp/bench --out after.json --baseline before.json
+
+Every stage runs on the same inputs, prepared by the stage before it, and is timed on its
+own. Each stage reports messages/s, MB/s (source bytes of the messages it handled; for
+the RPC stages, response bytes) and peak RSS. On Linux, peak RSS is reset before every
+stage so the figure belongs to that stage. Elsewhere it is the process high-water mark
+so far (``"rss_scope": "process"``). ``--repeat`` keeps the fastest of several runs.
+
+Pass ``--corpus`` with the same generator options to reuse a corpus across commits. It is
+created on the first run.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mailcombine.extractors import extract_from_eml, extract_from_msg, extract_msg
+from mailcombine.scan import walk_files
+from mailcombine.writer import write_header, write_record
+from mailcore.adapters._common import record_to_message
+from mailcore.api import load_message_summary
+from mailcore.exporters import export_json, export_sqlite
+from mailcore.legacy import message_to_record
+from mailcore.models import Folder, Mailbox
+from mailcore.serialization import mailbox_to_dict
+
+from .corpus import generate, load_manifest
+
+ROOT = Path(__file__).resolve().parents[1]
+SUITE_VERSION = 1
+STAGES = (
+    "scan",
+    "summarize",
+    "extract_from_eml",
+    "extract_from_msg",
+    "record_to_message",
+    "message_to_record",
+    "write_record",
+    "export_json",
+    "export_sqlite",
+    "mailbox_to_dict",
+    "rpc_ping",
+    "rpc_load_message",
+)
+
+# Inputs each stage takes from earlier ones; those run untimed when not requested.
+_NEEDS = {
+    "record_to_message": ("extract_from_eml", "extract_from_msg"),
+    "message_to_record": ("record_to_message",),
+    "write_record": ("extract_from_eml", "extract_from_msg"),
+    "export_json": ("record_to_message",),
+    "export_sqlite": ("record_to_message",),
+    "mailbox_to_dict": ("record_to_message",),
+}
+
+_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+def _reset_peak_rss() -> bool:
+    try:
+        _CLEAR_REFS.write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _git_commit() -> Tuple[Optional[str], Optional[bool]]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+class _Rpc:
+    """Minimal line-mode client for ``python -m mailcore.rpc_server``."""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "mailcore.rpc_server"], cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self._next = 0
+        self.received = 0
+
+    def call(self, method: str, params: Dict[str, Any]) -> Any:
+        self._next += 1
+        self.proc.stdin.write(json.dumps({"jsonrpc": "2.0", "id": self._next, "method": method, "params": params}).encode() + b"\n")
+        self.proc.stdin.flush()
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                raise RuntimeError("RPC server exited")
+            self.received += len(line)
+            reply = json.loads(line)
+            if reply.get("id") == self._next:
+                if "error" in reply:
+                    raise RuntimeError(reply["error"]["message"])
+                return reply["result"]
+
+    def close(self) -> None:
+        try:
+            self.call("shutdown", {})
+        except (RuntimeError, OSError):
+            pass
+        self.proc.wait(timeout=30)
+
+
+class Suite:
+    def __init__(self, corpus: Path, work: Path, *, rpc_calls: int):
+        self.corpus = corpus
+        self.work = work
+        self.rpc_calls = rpc_calls
+        self.eml_files = sorted(p for p in corpus.rglob("*.eml"))
+        self.msg_files = sorted(p for p in corpus.rglob("*.msg"))
+        self.sizes = {str(p): p.stat().st_size for p in self.eml_files + self.msg_files}
+        self.records: List[Dict[str, Any]] = []
+        self.messages: List[Any] = []
+
+    def _source_bytes(self, items, key: Callable[[Any], str]) -> int:
+        return sum(self.sizes.get(key(item), 0) for item in items)
+
+    # Every stage returns (messages handled, bytes handled).
+    def scan(self) -> Tuple[int, int]:
+        files = list(walk_files(self.corpus, (".msg", ".eml")))
+        return len(files), self._source_bytes(files, str)
+
+    def summarize(self) -> Tuple[int, int]:
+        files = self.eml_files + (self.msg_files if extract_msg is not None else [])
+        summaries = [load_message_summary(p) for p in files]
+        return len(summaries), self._source_bytes(files, str)
+
+    def extract_from_eml(self) -> Tuple[int, int]:
+        records = [extract_from_eml(p) for p in self.eml_files]
+        self.records = records + [r for r in self.records if r["source"].endswith(".msg")]
+        return len(records), self._source_bytes(self.eml_files, str)
+
+    def extract_from_msg(self) -> Tuple[int, int]:
+        if extract_msg is None:
+            raise _Skip("extract-msg is not installed")
+        records = [extract_from_msg(p) for p in self.msg_files]
+        self.records = [r for r in self.records if not r["source"].endswith(".msg")] + records
+        return len(records), self._source_bytes(self.msg_files, str)
+
+    def record_to_message(self) -> Tuple[int, int]:
+        self.messages = [record_to_message(r) for r in self.records]
+        return len(self.messages), self._source_bytes(self.records, lambda r: r["source"])
+
+    def message_to_record(self) -> Tuple[int, int]:
+        records = [message_to_record(m, include_content=False) for m in self.messages]
+        return len(records), self._source_bytes(self.messages, lambda m: m.source)
+
+    def write_record(self) -> Tuple[int, int]:
+        with open(self.work / "out.txt", "w", encoding="utf-8", errors="replace") as out:
+            write_header(out, str(self.corpus))
+            for rec in self.records:
+                write_record(out, rec, show_attachments=True)
+        return len(self.records), self._source_bytes(self.records, lambda r: r["source"])
+
+    def export_json(self) -> Tuple[int, int]:
+        export_json(self.messages, self.work / "out.json", source_label=str(self.corpus), output_text_path=self.work / "out.txt")
+        return len(self.messages), self._source_bytes(self.messages, lambda m: m.source)
+
+    def export_sqlite(self) -> Tuple[int, int]:
+        export_sqlite(self.messages, self.work / "out.sqlite")
+        return len(self.messages), self._source_bytes(self.messages, lambda m: m.source)
+
+    def mailbox_to_dict(self) -> Tuple[int, int]:
+        mailbox = Mailbox(self.corpus, self.corpus.name, [Folder(id="root", name="root", path="/", messages=self.messages)])
+        json.dump(mailbox_to_dict(mailbox, include_attachment_data=False), io.StringIO())
+        return len(self.messages), self._source_bytes(self.messages, lambda m: m.source)
+
+    def rpc_ping(self) -> Tuple[int, int]:
+        rpc = _Rpc()
+        try:
+            rpc.call("ping", {})
+            rpc.received = 0
+            for _ in range(self.rpc_calls):
+                rpc.call("ping", {})
+            return self.rpc_calls, rpc.received
+        finally:
+            rpc.close()
+
+    def rpc_load_message(self) -> Tuple[int, int]:
+        paths = [str(p) for p in (self.eml_files + self.msg_files)[: self.rpc_calls]]
+        rpc = _Rpc()
+        try:
+            rpc.call("ping", {})
+            rpc.received = 0
+            for path in paths:
+                rpc.call("load_message", {"path": path})
+            return len(paths), rpc.received
+        finally:
+            rpc.close()
+
+
+class _Skip(Exception):
+    pass
+
+
+def run_stage(suite: Suite, name: str, repeat: int) -> Dict[str, Any]:
+    best: Optional[Tuple[float, int, int]] = None
+    peak = 0.0
+    scope = "stage"
+    for _ in range(repeat):
+        if not _reset_peak_rss():
+            scope = "process"
+        start = time.perf_counter()
+        try:
+            count, nbytes = getattr(suite, name)()
+        except _Skip as e:
+            return {"skipped": str(e)}
+        elapsed = time.perf_counter() - start
+        peak = max(peak, _peak_rss_mb())
+        if best is None or elapsed < best[0]:
+            best = (elapsed, count, nbytes)
+    elapsed, count, nbytes = best
+    return {
+        "messages": count,
+        "bytes": nbytes,
+        "seconds": round(elapsed, 4),
+        "msgs_per_s": round(count / elapsed, 1) if elapsed else None,
+        "mb_per_s": round(nbytes / (1024 * 1024) / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": round(peak, 1),
+        "rss_scope": scope,
+    }
+
+
+def _compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"{'stage':<20}{'baseline msg/s':>16}{'current msg/s':>16}{'change':>10}", file=sys.stderr)
+    for name, stage in current["stages"].items():
+        old = baseline.get("stages", {}).get(name, {})
+        if "msgs_per_s" not in stage or not old.get("msgs_per_s"):
+            continue
+        change = (stage["msgs_per_s"] / old["msgs_per_s"] - 1) * 100
+        print(f"{name:<20}{old['msgs_per_s']:>16}{stage['msgs_per_s']:>16}{change:>+9.1f}%", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="Corpus directory (generated there if it has no manifest)")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-attachment-kb", type=int, default=1024)
+    parser.add_argument("--body-kb", type=int, default=4)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--rpc-calls", type=int, default=200)
+    parser.add_argument("--out", type=Path, help="Write results here (default: stdout)")
+    parser.add_argument("--baseline", type=Path, help="Earlier results to compare against (printed to stderr)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="mailcombine_bench_") as tmp:
+        corpus = args.corpus or Path(tmp) / "corpus"
+        options = {"messages": args.messages, "seed": args.seed, "max_attachment_kb": args.max_attachment_kb, "body_kb": args.body_kb}
+        manifest = load_manifest(corpus)
+        if manifest is None:
+            print(f"[INFO] Generating corpus in {corpus}", file=sys.stderr)
+            manifest = generate(corpus, **options)
+        elif any(manifest.get(k) != v for k, v in options.items()):
+            print(f"[WARN] {corpus} was generated with different options; using it as is", file=sys.stderr)
+        work = Path(tmp) / "work"
+        work.mkdir()
+
+        suite = Suite(corpus, work, rpc_calls=args.rpc_calls)
+        commit, dirty = _git_commit()
+        results: Dict[str, Any] = {
+            "suite_version": SUITE_VERSION,
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "corpus": dict(manifest, path=str(corpus)),
+            "stages": {},
+        }
+        wanted = set(args.stages)
+        for name in reversed(STAGES):
+            if name in wanted:
+                wanted.update(_NEEDS.get(name, ()))
+        # Stages feed each other, so they always run in pipeline order.
+        for name in STAGES:
+            if name not in wanted:
+                continue
+            print(f"[INFO] {name}", file=sys.stderr)
+            stage = run_stage(suite, name, args.repeat if name in args.stages else 1)
+            if name in args.stages:
+                results["stages"][name] = stage
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.baseline:
+        _compare(results, json.loads(args.baseline.read_text(encoding="utf-8")))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
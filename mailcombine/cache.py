@@ -0,0 +1,224 @@
+"""On-disk cache of extracted .msg/.eml records, keyed by file identity.
+
+A cached record is reused while the file's absolute path, size and mtime are unchanged.
+With ``verify=True`` the file is also re-hashed and compared to the stored sha256. That
+is still much cheaper than parsing, and it catches content changed in place with a
+preserved mtime.
+
+Records are stored as JSON. Attachment bytes go in a separate table, and only when the
+record was extracted with ``keep_content``. Once the database grows past ``max_bytes``,
+the least recently used entries are evicted on :meth:`ExtractionCache.close`.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import timed
+
+# Bump whenever the extractor's record layout changes; older caches are then discarded.
+CACHE_VERSION = 2
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    has_content INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_last_used ON records (last_used);
+CREATE TABLE IF NOT EXISTS contents (
+    path TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (path, idx)
+);
+"""
+
+
+def _identity(path: Path) -> Tuple[str, int, int]:
+    # abspath rather than resolve(): no per-component syscalls on large trees.
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    return key, st.st_size, st.st_mtime_ns
+
+
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ExtractionCache:
+    """SQLite-backed record cache.
+
+    Safe to share between threads, and to open from several processes at once (WAL).
+    """
+
+    def __init__(self, db_path: Path, *, max_bytes: int = DEFAULT_MAX_BYTES, verify: bool = False):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.verify = verify
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.stored = 0
+        self.evicted = 0
+        self._touched: List[Tuple[float, str]] = []
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+            self._db.executescript("DROP TABLE IF EXISTS records; DROP TABLE IF EXISTS contents;")
+            self._db.execute(f"PRAGMA user_version={CACHE_VERSION}")
+        self._db.executescript(_SCHEMA)
+
+    def _row(self, path: Path) -> Tuple[Optional[str], Any]:
+        """``(key, row)``; ``row`` is None when absent and False when the file has changed."""
+        try:
+            key, size, mtime_ns = _identity(path)
+        except OSError:
+            return None, None
+        row = self._db.execute(
+            "SELECT size, mtime_ns, sha256, has_content, record FROM records WHERE path = ?", (key,)
+        ).fetchone()
+        if row is not None and (row[0] != size or row[1] != mtime_ns):
+            return key, False
+        return key, row
+
+    def contains(self, path: Path, *, with_content: bool = False) -> bool:
+        """Cheap freshness check (no hashing, no record decode)."""
+        with self._lock:
+            _, row = self._row(path)
+        if row is False:
+            self.stale += 1
+        return bool(row) and bool(row[3] or not with_content)
+
+    def get(self, path: Path, *, with_content: bool = False) -> Optional[Dict[str, Any]]:
+        """Return the cached record for ``path`` or None (counted as a miss)."""
+        with self._lock:
+            return self._get(path, with_content)
+
+    def _get(self, path: Path, with_content: bool) -> Optional[Dict[str, Any]]:
+        key, row = self._row(path)
+        if row is False:
+            self.stale += 1
+        if not row or (with_content and not row[3]):
+            self.misses += 1
+            return None
+        _, _, sha256, has_content, raw = row
+        if self.verify and sha256 and _sha256_file(key) != sha256:
+            self.stale += 1
+            self.misses += 1
+            return None
+        record = json.loads(raw)
+        if with_content and has_content:
+            for idx, data in self._db.execute("SELECT idx, data FROM contents WHERE path = ?", (key,)):
+                record["attachments"][idx]["content"] = bytes(data)
+        self.hits += 1
+        self._touched.append((time.time(), key))
+        if len(self._touched) >= 500:
+            self._flush_touched()
+        return record
+
+    def put(self, path: Path, record: Dict[str, Any], *, with_content: bool = False) -> None:
+        """Store ``record``; ``with_content`` says it was extracted with attachment bytes."""
+        try:
+            key, size, mtime_ns = _identity(path)
+        except OSError:
+            return
+        attachments = record.get("attachments") or []
+        contents = [(i, att["content"]) for i, att in enumerate(attachments) if att.get("content") is not None]
+        stripped = dict(record, attachments=[{k: v for k, v in att.items() if k != "content"} for att in attachments])
+        raw = json.dumps(stripped, ensure_ascii=False)
+        has_content = int(with_content or not attachments)
+        nbytes = len(raw) + sum(len(data) for _, data in contents)
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM contents WHERE path = ?", (key,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, size, mtime_ns, record.get("source_sha256"), has_content, raw, nbytes, time.time()),
+            )
+            self._db.executemany("INSERT INTO contents VALUES (?, ?, ?)", [(key, i, data) for i, data in contents])
+        self.stored += 1
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._db.executemany("UPDATE records SET last_used = ? WHERE path = ?", self._touched)
+            self._touched = []
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache fits in ``max_bytes``."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM records").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims: List[str] = []
+        for key, nbytes in self._db.execute("SELECT path, nbytes FROM records ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= nbytes
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM records WHERE path = ?", [(k,) for k in victims])
+            self._db.executemany("DELETE FROM contents WHERE path = ?", [(k,) for k in victims])
+        self.evicted += len(victims)
+
+    def close(self, *, evict: bool = True) -> None:
+        with self._lock:
+            if self._db is None:
+                return
+            self._flush_touched()
+            if evict:
+                self._evict()
+            self._db.close()
+            self._db = None
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = (100.0 * self.hits / lookups) if lookups else 0.0
+        return (
+            f"{self.hits} hit(s), {self.misses} miss(es) ({rate:.1f}% hit rate), "
+            f"{self.stale} stale, {self.evicted} evicted"
+        )
+
+    def __enter__(self) -> "ExtractionCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def cached_extract(extract, path: Path, *, keep_content: bool = False, cache: Optional[ExtractionCache] = None) -> Dict[str, Any]:
+    """Run ``extract(path, keep_content=...)`` through ``cache`` when one is given."""
+    if cache is not None:
+        with timed("cache"):
+            record = cache.get(path, with_content=keep_content)
+        if record is not None:
+            return record
+    record = extract(path, keep_content=keep_content)
+    if cache is not None:
+        with timed("cache"):
+            cache.put(path, record, with_content=keep_content)
+    return record
@@ -1,22 +1,159 @@
 from __future__ import annotations
-import argparse, traceback, json, csv
+import argparse, traceback, csv, itertools, contextlib, time
+import multiprocessing.util
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 
-from mailcombine.writer import write_record, write_header
-from mailcombine.extractors import has_embedded_readpst
-from mailcore import load_single_message, load_mailbox
+from mailcombine.cache import DEFAULT_MAX_BYTES as CACHE_DEFAULT_BYTES, ExtractionCache
+from mailcombine.dedupe import DEDUPE_KEYS, SeenSet, dedupe_key, file_sha256
+from mailcombine.journal import JournalMismatch, RunJournal, fsync_file, restore_file
+from mailcombine.metrics import TOTAL, Metrics, activate, capture, timed
+from mailcombine.progress import ProgressCallback, ProgressReporter
+from mailcombine.scan import walk_files
+from mailcore import load_message_summary, load_single_message
+from mailcore.adapters import iter_pst_messages, pst_message_key
+from mailcore.blobstore import AttachmentStore
 from mailcore.legacy import message_to_record
+from mailcore.exporters import ExportPipeline, HashCsvSink, JsonSink, Sink, SqliteSink, TextSink
+from mailcore.index import SearchIndex
+
+# Extraction cache and attachment store for this process: opened by main() for --cache and
+# --attachments-dir, and by each worker's initializer when --jobs > 1 (every process gets
+# its own SQLite connection).
+_cache: Optional[ExtractionCache] = None
+_store: Optional[AttachmentStore] = None
+
+def _init_worker(db_path: Optional[str], verify: bool, store_dir: Optional[str]) -> None:
+    global _cache, _store
+    if db_path:
+        _cache = ExtractionCache(Path(db_path), verify=verify)
+        # Pool workers leave through os._exit, which skips atexit; multiprocessing still runs
+        # its finalizers. Closing writes the worker's pending last-used updates; eviction is
+        # left to the main process.
+        multiprocessing.util.Finalize(None, _close_worker_cache, exitpriority=10)
+    if store_dir:
+        _store = AttachmentStore(Path(store_dir))
+
+def _close_worker_cache() -> None:
+    if _cache is not None:
+        _cache.close(evict=False)
+
+Loaded = Tuple[Optional[Dict[str, Any]], Optional[str], Optional[Dict[str, float]]]
+
+def _load_record(path: str, with_content: bool = False, measure: bool = False) -> Loaded:
+    """Load one .msg/.eml into a legacy record; errors come back as traceback text.
+
+    Attachment ``content_base64`` is only filled in when ``with_content`` is set (i.e. the
+    JSON sidecar needs it); with an attachment store the content is written there and
+    referenced by ``blob`` path instead. With ``measure`` the file's per-stage timings come back as the
+    third item (see :func:`mailcombine.metrics.capture`), otherwise it is None. Runs in
+    worker processes when ``--jobs`` > 1, so it must stay importable at module level.
+    """
+    with (capture() if measure else contextlib.nullcontext()) as timings:
+        try:
+            message = load_single_message(Path(path), keep_attachment_data=with_content or _store is not None, cache=_cache)
+            rec, err = message_to_record(message, include_content=with_content, store=_store), None
+        except Exception:
+            rec, err = None, traceback.format_exc()
+    return rec, err, timings
+
+def _load_record_isolated(path: Path, with_content: bool, measure: bool) -> Loaded:
+    # Re-run a single file in its own worker so a hard crash (segfault, OOM kill) is pinned on it.
+    try:
+        with ProcessPoolExecutor(max_workers=1, **_pool_args()) as solo:
+            return solo.submit(_load_record, str(path), with_content, measure).result()
+    except BrokenProcessPool:
+        return None, traceback.format_exc(), None
+
+def _pool_args() -> Dict[str, Any]:
+    if _cache is None and _store is None:
+        return {}
+    cache_args = (str(_cache.db_path), _cache.verify) if _cache is not None else (None, False)
+    return {"initializer": _init_worker, "initargs": (*cache_args, str(_store.root) if _store is not None else None)}
+
+def _iter_loaded(paths: Iterable[Path], jobs: int, with_content: bool = False, measure: bool = False) -> Iterator[Tuple[Path, Optional[Dict[str, Any]], Optional[str], Optional[Dict[str, float]]]]:
+    """Yield ``(path, record, error, timings)`` for each path, in input order.
+
+    With ``jobs`` > 1 the files are parsed in a process pool. At most ``jobs * 4`` files are
+    in flight so results never pile up in memory ahead of the writer. Files that are fresh
+    in the extraction cache are loaded here instead of being sent to a worker.
+    """
+    if jobs <= 1:
+        for p in paths:
+            yield (p, *_load_record(str(p), with_content, measure))
+        return
+
+    source = iter(paths)
+    window = jobs * 4
+    pool = ProcessPoolExecutor(max_workers=jobs, **_pool_args())
+
+    def submit(p: Path):
+        if _cache is not None and _cache.contains(p, with_content=with_content or _store is not None):
+            return None  # cache hit: loaded inline when its turn comes
+        if _cache is not None:
+            _cache.misses += 1  # the worker's own connection does the lookup and the store
+        return pool.submit(_load_record, str(p), with_content, measure)
 
-def _progress_emit(progress_path: Optional[Path], payload: dict) -> None:
-    if not progress_path: return
     try:
-        with open(progress_path, "a", encoding="utf-8") as pf:
-            pf.write(json.dumps(payload, ensure_ascii=False) + "\n")
-    except Exception:
-        pass
+        pending = deque((p, submit(p)) for p in itertools.islice(source, window))
+        while pending:
+            p, fut = pending.popleft()
+            try:
+                loaded = fut.result() if fut is not None else _load_record(str(p), with_content, measure)
+            except BrokenProcessPool:
+                # A worker died hard. Rebuild the pool, pin the failure on this file by
+                # retrying it alone, and resubmit everything else that was in flight.
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = ProcessPoolExecutor(max_workers=jobs, **_pool_args())
+                loaded = _load_record_isolated(p, with_content, measure)
+                pending = deque((q, pool.submit(_load_record, str(q), with_content, measure) if f is not None else None) for q, f in pending)
+            nxt = next(source, None)
+            if nxt is not None:
+                pending.append((nxt, submit(nxt)))
+            yield (p, *loaded)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+_INPUT_EXTS = (".msg", ".eml", ".pst", ".ost")
+
+def _counter(idx: int, total: Optional[int]) -> str:
+    # ``total`` is not known while --stream is still scanning.
+    return f"{idx}/{total}" if total is not None else str(idx)
+
+def _file_size(path: Path) -> Optional[int]:
+    try: return path.stat().st_size
+    except OSError: return None
+
+SUMMARY_COLUMNS = ["source", "file", "date", "from", "to", "subject", "message_id", "attachments", "size"]
+
+def _list_summaries(files: Iterable[Path], summary_path: Optional[Path], show: bool) -> Tuple[int, int]:
+    """Header-only pass for --list / --summary: nothing is converted. Returns (listed, errors)."""
+    listed = errors = 0
+    with (open(summary_path, "w", newline="", encoding="utf-8") if summary_path else contextlib.nullcontext()) as f:
+        writer = csv.writer(f) if f is not None else None
+        if writer is not None:
+            writer.writerow(SUMMARY_COLUMNS)
+        for p in files:
+            try:
+                s = load_message_summary(p)
+            except Exception as e:
+                errors += 1
+                print(f"[ERROR] Failed to read headers: {p}: {e}")
+                continue
+            listed += 1
+            date = s.sent_at.isoformat() if s.sent_at else ""
+            if show:
+                print(f"{date}\t{s.sender}\t{s.subject}\t{s.attachment_count} att\t{p}")
+            if writer is not None:
+                writer.writerow([s.source, p.name, date, s.sender, ", ".join(s.to), s.subject, s.message_id, s.attachment_count, s.size if s.size is not None else ""])
+    return listed, errors
 
-def main(argv=None):
+def main(argv=None, *, progress: Optional[ProgressCallback] = None):
+    """Run the converter. ``progress`` receives the same events as ``--progress-file``
+    (see :mod:`mailcombine.progress`); the GUI uses it to run the CLI in-process."""
     parser = argparse.ArgumentParser(description="Combine .msg, .eml, and .pst emails into a single searchable .txt file.")
     parser.add_argument("-i", "--input", default="msg_files", help="Root folder to search recursively")
     parser.add_argument("-o", "--output", default="combined_emails.txt", help="Output text file")
@@ -24,21 +161,54 @@ def main(argv=None):
     parser.add_argument("--attachments", action="store_true", help="Also list attachments in the text output")
     parser.add_argument("--json", dest="json_path", default=None, help="Write JSON sidecar log (default: <output>.json)")
     parser.add_argument("--no-json", dest="no_json", action="store_true", help="Disable JSON sidecar logging")
+    parser.add_argument("--jsonl", dest="jsonl", action="store_true", help="Write the JSON sidecar as JSON Lines, one message per line (default: <output>.jsonl)")
     parser.add_argument("--hashes", action="store_true", help="Write hashes CSV (default: <output>_hashes.csv)")
     parser.add_argument("--hashes-path", dest="hashes_path", default=None, help="Custom path for hashes CSV")
+    parser.add_argument("--attachments-dir", dest="attachments_dir", default=None, metavar="PATH", help="Write each distinct attachment once to a content-addressed store under PATH; the JSON sidecar and hashes CSV then reference it by path instead of inlining base64")
+    parser.add_argument("--sqlite", nargs="?", const="", default=None, metavar="PATH", help="Also write messages, recipients, attachments and hashes to an SQLite database (default: <output>.sqlite)")
     parser.add_argument("--progress-file", dest="progress_file", default=None, help="Write JSONL progress updates")
+    parser.add_argument("--stream", action="store_true", help="Start converting .msg/.eml files while the input folder is still being scanned, in the order they are found (output order can differ between runs)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Parse .msg/.eml files in N worker processes (default 1)")
+    parser.add_argument("--cache", nargs="?", const="", default=None, metavar="PATH", help="Reuse extracted .msg/.eml records from an SQLite cache across runs (default: <output>.cache.sqlite)")
+    parser.add_argument("--cache-max-mb", dest="cache_max_mb", type=int, default=CACHE_DEFAULT_BYTES // (1024 * 1024), help="Evict least recently used cache entries above this size (default 1024)")
+    parser.add_argument("--resume", action="store_true", help="Journal progress to <output>.journal and, if a journal from an interrupted run exists, continue from its last checkpoint")
+    parser.add_argument("--cache-verify", dest="cache_verify", action="store_true", help="Re-hash cached files and re-parse any whose content changed")
+    parser.add_argument("--dedupe", choices=DEDUPE_KEYS, default=None, help="Skip messages already written earlier in the run, matched by Message-ID, a normalized header+body digest, or source file SHA-256; skipped copies are listed in <output>_duplicates.csv")
+    parser.add_argument("--dedupe-db", dest="dedupe_db", default=None, metavar="PATH", help="Keep the --dedupe seen-set in an SQLite file instead of memory (for very large runs)")
+    parser.add_argument("--index", nargs="?", const="", default=None, metavar="PATH", help="Build a full-text search index of the converted messages (default: <output>.index.sqlite)")
+    parser.add_argument("--metrics", nargs="?", const="", default=None, metavar="PATH", help="Time each pipeline stage and readpst run and write totals, percentiles and the slowest files as JSON (default: <output>.metrics.json)")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH", help="Run under cProfile and dump pstats to PATH (default: <output>.pstats); worker processes are not profiled")
+    parser.add_argument("--list", action="store_true", help="Only list the .msg/.eml messages (date, sender, subject, attachment count), read from their headers; nothing is converted")
+    parser.add_argument("--summary", nargs="?", const="", default=None, metavar="PATH", help="Only write the header fields of each .msg/.eml to a CSV; nothing is converted (default: <output>_summary.csv)")
     args = parser.parse_args(argv)
 
     input_path = Path(args.input).expanduser().resolve()
     out_path = Path(args.output).expanduser().resolve()
-    json_path = None if args.no_json else (Path(args.json_path).expanduser().resolve() if args.json_path else Path(str(out_path) + ".json"))
+    json_path = None if args.no_json else (Path(args.json_path).expanduser().resolve() if args.json_path else Path(str(out_path) + (".jsonl" if args.jsonl else ".json")))
 
     hashes_enabled = bool(args.hashes or args.hashes_path)
     hashes_path: Optional[Path] = None
     if hashes_enabled:
         hashes_path = Path(args.hashes_path).expanduser().resolve() if args.hashes_path else Path(str(out_path).rsplit(".", 1)[0] + "_hashes.csv")
 
+    store_path: Optional[Path] = Path(args.attachments_dir).expanduser().resolve() if args.attachments_dir else None
+    sqlite_path: Optional[Path] = None
+    if args.sqlite is not None:
+        sqlite_path = Path(args.sqlite).expanduser().resolve() if args.sqlite else Path(str(out_path) + ".sqlite")
     progress_path: Optional[Path] = Path(args.progress_file).expanduser().resolve() if args.progress_file else None
+    cache_path: Optional[Path] = None
+    if args.cache is not None:
+        cache_path = Path(args.cache).expanduser().resolve() if args.cache else Path(str(out_path) + ".cache.sqlite")
+    dupes_path: Optional[Path] = Path(str(out_path).rsplit(".", 1)[0] + "_duplicates.csv") if args.dedupe else None
+    index_path: Optional[Path] = None
+    if args.index is not None:
+        index_path = Path(args.index).expanduser().resolve() if args.index else Path(str(out_path) + ".index.sqlite")
+    metrics_path: Optional[Path] = None
+    if args.metrics is not None:
+        metrics_path = Path(args.metrics).expanduser().resolve() if args.metrics else Path(str(out_path) + ".metrics.json")
+    profile_path: Optional[Path] = None
+    if args.profile is not None:
+        profile_path = Path(args.profile).expanduser().resolve() if args.profile else Path(str(out_path) + ".pstats")
 
     if not input_path.exists():
         print(f"[ERROR] Input path does not exist: {input_path}")
@@ -48,24 +218,21 @@ def main(argv=None):
     msg_files: List[Path]
     eml_files: List[Path]
     pst_files: List[Path]
+    # With --stream, the walk is consumed by the conversion loop itself and these lists
+    # fill up as files are found; otherwise the whole input is listed first, sorted.
+    streamed: Optional[Iterator[Path]] = None
 
     if input_path.is_dir():
         msg_files = []
         eml_files = []
         pst_files = []
-        for candidate in input_path.rglob("*"):
-            if not candidate.is_file():
-                continue
-            suffix = candidate.suffix.lower()
-            if suffix == ".msg":
-                msg_files.append(candidate)
-            elif suffix == ".eml":
-                eml_files.append(candidate)
-            elif suffix == ".pst":
-                pst_files.append(candidate)
-        msg_files.sort()
-        eml_files.sort()
-        pst_files.sort()
+        found = walk_files(input_path, _INPUT_EXTS, ordered=not args.stream)
+        if args.stream:
+            streamed = found
+        else:
+            for candidate in found:
+                suffix = candidate.suffix.lower()
+                (msg_files if suffix == ".msg" else eml_files if suffix == ".eml" else pst_files).append(candidate)
     elif input_path.is_file():
         base_label = input_path.parent
         suffix = input_path.suffix.lower()
@@ -77,7 +244,7 @@ def main(argv=None):
             msg_files = []
             eml_files = [input_path]
             pst_files = []
-        elif suffix == ".pst":
+        elif suffix in (".pst", ".ost"):
             msg_files = []
             eml_files = []
             pst_files = [input_path]
@@ -88,132 +255,404 @@ def main(argv=None):
         print(f"[ERROR] Input path is neither file nor directory: {input_path}")
         return 2
 
+    def _message_items() -> Iterator[Tuple[str, int, Optional[int], Path]]:
+        # (kind, index, total, path) for every .msg then .eml, or as --stream finds them.
+        if streamed is None:
+            for kind, files in (("msg", msg_files), ("eml", eml_files)):
+                yield from ((kind, idx, len(files), p) for idx, p in enumerate(files, 1))
+            return
+        for p in streamed:
+            suffix = p.suffix.lower()
+            if suffix in (".pst", ".ost"):
+                pst_files.append(p)  # converted once the scan is done
+                continue
+            files = msg_files if suffix == ".msg" else eml_files
+            files.append(p)
+            yield suffix[1:], len(files), None, p
+
     print(f"[INFO] Input source: {input_path}")
+    if args.list or args.summary is not None:
+        summary_path = None
+        if args.summary is not None:
+            summary_path = Path(args.summary).expanduser().resolve() if args.summary else Path(str(out_path).rsplit(".", 1)[0] + "_summary.csv")
+            print(f"[INFO] Summary CSV : {summary_path}")
+        def _found():
+            print(f"[INFO] Found {len(msg_files)} .msg, {len(eml_files)} .eml, {len(pst_files)} .pst/.ost")
+            if pst_files:
+                print(f"[WARN] Header-only listing covers .msg/.eml; skipping {len(pst_files)} .pst/.ost")
+        if streamed is None: _found()
+        listed, errors = _list_summaries((p for _, _, _, p in _message_items()), summary_path, args.list)
+        if streamed is not None: _found()
+        if summary_path: print(f"[INFO] Summary CSV written: {summary_path}")
+        print(f"[DONE] Listed {listed} message(s)" + (f", {errors} could not be read" if errors else ""))
+        return 0
+
     print(f"[INFO] Output file : {out_path}")
     if json_path and not args.no_json: print(f"[INFO] JSON log    : {json_path}")
     if hashes_enabled and hashes_path: print(f"[INFO] Hashes CSV  : {hashes_path}")
-    print(f"[INFO] Found {len(msg_files)} .msg, {len(eml_files)} .eml, {len(pst_files)} .pst")
+    if sqlite_path: print(f"[INFO] SQLite      : {sqlite_path}")
+    if store_path: print(f"[INFO] Attachments : {store_path}")
+    if cache_path: print(f"[INFO] Cache       : {cache_path}")
+    if index_path: print(f"[INFO] Index       : {index_path}")
+    if dupes_path: print(f"[INFO] Duplicates  : {dupes_path} (key: {args.dedupe})")
+    if metrics_path: print(f"[INFO] Metrics     : {metrics_path}")
+    if streamed is None:
+        print(f"[INFO] Found {len(msg_files)} .msg, {len(eml_files)} .eml, {len(pst_files)} .pst/.ost")
+    else:
+        print("[INFO] Scanning and converting as files are found")
 
-    if progress_path and progress_path.exists():
-        try: progress_path.unlink()
-        except Exception: pass
-    _progress_emit(progress_path, {"phase": "scan", "msg": len(msg_files), "eml": len(eml_files), "pst": len(pst_files)})
+    global _cache, _store
+    if store_path:
+        try:
+            _store = AttachmentStore(store_path)
+        except OSError as e:
+            print(f"[ERROR] Could not create attachment store: {e}")
+            return 2
 
-    processed = 0
-    errors = 0
-    json_records: List[Dict[str, Any]] = []
-    hash_rows: List[List[str]] = []  # type,parent_source,filename,size,sha256
+    reporter = ProgressReporter(progress_path, progress)
+    # Byte sizes weight the progress and ETA; only collected when someone is listening.
+    # A streamed scan has no total up front, so its progress carries no percentage.
+    sizes: Dict[str, int] = {str(f): _file_size(f) or 0 for f in itertools.chain(msg_files, eml_files, pst_files)} if reporter.enabled else {}
+    if streamed is None:
+        reporter.emit({"phase": "scan", "msg": len(msg_files), "eml": len(eml_files), "pst": len(pst_files), "bytes": sum(sizes.values())})
 
-    def _add_hash_row(row_type: str, parent_source: str, filename: str, size: Any, sha256: Optional[str]):
-        if not hashes_enabled: return
-        hash_rows.append([row_type, parent_source, filename, str(size if size is not None else ""), sha256 or ""])
+    if cache_path:
+        try:
+            _cache = ExtractionCache(cache_path, max_bytes=args.cache_max_mb * 1024 * 1024, verify=args.cache_verify)
+        except Exception as e:
+            print(f"[WARN] Could not open cache, continuing without it: {e}")
 
-    with open(out_path, "w", encoding=args.encoding, errors="replace") as out:
-        write_header(out, str(base_label))
+    journal: Optional[RunJournal] = None
+    resumed = False
+    if args.resume:
+        journal = RunJournal(Path(str(out_path) + ".journal"), {
+            "input": str(input_path), "output": str(out_path), "encoding": args.encoding, "attachments": args.attachments,
+            "json": str(json_path) if json_path else None, "jsonl": args.jsonl,
+            "hashes": str(hashes_path) if hashes_enabled else None,
+            "index": str(index_path) if index_path else None,
+            **({"sqlite": str(sqlite_path)} if sqlite_path else {}),
+            **({"attachments_dir": str(store_path)} if store_path else {}),
+            "dedupe": args.dedupe,
+        })
+        try:
+            resumed = journal.load()
+        except JournalMismatch as e:
+            print(f"[ERROR] {e}; delete it or run without --resume")
+            reporter.close()
+            return 2
+        if resumed:
+            print(f"[INFO] Resuming   : {len(journal.done)} source(s) already done ({journal.path})")
+    reporter.set_total(sum(sizes.values()), done=sum(sizes.get(k, 0) for k in journal.done) if resumed else 0)
 
-        # .msg
-        for idx, p in enumerate(msg_files, 1):
-            print(f"[INFO] (.msg {idx}/{len(msg_files)}) {p}")
-            try:
-                message = load_single_message(p)
-                rec = message_to_record(message)
-                write_record(out, rec, show_attachments=args.attachments)
-                json_records.append(rec)
-                processed += 1
-                _progress_emit(progress_path, {"phase": "processed", "kind": "msg", "file": rec["source"], "processed": processed})
-                _add_hash_row("message", rec["source"], rec["file"], None, rec.get("source_sha256"))
-                for a in rec.get("attachments", []) or []:
-                    _add_hash_row("attachment", rec["source"], a.get("filename",""), a.get("size"), a.get("sha256"))
-            except Exception:
-                errors += 1
-                out.write("="*90 + "\n")
-                out.write(f"ERROR reading {p} (.msg):\n")
-                out.write(traceback.format_exc())
-                out.write("="*90 + "\n\n")
-                print(f"[ERROR] Failed .msg: {p}")
-
-        # .eml
-        for idx, p in enumerate(eml_files, 1):
-            print(f"[INFO] (.eml {idx}/{len(eml_files)}) {p}")
-            try:
-                message = load_single_message(p)
-                rec = message_to_record(message)
-                write_record(out, rec, show_attachments=args.attachments)
-                json_records.append(rec)
-                processed += 1
-                _progress_emit(progress_path, {"phase": "processed", "kind": "eml", "file": rec["source"], "processed": processed})
-                _add_hash_row("message", rec["source"], rec["file"], None, rec.get("source_sha256"))
-                for a in rec.get("attachments", []) or []:
-                    _add_hash_row("attachment", rec["source"], a.get("filename",""), a.get("size"), a.get("sha256"))
-            except Exception:
+    # A fresh run rebuilds the index; a resumed one keeps it (adds are keyed by source,
+    # so messages re-read after the last checkpoint replace their earlier entries).
+    index: Optional[SearchIndex] = None
+    if index_path:
+        try:
+            index = SearchIndex(index_path, reset=not resumed)
+        except Exception as e:
+            print(f"[WARN] Could not open search index, continuing without it: {e}")
+
+    # With --resume the seen-set has to outlive the process, so it always goes to disk.
+    seen: Optional[SeenSet] = None
+    seen_path: Optional[Path] = None
+    if args.dedupe:
+        seen_path = Path(args.dedupe_db).expanduser().resolve() if args.dedupe_db else (Path(str(out_path) + ".dedupe.sqlite") if journal else None)
+        seen = SeenSet(seen_path, reset=not resumed)
+
+    processed = journal.counters.get("processed", 0) if resumed else 0
+    errors = journal.counters.get("errors", 0) if resumed else 0
+    duplicates = journal.counters.get("duplicates", 0) if resumed else 0
+    offsets: Dict[str, Any] = journal.offsets if resumed else {}
+    index_failed = False
+    dupes_file = None
+    dupes_writer = None
+    # Attachments referenced by written messages, and the distinct blobs behind them.
+    blob_refs = 0
+    blobs: set = set()
+
+    def _add_index(rec: Dict[str, Any], path: Path, locator: Optional[str] = None):
+        nonlocal index_failed
+        if index is None or index_failed: return
+        try:
+            with timed("index"):
+                index.add(rec, path=path, locator=locator)
+        except Exception as e:
+            index_failed = True
+            print(f"[WARN] Could not update search index: {e}")
+
+    def _sync_index():
+        # Rows of sources the journal is about to mark done must survive a crash.
+        nonlocal index_failed
+        if index is None or index_failed: return
+        try:
+            index.sync()
+        except Exception as e:
+            index_failed = True
+            print(f"[WARN] Could not update search index: {e}")
+
+    def _note_blobs(rec: Dict[str, Any]):
+        nonlocal blob_refs
+        for a in rec.get("attachments") or []:
+            if a.get("blob"):
+                blob_refs += 1
+                blobs.add(a["blob"])
+
+    def _duplicate_of(key: Optional[str], source: str) -> Optional[str]:
+        # The kept source if ``source`` is a duplicate (counted and logged), else None.
+        nonlocal duplicates, dupes_file, dupes_writer
+        if seen is None or key is None: return None
+        with timed("dedupe"):
+            kept = seen.check(key, source)
+        if kept is None: return None
+        duplicates += 1
+        if dupes_writer is None:
+            if restore_file(dupes_path, offsets.get("duplicates")):
+                dupes_file = open(dupes_path, "a", newline="", encoding="utf-8")
+                dupes_writer = csv.writer(dupes_file)
+            else:
+                dupes_file = open(dupes_path, "w", newline="", encoding="utf-8")
+                dupes_writer = csv.writer(dupes_file)
+                dupes_writer.writerow(["key_type", "key", "kept_source", "duplicate_source"])
+        dupes_writer.writerow([args.dedupe, key, kept, source])
+        return kept
+
+    def _hashed(items: Iterable[Tuple[str, int, Optional[int], Path]]) -> Iterator[Tuple[str, int, Optional[int], Path, Optional[str], bool]]:
+        # --dedupe sha256 only needs the file bytes, so a file whose digest already belongs to
+        # an earlier one is never parsed. This runs ahead of the writer, so it only looks;
+        # the duplicate is recorded and reported by the writing loop, in input order.
+        first: Dict[str, str] = {}
+        for kind, idx, total, p in items:
+            digest = None
+            if args.dedupe == "sha256":
+                try:
+                    with timed("hash"):
+                        digest = file_sha256(p)
+                except OSError:
+                    pass  # left to the parser to report
+            source = str(p)
+            taken = digest is not None and (first.setdefault(digest, source) != source or seen.owner(digest) not in (None, source))
+            yield kind, idx, total, p, digest, not taken
+
+    # Timers stay no-ops unless --metrics is given; workers send their timings back per file.
+    metrics: Optional[Metrics] = Metrics() if metrics_path else None
+    activate(metrics)
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def _sink_failed(sink: Sink, exc: Exception):
+        print(f"[WARN] Could not write {sink.label}: {exc}")
+
+    # Each record is written to every output in one pass. The text file is created up
+    # front; the JSON sidecar and hashes CSV only once there is something to write, and
+    # a failure in either one is reported and that output dropped.
+    pipeline = ExportPipeline(on_error=_sink_failed, store=_store)
+    pipeline.add(TextSink(out_path, source_label=str(base_label), show_attachments=args.attachments, encoding=args.encoding, resume=offsets.get("txt")))
+    json_sink: Optional[JsonSink] = None
+    if json_path:
+        json_resume = (offsets["json"], offsets["json_count"]) if offsets.get("json") is not None and json_path.exists() else None
+        json_sink = pipeline.add(JsonSink(json_path, source_label=str(input_path), output_text_path=out_path, lines=args.jsonl, resume=json_resume, lazy=True, required=False))
+    hash_sink: Optional[HashCsvSink] = None
+    if hashes_enabled and hashes_path:
+        hash_sink = pipeline.add(HashCsvSink(hashes_path, resume=offsets.get("hashes"), lazy=True, blobs=_store is not None, required=False))
+    sqlite_sink: Optional[SqliteSink] = None
+    if sqlite_path:
+        try:
+            sqlite_sink = pipeline.add(SqliteSink(sqlite_path, resume=offsets.get("sqlite"), required=False))
+        except Exception as e:
+            print(f"[WARN] Could not open SQLite database, continuing without it: {e}")
+    if journal is not None:
+        journal.start(resumed=resumed)
+
+    def _sync_outputs() -> Dict[str, Any]:
+        state = pipeline.sync()
+        if dupes_file is not None:
+            state["duplicates"] = fsync_file(dupes_file)
+        elif "duplicates" in offsets:
+            state["duplicates"] = offsets["duplicates"]
+        if seen is not None:
+            seen.sync()
+        _sync_index()
+        return state
+
+    def _done(key: str, *, force: bool = False):
+        # Called once per finished source (or PST message), whatever its outcome.
+        reporter.advance(sizes.pop(key, 0), processed=processed)
+        if journal is None: return
+        journal.mark(key)
+        with timed("checkpoint"):
+            journal.checkpoint(_sync_outputs, {"processed": processed, "errors": errors, "duplicates": duplicates}, force=force)
+
+    with pipeline:
+        todo = (item for item in _message_items() if not (journal and str(item[3]) in journal.done))
+        todo, todo_parsed = itertools.tee(_hashed(todo))
+        loaded = _iter_loaded((item[3] for item in todo_parsed if item[5]), args.jobs, with_content=pipeline.needs_content, measure=metrics is not None)
+        for kind, idx, total, p, digest, parsed in todo:
+            print(f"[INFO] (.{kind} {_counter(idx, total)}) {p}")
+            kept = _duplicate_of(digest, str(p)) if digest is not None else None
+            _, rec, err, timings = next(loaded) if parsed else (p, None, None, None)
+            if kept is not None:
+                print(f"[INFO]   Duplicate of {kept}, skipped")
+                _done(str(p))
+                continue
+            if timings is not None:
+                metrics.file(p, _file_size(p), timings)
+            if rec is None:
                 errors += 1
-                out.write("="*90 + "\n")
-                out.write(f"ERROR reading {p} (.eml):\n")
-                out.write(traceback.format_exc())
-                out.write("="*90 + "\n\n")
-                print(f"[ERROR] Failed .eml: {p}")
+                pipeline.write_error(f"ERROR reading {p} (.{kind}):", err or "")
+                print(f"[ERROR] Failed .{kind}: {p}")
+                _done(str(p))
+                continue
+            kept = _duplicate_of(dedupe_key(rec, args.dedupe), str(p)) if args.dedupe not in (None, "sha256") else None
+            if kept is not None:
+                print(f"[INFO]   Duplicate of {kept}, skipped")
+                _done(str(p))
+                continue
+            pipeline.write(rec)
+            _add_index(rec, p)
+            if _store is not None: _note_blobs(rec)
+            processed += 1
+            reporter.advance(kind=kind, file=rec["source"], processed=processed)
+            _done(str(p))
+        loaded.close()  # shuts the worker pool down before the stores are read
+
+        if streamed is not None:
+            print(f"[INFO] Found {len(msg_files)} .msg, {len(eml_files)} .eml, {len(pst_files)} .pst/.ost")
+            reporter.emit({"phase": "scan", "msg": len(msg_files), "eml": len(eml_files), "pst": len(pst_files), "bytes": 0})
 
         # .pst
         if pst_files:
-            if not has_embedded_readpst():
-                print("[WARN] PST files present but embedded readpst is not available in this build. Skipping PST.")
-                _progress_emit(progress_path, {"phase": "pst_skipped"})
-            else:
-                _progress_emit(progress_path, {"phase": "pst_start"})
-                for idx, pst in enumerate(pst_files, 1):
-                    print(f"[INFO] (.pst {idx}/{len(pst_files)}) {pst}")
-                    try:
-                        mailbox = load_mailbox(pst)
-                        extracted_messages = mailbox.all_messages()
-                        _progress_emit(progress_path, {"phase": "pst_extracted", "pst": str(pst), "count": len(extracted_messages)})
-                        print(f"[INFO]   Extracted {len(extracted_messages)} message(s) from {pst.name}")
-                        for eidx, message in enumerate(extracted_messages, 1):
-                            try:
-                                rec = message_to_record(message)
-                                write_record(out, rec, show_attachments=args.attachments)
-                                json_records.append(rec)
-                                processed += 1
-                                _progress_emit(progress_path, {"phase": "processed", "kind": "pst-eml", "file": rec["source"], "processed": processed})
-                                _add_hash_row("message", rec["source"], rec["file"], None, rec.get("source_sha256"))
-                                for a in rec.get("attachments", []) or []:
-                                    _add_hash_row("attachment", rec["source"], a.get("filename",""), a.get("size"), a.get("sha256"))
-                            except Exception:
-                                errors += 1
-                                out.write("="*90 + "\n")
-                                out.write(f"ERROR reading extracted message from {pst}:\n")
-                                out.write(traceback.format_exc())
-                                out.write("="*90 + "\n\n")
-                                print(f"[ERROR] Failed extracted message from {pst}")
-                    except Exception:
-                        errors += 1
-                        out.write("="*90 + "\n")
-                        out.write(f"ERROR converting PST {pst}:\n")
-                        out.write(traceback.format_exc())
-                        out.write("="*90 + "\n\n")
-                        print(f"[ERROR] Failed .pst: {pst}")
-
-    if (not args.no_json) and json_records:
+            # PST/OST are read natively; readpst is only needed for stores the native reader rejects.
+            reporter.emit({"phase": "pst_start"})
+            for idx, pst in enumerate(pst_files, 1):
+                print(f"[INFO] ({pst.suffix.lower()} {idx}/{len(pst_files)}) {pst}")
+                if journal and str(pst) in journal.done:
+                    print("[INFO]   Already done in the resumed run")
+                    continue
+                extracted = 0
+                occurrences: Dict[str, int] = {}
+                pst_started = time.perf_counter()
+
+                def _pst_error(where: str, exc: Exception, pst: Path = pst):
+                    # A damaged message or folder is skipped; the rest of the store is still read.
+                    nonlocal errors
+                    errors += 1
+                    pipeline.write_error(f"ERROR reading {where} from {pst}:", f"{type(exc).__name__}: {exc}")
+                    print(f"[ERROR] Failed {where} in {pst}")
+
+                try:
+                    # Messages are yielded as they are read, natively or while readpst is still running.
+                    for message in iter_pst_messages(pst, keep_attachment_data=pipeline.needs_attachment_data, on_error=_pst_error):
+                        extracted += 1
+                        # Messages before the last checkpoint are re-read but not re-written. The key
+                        # must not depend on read order, which readpst does not keep between runs.
+                        name = pst_message_key(message)
+                        occurrences[name] = occurrence = occurrences.get(name, 0) + 1
+                        key = f"{pst}#{name}" if occurrence == 1 else f"{pst}#{name}#{occurrence}"
+                        if journal and key in journal.done:
+                            continue
+                        try:
+                            rec = pipeline.convert(message)
+                            kept = _duplicate_of(dedupe_key(rec, args.dedupe), rec["source"]) if args.dedupe else None
+                            if kept is not None:
+                                print(f"[INFO]   Duplicate of {kept}, skipped: {rec['source']}")
+                                _done(key)
+                                continue
+                            pipeline.write(rec)
+                            if _store is not None: _note_blobs(rec)
+                            # Messages read through readpst have no nid; they are found again by content.
+                            _add_index(rec, pst, name)
+                            processed += 1
+                            reporter.advance(kind="pst-eml", file=rec["source"], processed=processed)
+                        except Exception:
+                            errors += 1
+                            pipeline.write_error(f"ERROR reading extracted message from {pst}:", traceback.format_exc())
+                            print(f"[ERROR] Failed extracted message from {pst}")
+                        _done(key)
+                    if metrics is not None:
+                        metrics.file(pst, _file_size(pst), {TOTAL: time.perf_counter() - pst_started})
+                    reporter.emit({"phase": "pst_extracted", "pst": str(pst), "count": extracted})
+                    print(f"[INFO]   Extracted {extracted} message(s) from {pst.name}")
+                except Exception:
+                    errors += 1
+                    pipeline.write_error(f"ERROR converting PST {pst}:", traceback.format_exc())
+                    print(f"[ERROR] Failed .pst: {pst}")
+                _done(str(pst), force=True)
+
+    if json_sink is not None and json_sink.count and not json_sink.failed:
+        print(f"[INFO] JSON log written: {json_path}")
+    if hash_sink is not None and hash_sink.count and not hash_sink.failed:
+        print(f"[INFO] Hashes CSV written: {hashes_path}")
+    if sqlite_sink is not None and not sqlite_sink.failed:
+        print(f"[INFO] SQLite database written: {sqlite_path} ({sqlite_sink.messages} message(s))")
+
+    if _store is not None:
+        print(f"[INFO] Attachment store: {_store.root} ({blob_refs} attachment(s), {len(blobs)} distinct)")
+        _store = None
+
+    if dupes_file is not None:
         try:
-            with open(json_path, "w", encoding="utf-8") as jf:
-                json.dump({"source_root": str(input_path), "output_text": str(out_path), "messages": json_records}, jf, ensure_ascii=False, indent=2)
-            print(f"[INFO] JSON log written: {json_path}")
+            dupes_file.close()
         except Exception as e:
-            print(f"[WARN] Could not write JSON log: {e}")
+            print(f"[WARN] Could not write duplicates CSV: {e}")
+    elif resumed and dupes_path:
+        restore_file(dupes_path, offsets.get("duplicates"))
+    if seen is not None:
+        keys, groups = seen.stats()
+        seen.close()
+        if seen_path and not args.dedupe_db:
+            for leftover in (seen_path, Path(str(seen_path) + "-wal"), Path(str(seen_path) + "-shm")):
+                try: leftover.unlink()
+                except OSError: pass
+        print(f"[INFO] Dedupe: {duplicates} duplicate(s) skipped in {groups} group(s) out of {keys} distinct key(s)" + (f"; listed in {dupes_path}" if duplicates else ""))
 
-    if hashes_enabled and hashes_path and hash_rows:
+    if index is not None:
+        try:
+            with timed("index"):
+                index.close(optimize=True)
+            if not index_failed: print(f"[INFO] Search index written: {index_path} ({index.added} message(s) indexed)")
+        except Exception as e:
+            print(f"[WARN] Could not write search index: {e}")
+
+    if journal is not None:
+        journal.finish()
+
+    if _cache is not None:
+        try:
+            _cache.close()
+        except Exception as e:
+            print(f"[WARN] Could not update cache: {e}")
+        print(f"[INFO] Cache: {_cache.summary()}")
+        _cache = None
+
+    if profiler is not None:
+        profiler.disable()
+        try:
+            profiler.dump_stats(str(profile_path))
+            print(f"[INFO] Profile written: {profile_path} (view with: python -m pstats {profile_path})")
+        except Exception as e:
+            print(f"[WARN] Could not write profile: {e}")
+    if metrics is not None:
+        activate(None)
+        metrics.counters.update(processed=processed, errors=errors, duplicates=duplicates)
         try:
-            with open(hashes_path, "w", newline="", encoding="utf-8") as cf:
-                w = csv.writer(cf)
-                w.writerow(["type","parent_source","filename","size","sha256"])
-                w.writerows(hash_rows)
-            print(f"[INFO] Hashes CSV written: {hashes_path}")
+            metrics.write(metrics_path, input=str(input_path), output=str(out_path), jobs=args.jobs)
+            top = ", ".join(f"{name} {stage['total_s']:.2f}s" for name, stage in list(metrics.summary()["stages"].items())[:3])
+            print(f"[INFO] Metrics written: {metrics_path} (top stages: {top or 'none'})")
         except Exception as e:
-            print(f"[WARN] Could not write hashes CSV: {e}")
+            print(f"[WARN] Could not write metrics: {e}")
 
-    _progress_emit(progress_path, {"phase": "done", "processed": processed, "errors": errors})
+    reporter.emit({"phase": "done", "processed": processed, "errors": errors, **({"duplicates": duplicates} if args.dedupe else {})})
+    reporter.close()
     print(f"[DONE] Wrote {processed} message(s) to: {out_path}")
     if errors: print(f"[NOTE] {errors} item(s) had errors. Details are logged in the output file.")
     return 0
 
 if __name__ == "__main__":
+    # Needed for --jobs in frozen (PyInstaller) builds on Windows
+    import multiprocessing
+    multiprocessing.freeze_support()
     raise SystemExit(main())
@@ -0,0 +1,140 @@
+"""Cross-source duplicate detection for the CLI's ``--dedupe`` mode.
+
+A message is a duplicate when its key was already seen earlier in the run. Three keys
+are available:
+
+* ``message-id``: the Message-ID header. Messages without one (no ``@``) are never
+  treated as duplicates.
+* ``digest``: a hash of the normalized sender, recipients, date, subject, body and
+  attachment hashes. It also matches copies that were re-encoded (.msg vs .eml vs PST).
+* ``sha256``: the SHA-256 of the source file, so only byte-identical .msg/.eml files
+  match. It is checked before parsing. Messages inside a PST have no file hash and are
+  always kept.
+
+Keys are stored as 16-byte BLAKE2b digests mapped to the first source that had them. The
+seen-set lives in memory, or in SQLite for runs too large for that.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .metrics import timed_call
+
+DEDUPE_KEYS = ("message-id", "digest", "sha256")
+
+_WS = re.compile(r"\s+")
+
+
+def _norm(value: Optional[str]) -> str:
+    return _WS.sub(" ", value or "").strip().casefold()
+
+
+@timed_call("dedupe")
+def dedupe_key(record: Mapping[str, Any], mode: str) -> Optional[str]:
+    """The duplicate key of a legacy record, or None if it has none under ``mode``."""
+    if mode == "message-id":
+        msgid = (record.get("message_id") or "").strip().strip("<>").strip()
+        return msgid.casefold() if "@" in msgid else None
+    if mode == "sha256":
+        return record.get("source_sha256") or None
+    if mode == "digest":
+        h = hashlib.sha256()
+        for field in ("from", "to", "cc", "date", "subject"):
+            h.update(_norm(record.get(field)).encode("utf-8", "surrogatepass") + b"\0")
+        h.update(_WS.sub(" ", record.get("body") or "").strip().encode("utf-8", "surrogatepass") + b"\0")
+        for sha in sorted(a.get("sha256") or "" for a in record.get("attachments") or []):
+            h.update(sha.encode("ascii") + b"\0")
+        return h.hexdigest()
+    raise ValueError(f"Unknown dedupe key: {mode}")
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _compact(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class SeenSet:
+    """Keys seen so far and the first source of each.
+
+    With ``db_path`` the set is kept in SQLite and survives the process, so a resumed
+    run still recognizes what it wrote before the interruption. ``reset`` empties it.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, *, reset: bool = False):
+        self.db_path = Path(db_path) if db_path else None
+        self._mem: Dict[bytes, List[Any]] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending = 0
+        if self.db_path is None:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if reset:
+            self._db.execute("DROP TABLE IF EXISTS seen")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY, source TEXT NOT NULL, dups INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def check(self, key: str, source: str) -> Optional[str]:
+        """Record ``key`` for ``source``. Returns the source that had it first if this is a
+        duplicate, else None. Re-checking the source that owns a key is not a duplicate."""
+        ck = _compact(key)
+        if self._db is None:
+            entry = self._mem.get(ck)
+            if entry is None:
+                self._mem[ck] = [source, 0]
+                return None
+            if entry[0] == source:
+                return None
+            entry[1] += 1
+            return entry[0]
+        row = self._db.execute("SELECT source FROM seen WHERE key = ?", (ck,)).fetchone()
+        if row is None:
+            self._db.execute("INSERT INTO seen (key, source) VALUES (?, ?)", (ck, source))
+        elif row[0] != source:
+            self._db.execute("UPDATE seen SET dups = dups + 1 WHERE key = ?", (ck,))
+        self._pending += 1
+        if self._pending >= 5000:
+            self.sync()
+        return None if row is None or row[0] == source else row[0]
+
+    def owner(self, key: str) -> Optional[str]:
+        """The source that had ``key`` first, without recording anything."""
+        ck = _compact(key)
+        if self._db is None:
+            entry = self._mem.get(ck)
+            return entry[0] if entry is not None else None
+        row = self._db.execute("SELECT source FROM seen WHERE key = ?", (ck,)).fetchone()
+        return row[0] if row is not None else None
+
+    def sync(self) -> None:
+        if self._db is not None:
+            self._db.commit()
+            self._pending = 0
+
+    def stats(self) -> Tuple[int, int]:
+        """``(keys, groups)``: distinct keys, and how many of them had duplicates."""
+        if self._db is None:
+            return len(self._mem), sum(1 for _, dups in self._mem.values() if dups)
+        keys, groups = self._db.execute("SELECT COUNT(*), COALESCE(SUM(dups > 0), 0) FROM seen").fetchone()
+        return keys, groups
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
@@ -1,6 +1,5 @@
 from __future__ import annotations
-import sys, os, tempfile, subprocess, platform, shutil, re, hashlib
-import base64
+import sys, os, tempfile, subprocess, platform, shutil, hashlib, time
 from pathlib import Path
 try:
     from importlib.resources import files as pkg_files, as_file
@@ -12,6 +11,9 @@ except ImportError:  # Python < 3.9
         as_file = None  # type: ignore
 
 from .extractors_readpst_fallback import resolve_readpst_path
+from .htmltext import html_to_text as _html_to_text
+from .ingest import SourceBuffer, read_source
+from .metrics import span, timed
 
 try:
     import extract_msg
@@ -33,11 +35,8 @@ def clean_text(s):
 
 def html_to_text(html: str) -> str:
     if not html: return ""
-    textish = re.sub(r"(?is)<(script|style).*?</\1>", "", html)
-    textish = re.sub(r"(?is)<br\s*/?>", "\n", textish)
-    textish = re.sub(r"(?is)</p\s*>", "\n\n", textish)
-    textish = re.sub(r"(?is)<.*?>", "", textish)
-    return clean_text(textish)
+    with timed("html_to_text"):
+        return clean_text(_html_to_text(html))
 
 def try_getattr(obj, name, default=None):
     try: return getattr(obj, name)
@@ -45,22 +44,43 @@ def try_getattr(obj, name, default=None):
 
 def _sha256_bytes(data: bytes | None) -> str | None:
     if data is None: return None
-    h = hashlib.sha256(); h.update(data); return h.hexdigest()
+    with timed("hash"):
+        h = hashlib.sha256(); h.update(data); return h.hexdigest()
 
-def _sha256_file(path: Path) -> str | None:
+# ---- .msg ----
+def _msg_attachment_bytes(a):
+    data = None
     try:
-        h = hashlib.sha256()
-        with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(1024*1024), b""): h.update(chunk)
-        return h.hexdigest()
+        data = a.data
     except Exception:
-        return None
+        try:
+            data = a.getData()
+        except Exception:
+            data = None
+    # embedded messages come back as Message objects rather than bytes
+    return data if isinstance(data, (bytes, bytearray)) else None
 
-# ---- .msg ----
-def extract_from_msg(msg_path: Path) -> dict:
+def extract_from_msg(msg_path: Path, *, keep_content: bool = False, source: SourceBuffer | None = None) -> dict:
+    """Extract a .msg into a legacy record.
+
+    The file is read once (or taken from ``source``) and that buffer feeds both the OLE
+    parser and ``source_sha256``. Attachments carry size, SHA-256 and a ``locator`` that
+    :func:`read_attachment_bytes` resolves later; the raw bytes are only kept (as
+    ``content``) with ``keep_content``.
+    """
     if extract_msg is None:
         raise RuntimeError("The 'extract-msg' package is not installed.")
-    m = extract_msg.Message(str(msg_path))
+    if source is None:
+        source = read_source(msg_path)
+    with timed("parse_msg"):
+        m = extract_msg.Message(source.data)
+        try:
+            return _msg_record(m, msg_path, source, keep_content)
+        finally:
+            try: m.close()
+            except Exception: pass
+
+def _msg_record(m, msg_path: Path, source: SourceBuffer, keep_content: bool) -> dict:
 
     date_raw = try_getattr(m, "date", "")
     date_ = date_raw.isoformat() if hasattr(date_raw, "isoformat") else (str(date_raw) if date_raw is not None else "")
@@ -83,21 +103,16 @@ def extract_from_msg(msg_path: Path) -> dict:
         body = html_to_text(body_html)
 
     atts = []
-    for a in (getattr(m, "attachments", None) or []):
+    for idx, a in enumerate(getattr(m, "attachments", None) or []):
         name = getattr(a, "longFilename", None) or getattr(a, "shortFilename", None) or getattr(a, "filename", None) or "attachment"
-        data = None
-        try:
-            data = a.data
-        except Exception:
-            try:
-                data = a.getData()
-            except Exception:
-                data = None
-        size = len(data) if isinstance(data, (bytes, bytearray)) else None
+        data = _msg_attachment_bytes(a)
+        size = len(data) if data is not None else None
         sha = _sha256_bytes(data) if data else None
         content_type = getattr(a, "mimetype", None)
-        content_b64 = base64.b64encode(data).decode("ascii") if data else None
-        atts.append({"filename": name, "size": size, "sha256": sha, "content_type": content_type, "content_base64": content_b64})
+        att = {"filename": name, "size": size, "sha256": sha, "content_type": content_type, "locator": f"attachment:{idx}"}
+        if keep_content and data is not None:
+            att["content"] = bytes(data)
+        atts.append(att)
 
     return {
         "file": msg_path.name,
@@ -110,17 +125,22 @@ def extract_from_msg(msg_path: Path) -> dict:
         "body": clean_text(body) if body else "(No Body Extracted)",
         "body_html": body_html or None,
         "attachments": atts,
-        "source_sha256": _sha256_file(msg_path),
+        "source_sha256": source.sha256,
     }
 
 
 # ---- .eml ----
-def extract_from_eml(eml_path: Path) -> dict:
-    import email
+def extract_from_eml(eml_path: Path, *, keep_content: bool = False, source: SourceBuffer | None = None) -> dict:
+    """Extract a .eml into a legacy record; see :func:`extract_from_msg` for buffer and attachment handling."""
+    if source is None:
+        source = read_source(eml_path)
+    with timed("parse_eml"):
+        return _eml_record(eml_path, source, keep_content)
+
+def _eml_record(eml_path: Path, source: SourceBuffer, keep_content: bool) -> dict:
     from email import policy
     from email.parser import BytesParser
-    with open(eml_path, "rb") as f:
-        msg = BytesParser(policy=policy.default).parse(f)
+    msg = BytesParser(policy=policy.default).parsebytes(source.data)
 
     date_ = clean_text(msg.get("Date"))
     sender = clean_text(msg.get("From"))
@@ -151,10 +171,10 @@ def extract_from_eml(eml_path: Path) -> dict:
         elif ctype == "text/enriched":
             enriched = msg.get_content()
     if not body_text:
-        body_text = enriched or "(No Body Extracted)"
+        body_text = enriched or html_to_text(body_html or "") or "(No Body Extracted)"
 
     atts = []
-    for part in msg.walk():
+    for idx, part in enumerate(msg.walk()):
         if part.get_content_disposition() == "attachment":
             name = part.get_filename() or "attachment"
             payload = None
@@ -165,8 +185,10 @@ def extract_from_eml(eml_path: Path) -> dict:
             size = len(payload) if isinstance(payload, (bytes, bytearray)) else None
             sha = _sha256_bytes(payload) if payload else None
             content_type = part.get_content_type()
-            content_b64 = base64.b64encode(payload).decode("ascii") if payload else None
-            atts.append({"filename": name, "size": size, "sha256": sha, "content_type": content_type, "content_base64": content_b64})
+            att = {"filename": name, "size": size, "sha256": sha, "content_type": content_type, "locator": f"part:{idx}"}
+            if keep_content and payload is not None:
+                att["content"] = payload
+            atts.append(att)
 
     return {
         "file": eml_path.name,
@@ -179,10 +201,40 @@ def extract_from_eml(eml_path: Path) -> dict:
         "body": body_text,
         "body_html": body_html,
         "attachments": atts,
-        "source_sha256": _sha256_file(eml_path),
+        "source_sha256": source.sha256,
     }
 
 
+# ---- lazy attachment content ----
+def read_attachment_bytes(source_path: Path, locator: str) -> bytes | None:
+    """Re-open ``source_path`` and return the attachment identified by ``locator``.
+
+    Locators are the ``attachment:<n>`` (.msg) and ``part:<n>`` (.eml MIME walk index)
+    strings produced by the extractors.
+    """
+    kind, _, raw_idx = (locator or "").partition(":")
+    idx = int(raw_idx)
+    if kind == "attachment":
+        if extract_msg is None:
+            raise RuntimeError("The 'extract-msg' package is not installed.")
+        m = extract_msg.Message(str(source_path))
+        try:
+            return _msg_attachment_bytes(m.attachments[idx])
+        finally:
+            try: m.close()
+            except Exception: pass
+    if kind == "part":
+        from email import policy
+        from email.parser import BytesParser
+        with open(source_path, "rb") as f:
+            msg = BytesParser(policy=policy.default).parse(f)
+        for pidx, part in enumerate(msg.walk()):
+            if pidx == idx:
+                return part.get_payload(decode=True)
+        return None
+    raise ValueError(f"Unknown attachment locator: {locator!r}")
+
+
 # ---- PST (embedded readpst) ----
 def has_embedded_readpst() -> bool:
     p = _get_embedded_readpst_path()
@@ -276,7 +328,9 @@ def iter_eml_paths_from_pst(pst_path: Path, temp_root: Path):
     out_dir = temp_root / (pst_path.stem + "_readpst")
     out_dir.mkdir(parents=True, exist_ok=True)
     cmd = [str(readpst), "-r", "-D", "-e", "-o", str(out_dir), str(pst_path)]
+    started = time.perf_counter()
     proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    span("readpst", time.perf_counter() - started)
     if proc.returncode != 0:
         raise RuntimeError(
             f"readpst failed ({proc.returncode})\n"
@@ -285,3 +339,74 @@ def iter_eml_paths_from_pst(pst_path: Path, temp_root: Path):
         )
     for p in sorted(out_dir.rglob("*.eml")):
         yield p
+
+def _readpst_failure(returncode: int, log_dir: Path) -> RuntimeError:
+    def _tail(name: str) -> str:
+        try: return (log_dir / name).read_bytes()[-64*1024:].decode(errors="replace")
+        except Exception: return ""
+    return RuntimeError(
+        f"readpst failed ({returncode})\n"
+        f"STDOUT:\n{_tail('readpst.stdout')}\n\n"
+        f"STDERR:\n{_tail('readpst.stderr')}"
+    )
+
+def _in_readpst_order(paths):
+    """Sort finished readpst output into the order it was written.
+
+    Files close in write order, and readpst numbers the messages of each folder 1.eml,
+    2.eml, ..., which breaks ties between files closed within one timestamp tick.
+    """
+    keyed = []
+    for p in paths:
+        try: mtime_ns = p.stat().st_mtime_ns
+        except FileNotFoundError: continue
+        keyed.append((mtime_ns, str(p.parent), int(p.stem) if p.stem.isdigit() else 0, p.name, p))
+    keyed.sort(key=lambda k: k[:4])
+    return [k[-1] for k in keyed]
+
+def iter_eml_paths_from_pst_streaming(pst_path: Path, temp_root: Path, poll_interval: float = 0.2):
+    """Yield .eml files from readpst as soon as each one is complete, while readpst keeps running.
+
+    readpst writes one message file at a time and closes it before creating the next, so
+    once a scan finds a file that was not there on the previous scan, every file the
+    previous scan found is finished. Files are yielded in the order readpst wrote them.
+    Callers are expected to delete each path once consumed, which keeps both the directory
+    scans here and the temp-disk footprint small.
+    """
+    readpst = _stage_readpst_to_temp()
+    out_dir = temp_root / (pst_path.stem + "_readpst")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cmd = [str(readpst), "-r", "-D", "-e", "-o", str(out_dir), str(pst_path)]
+    # Logs go to files rather than pipes so a chatty readpst can never block on a full pipe.
+    started = time.perf_counter()
+    with open(temp_root / "readpst.stdout", "wb") as so, open(temp_root / "readpst.stderr", "wb") as se:
+        proc = subprocess.Popen(cmd, stdout=so, stderr=se)
+    seen = set()
+    pending = set()  # found by the previous scan, possibly still being written
+    try:
+        while True:
+            # Checked before scanning: after an exit, the scan sees every file readpst wrote.
+            running = proc.poll() is None
+            fresh = {p for p in out_dir.rglob("*.eml") if p not in seen and p not in pending}
+            if fresh or not running:
+                # Something new was created, so everything found before it is closed.
+                ready = _in_readpst_order(pending)
+                pending = fresh
+                if not running:
+                    ready += _in_readpst_order(pending)
+                    pending = set()
+                for p in ready:
+                    seen.add(p)
+                    yield p
+            if not running:
+                # Measured to when the exit was noticed, so it can lag behind a slow consumer.
+                span("readpst", time.perf_counter() - started)
+                break
+            if not fresh:
+                time.sleep(poll_interval)
+        if proc.returncode != 0:
+            raise _readpst_failure(proc.returncode, temp_root)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
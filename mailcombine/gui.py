@@ -1,5 +1,5 @@
 from __future__ import annotations
-import sys, json, time, tempfile, threading, traceback
+import sys, traceback
 from pathlib import Path
 
 from PySide6.QtWidgets import (
@@ -30,27 +30,28 @@ def log_line(text: str):
 
 class Worker(QThread):
     done = Signal(int)
+    # Progress events from the CLI (see mailcombine.progress), delivered on the GUI thread.
+    progress = Signal(dict)
     def __init__(self, input_path: str, output_path: str,
                  show_attachments: bool, write_json: bool,
-                 write_hashes: bool, progress_path: str, hashes_csv: str | None):
+                 write_hashes: bool, hashes_csv: str | None):
         super().__init__()
         self.input_path = input_path
         self.output_path = output_path
         self.show_attachments = show_attachments
         self.write_json = write_json
         self.write_hashes = write_hashes
-        self.progress_path = progress_path
         self.hashes_csv = hashes_csv
 
     def run(self):
-        argv = ["-i", self.input_path, "-o", self.output_path, "--progress-file", self.progress_path]
+        argv = ["-i", self.input_path, "-o", self.output_path]
         if self.show_attachments: argv.append("--attachments")
         if not self.write_json: argv.append("--no-json")
         if self.write_hashes:
             argv.append("--hashes")
             if self.hashes_csv: argv.extend(["--hashes-path", self.hashes_csv])
         try:
-            rc = cli_main(argv)
+            rc = cli_main(argv, progress=self.progress.emit)
         except SystemExit as e:
             rc = int(e.code)
         except Exception as e:
@@ -101,7 +102,7 @@ class App(QWidget):
         self.out_btn.clicked.connect(self.pick_output)
         self.run_btn.clicked.connect(self.run_task)
 
-        self._stop_poll = threading.Event()
+        self._pst_mode = False
 
     def show_input_menu(self):
         self.in_menu.exec(self.in_btn.mapToGlobal(self.in_btn.rect().bottomLeft()))
@@ -126,69 +127,47 @@ class App(QWidget):
         if path: self.out_edit.setText(path)
 
     def run_task(self):
-        import tempfile, time
         from pathlib import Path
         inp = self.in_edit.text().strip()
         outp = self.out_edit.text().strip() or str(Path.cwd() / "combined_emails.txt")
-        self.progress_path = str(Path(tempfile.gettempdir()) / f"mailcombine_progress_{int(time.time())}.jsonl")
         hashes_path = str(Path(outp).with_suffix("").as_posix() + "_hashes.csv") if self.hashes_cb.isChecked() else None
 
         self.worker = Worker(inp, outp, self.attach_cb.isChecked(), self.json_cb.isChecked(),
-                             self.hashes_cb.isChecked(), self.progress_path, hashes_path)
+                             self.hashes_cb.isChecked(), hashes_path)
         self.run_btn.setEnabled(False)
         self.worker.done.connect(self.on_done)
+        self.worker.progress.connect(self.on_progress)
+        self._pst_mode = False
+        self.set_busy(True)
         self.worker.start()
         self.log.append("[INFO] Started…")
-        self._stop_poll.clear()
-        threading.Thread(target=self.poll_progress, daemon=True).start()
 
-    def poll_progress(self):
-        from pathlib import Path
-        total_known = None; processed = 0; pst_mode = False
-        self.set_busy(True)
-        last_text = ""
-        while not self._stop_poll.is_set():
-            try:
-                p = Path(self.progress_path)
-                if p.exists():
-                    data = p.read_text("utf-8")
-                    if data != last_text:
-                        last_text = data
-                        for line in data.splitlines():
-                            try: msg = json.loads(line)
-                            except Exception: continue
-                            if msg.get("phase") == "scan":
-                                total_known = int(msg.get("msg", 0)) + int(msg.get("eml", 0))
-                                processed = 0; pst_mode = False
-                                self.log_append(f"[SCAN] msg={msg.get('msg',0)} eml={msg.get('eml',0)} pst={msg.get('pst',0)}")
-                                self.set_busy(total_known <= 0)
-                                if total_known > 0: self.update_progress(processed, total_known)
-                            elif msg.get("phase") == "processed":
-                                processed += 1
-                                if not pst_mode and total_known and total_known > 0:
-                                    self.update_progress(processed, total_known)
-                                else:
-                                    self.set_busy(True)
-                            elif msg.get("phase") == "pst_start":
-                                pst_mode = True; self.set_busy(True); self.log_append("[INFO] Converting PST…")
-                            elif msg.get("phase") == "pst_extracted":
-                                self.log_append(f"[PST] Extracted {msg.get('count',0)} from {msg.get('pst','')}")
-                            elif msg.get("phase") == "pst_skipped":
-                                self.log_append("[WARN] PST skipped (no embedded readpst).")
-                            elif msg.get("phase") == "done":
-                                self.set_busy(False); self.progress.setValue(100)
-                                self.log_append(f"[DONE] processed={msg.get('processed',0)} errors={msg.get('errors',0)}")
-                                self._stop_poll.set(); break
-            except Exception as e:
-                log_line("[poll_progress] " + repr(e))
-            time.sleep(0.2)
+    def on_progress(self, msg: dict):
+        phase = msg.get("phase")
+        if phase == "scan":
+            self.log_append(f"[SCAN] msg={msg.get('msg',0)} eml={msg.get('eml',0)} pst={msg.get('pst',0)}")
+            self.set_busy(not msg.get("bytes"))
+        elif phase == "processed":
+            # PST stores only count as done once finished, so the bar would stall inside one.
+            if msg.get("percent") is not None and not self._pst_mode:
+                self.update_progress(msg["percent"], msg.get("eta_s"))
+            else:
+                self.set_busy(True)
+        elif phase == "pst_start":
+            self._pst_mode = True; self.set_busy(True); self.log_append("[INFO] Converting PST…")
+        elif phase == "pst_extracted":
+            self.log_append(f"[PST] Extracted {msg.get('count',0)} from {msg.get('pst','')}")
+        elif phase == "done":
+            self.set_busy(False); self.progress.setValue(100); self.progress.setFormat("%p%")
+            self.log_append(f"[DONE] processed={msg.get('processed',0)} errors={msg.get('errors',0)}")
 
     def set_busy(self, busy: bool):
         self.progress.setRange(0, 0) if busy else self.progress.setRange(0, 100)
 
-    def update_progress(self, processed, total):
-        pct = max(0, min(100, int(processed * 100 / max(1, total))))
-        self.progress.setValue(pct)
+    def update_progress(self, percent: float, eta_s: float | None = None):
+        self.set_busy(False)
+        self.progress.setValue(max(0, min(100, int(percent))))
+        self.progress.setFormat(f"%p% — about {_format_eta(eta_s)} left" if eta_s is not None else "%p%")
 
     def log_append(self, text: str):
         self.log.append(text)
@@ -196,7 +175,12 @@ class App(QWidget):
     def on_done(self, rc: int):
         self.log.append(f"[EXIT] Code {rc}")
         self.run_btn.setEnabled(True)
-        self._stop_poll.set()
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60: return f"{seconds}s"
+    if seconds < 3600: return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
 
 def main():
     # Ensure frozen multiprocessing works on Windows
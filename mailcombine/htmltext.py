@@ -0,0 +1,207 @@
+from __future__ import annotations
+import re
+from html import unescape
+from typing import List, Optional
+
+# Tags that start a new line (block-level); <p> additionally leaves a blank line, like the
+# old regex converter did for </p>.
+_BLOCK_TAGS = frozenset(
+    "address article aside blockquote caption center dd div dl dt fieldset figcaption figure footer form "
+    "h1 h2 h3 h4 h5 h6 header hr li main nav ol pre section table tbody thead tfoot tr ul".split()
+)
+_CELL_TAGS = frozenset(("td", "th"))
+# Their content is never text.
+_SKIP_TAGS = frozenset(("script", "style", "title", "template"))
+
+_TAGS_WITH_EFFECT = _BLOCK_TAGS | _CELL_TAGS | _SKIP_TAGS | {"br", "p"}
+
+_TAG_NAME = re.compile(r"/?([A-Za-z][A-Za-z0-9:-]*)")
+# Fast path: text up to the next '<' plus a well-formed tag, matched in one call. Neither
+# part can cross a '<', so a failed match costs no more than the text it would have eaten.
+_TEXT_AND_TAG = re.compile(r"([^<]*)<(/?)([A-Za-z][A-Za-z0-9:-]*)[^<>]*>")
+_WS = re.compile(r"[ \t\n\r\f\v]+")
+_CLOSERS = {name: re.compile(r"</%s\s*>" % name, re.I) for name in _SKIP_TAGS}
+
+# Longest tail kept back between feeds while looking for a closer (``</template >``).
+_HOLD = 16
+# An ``&`` further than this from the end of the buffer can't start a split entity.
+_ENTITY_MAX = 40
+
+
+class HtmlToText:
+    """Incremental HTML to plain text converter.
+
+    Each input character is examined a bounded number of times, so the cost is linear in
+    the size of the input however malformed it is: an unclosed ``<`` or ``<!--`` or
+    ``<script>`` is resolved with a single forward search. Whitespace is collapsed as a
+    browser would (except inside ``<pre>``), block-level elements become line breaks,
+    entities are decoded, and script/style/title content is dropped.
+
+    Feed text in chunks of any size, then call :meth:`close` for the result.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._out: List[str] = []
+        self._skip: Optional[str] = None  # name of the element whose content is being dropped
+        self._pre = 0
+        self._newlines = 2  # trailing newlines in the output; start of text counts as a block boundary
+        self._space = True  # output ends in whitespace
+        self._scanned = 0  # how far a pending tag at the start of the buffer was already searched
+
+    def feed(self, data: str) -> None:
+        self._buf += data
+        self._run(final=False)
+
+    def close(self) -> str:
+        self._run(final=True)
+        text = "".join(self._out)
+        self._out = []
+        return text.strip()
+
+    # ---- output ----
+    def _text(self, raw: str) -> None:
+        if not raw:
+            return
+        if "&" in raw:
+            raw = unescape(raw)
+        if self._pre:
+            self._out.append(raw)
+            stripped = raw.rstrip("\n")
+            self._newlines = len(raw) - len(stripped) + (0 if stripped else self._newlines)
+            self._space = raw[-1].isspace()
+            return
+        text = _WS.sub(" ", raw).replace("\xa0", " ")
+        if self._space and text.startswith(" "):
+            text = text[1:]
+        if text:
+            self._out.append(text)
+            self._newlines = 0
+            self._space = text.endswith(" ")
+
+    def _trim(self) -> None:
+        # Drop spaces before a line break, even when they arrived in several pieces.
+        if self._newlines or not self._space:
+            return
+        while self._out and self._out[-1].endswith(" "):
+            self._out[-1] = self._out[-1].rstrip(" ")
+            if self._out[-1]:
+                break
+            self._out.pop()
+
+    def _break(self, count: int) -> None:
+        """Make sure the output ends with at least ``count`` newlines."""
+        self._trim()
+        if self._newlines < count:
+            self._out.append("\n" * (count - self._newlines))
+            self._newlines = count
+        self._space = True
+
+    def _tag(self, name: str, closing: bool) -> None:
+        if name == "br":
+            self._trim()
+            self._out.append("\n")
+            self._newlines += 1
+            self._space = True
+        elif name == "p":
+            self._break(2)
+        elif name in _BLOCK_TAGS:
+            self._break(1)
+            if name == "pre":
+                self._pre = max(0, self._pre + (-1 if closing else 1))
+        elif name in _CELL_TAGS and not closing and not self._space:
+            self._out.append(" ")
+            self._space = True
+        elif name in _SKIP_TAGS and not closing:
+            self._skip = name
+
+    # ---- scanning ----
+    def _run(self, *, final: bool) -> None:
+        buf = self._buf
+        pos = 0
+        end = len(buf)
+        # A tag or comment left open by the previous feed starts at 0 and was searched up
+        # to here; without this, a huge unterminated one fed in small chunks would be
+        # rescanned. It only applies to that construct: once ``pos`` moves on it is dropped.
+        scanned, self._scanned = self._scanned, 0
+        while pos < end:
+            if self._skip is not None:
+                closer = _CLOSERS[self._skip].search(buf, pos)
+                if closer is None:
+                    # Browsers treat the rest of the document as script; keep only a tail
+                    # long enough to hold a closer split across feeds.
+                    pos = end if final else max(pos, end - _HOLD)
+                    break
+                self._skip = None
+                pos = closer.end()
+                continue
+            if scanned and pos:
+                scanned = 0
+            if not scanned:
+                fast = _TEXT_AND_TAG.match(buf, pos)
+                if fast is not None:
+                    text, closing, name = fast.groups()
+                    if text:
+                        self._text(text)
+                    name = name.lower()
+                    if name in _TAGS_WITH_EFFECT:
+                        self._tag(name, bool(closing))
+                    pos = fast.end()
+                    continue
+            lt = buf.find("<", pos)
+            if lt < 0:
+                cut = end
+                if not final:
+                    amp = buf.rfind("&", max(pos, end - _ENTITY_MAX))
+                    if amp >= 0 and ";" not in buf[amp:]:
+                        cut = amp  # the entity may continue in the next chunk
+                self._text(buf[pos:cut])
+                pos = cut
+                break
+            self._text(buf[pos:lt])
+            pos = lt
+            if buf.startswith("<!--", lt):
+                close = buf.find("-->", max(lt + 4, scanned))
+                if close >= 0:
+                    pos = close + 3
+                    continue
+                if not final:
+                    self._scanned = max(0, end - lt - 2)
+                    break
+                gt = buf.find(">", lt + 4)
+                # Unterminated comment: end it at the next '>' like the regex converter did.
+                pos = gt + 1 if gt >= 0 else end
+                continue
+            nxt = buf[lt + 1:lt + 2]
+            if not nxt:
+                if final:
+                    self._text("<")
+                    pos = end
+                break
+            if not (nxt.isalpha() or nxt in "/!?"):
+                self._text("<")  # a bare '<' in text, e.g. "a < b"
+                pos = lt + 1
+                continue
+            gt = buf.find(">", max(lt + 1, scanned))
+            if gt < 0:
+                if not final:
+                    self._scanned = end - lt
+                    break
+                # No '>' anywhere after this point, so nothing after it can be a tag.
+                self._text(buf[lt:])
+                pos = end
+                break
+            match = _TAG_NAME.match(buf, lt + 1, gt)
+            if match is not None:
+                self._tag(match.group(1).lower(), buf[lt + 1] == "/")
+            pos = gt + 1
+        self._buf = buf[pos:]
+
+
+def html_to_text(html: str) -> str:
+    """Plain text for an HTML body (see :class:`HtmlToText`)."""
+    if not html:
+        return ""
+    converter = HtmlToText()
+    converter.feed(html)
+    return converter.close()
@@ -0,0 +1,27 @@
+from __future__ import annotations
+import hashlib
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from .metrics import timed
+
+
+class SourceBuffer(NamedTuple):
+    """One source file read into memory exactly once, with its SHA-256 already computed."""
+    path: Path
+    data: bytes
+    sha256: Optional[str]
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+def read_source(path: Path) -> SourceBuffer:
+    """Read ``path`` in a single pass; the parser and the hash both work off the returned buffer."""
+    path = Path(path)
+    with timed("read"), open(path, "rb") as f:
+        data = f.read()
+    with timed("hash"):
+        sha256 = hashlib.sha256(data).hexdigest()
+    return SourceBuffer(path, data, sha256)
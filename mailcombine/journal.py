@@ -0,0 +1,114 @@
+"""Checkpoint journal that lets an interrupted CLI run resume where it stopped.
+
+The journal is JSON Lines. The first line records the run's options. Each later line is
+a checkpoint: the sources completed since the previous checkpoint, the byte length of
+every output at that moment, and the running counters. Outputs are fsync'd before the
+checkpoint line is written, so a checkpoint never points past data that actually reached
+the disk. A torn final line (power loss mid-write) is ignored on load.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set
+
+# 2: messages of a store are keyed by pst_message_key, not by their read position.
+JOURNAL_VERSION = 2
+
+
+class JournalMismatch(ValueError):
+    """The journal on disk was written by a run with different options."""
+
+
+class RunJournal:
+    def __init__(self, path: Path, options: Dict[str, Any], *, interval: float = 2.0):
+        self.path = Path(path)
+        self.options = options
+        self.interval = interval
+        self.done: Set[str] = set()
+        self.offsets: Dict[str, Any] = {}
+        self.counters: Dict[str, int] = {}
+        self._new: list = []
+        self._last = time.monotonic()
+        self._fh = None
+
+    def load(self) -> bool:
+        """Read an existing journal. Returns True when there is something to resume."""
+        if not self.path.exists():
+            return False
+        with open(self.path, "r", encoding="utf-8") as fh:
+            lines = fh.read().splitlines()
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break  # torn write at the tail; everything before it is intact
+        if not entries:
+            return False
+        head = entries[0]
+        if head.get("journal") != JOURNAL_VERSION or head.get("options") != self.options:
+            raise JournalMismatch(f"{self.path} was written by a run with different options")
+        for entry in entries[1:]:
+            self.done.update(entry.get("done", []))
+            self.offsets = entry.get("offsets", {})
+            self.counters = entry.get("counters", {})
+        return True
+
+    def start(self, *, resumed: bool) -> None:
+        if resumed:
+            self._fh = open(self.path, "a", encoding="utf-8")
+            return
+        self._fh = open(self.path, "w", encoding="utf-8")
+        self._append({"journal": JOURNAL_VERSION, "options": self.options})
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def mark(self, key: str) -> None:
+        self.done.add(key)
+        self._new.append(key)
+
+    def checkpoint(self, sync: Callable[[], Dict[str, Any]], counters: Dict[str, int], *, force: bool = False) -> None:
+        """Record a checkpoint if ``interval`` has passed (or ``force``).
+
+        ``sync`` must flush and fsync every output and return their current byte offsets.
+        """
+        if not self._new or (not force and time.monotonic() - self._last < self.interval):
+            return
+        offsets = sync()
+        self._append({"done": self._new, "offsets": offsets, "counters": counters})
+        self._new = []
+        self._last = time.monotonic()
+
+    def finish(self) -> None:
+        """The run completed: the journal is no longer needed."""
+        self.close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+def restore_file(path: Path, offset: Optional[int]) -> bool:
+    """Cut ``path`` back to ``offset`` bytes. Returns False if there is nothing to keep."""
+    if offset is None or not path.exists():
+        return False
+    os.truncate(path, offset)
+    return True
+
+
+def fsync_file(fh) -> int:
+    """Flush and fsync an open output and return its size in bytes."""
+    fh.flush()
+    os.fsync(fh.fileno())
+    return fh.tell()
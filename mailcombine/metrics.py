@@ -0,0 +1,267 @@
+"""Stage timers behind the CLI's ``--metrics`` and the RPC ``stats`` method.
+
+Library code wraps each pipeline stage in ``with timed("parse_eml"):``. When nothing is
+recording, that returns a shared no-op context manager. Otherwise it records *exclusive*
+time: a timer nested inside another is subtracted from its parent, so the stage totals
+add up to at most the wall time and show where it actually went.
+
+Timings go to the active :class:`Metrics` of the process, or, inside :func:`capture`, to
+a per-file dict. The CLI uses the second form in worker processes and sends the dict back
+with the record.
+
+Spans are wall-clock durations that may overlap the stages, such as a readpst run or an
+RPC request. They are recorded with :meth:`Metrics.span`.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import heapq
+import json
+import random
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+_active: Optional["Metrics"] = None
+_capture: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("mailcombine_metrics_capture", default=None)
+_open: contextvars.ContextVar[Optional["_Timer"]] = contextvars.ContextVar("mailcombine_metrics_open", default=None)
+_NULL = contextlib.nullcontext()
+
+# Keys of a captured dict that are not stages (e.g. the file's total load time).
+TOTAL = "_total"
+
+
+def _record(stage: str, seconds: float) -> None:
+    files = _capture.get()
+    if files is not None:
+        files[stage] = files.get(stage, 0.0) + seconds
+    elif _active is not None:
+        _active.add(stage, seconds)
+
+
+class _Timer:
+    __slots__ = ("stage", "start", "child", "token")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "_Timer":
+        self.child = 0.0
+        self.token = _open.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+        _open.reset(self.token)
+        parent = _open.get()
+        if parent is not None:
+            parent.child += elapsed
+        _record(self.stage, elapsed - self.child)
+
+
+def timed(stage: str):
+    """Context manager timing ``stage``; a no-op unless something is recording."""
+    if _active is None and _capture.get() is None:
+        return _NULL
+    return _Timer(stage)
+
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+
+def timed_call(stage: str) -> Callable[[_F], _F]:
+    """Decorator form of :func:`timed` for functions that are a stage as a whole."""
+    def decorate(fn: _F) -> _F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _active is None and _capture.get() is None:
+                return fn(*args, **kwargs)
+            with _Timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorate
+
+
+def span(name: str, seconds: float) -> None:
+    """Record a wall-clock span with the active :class:`Metrics`, if any."""
+    if _active is not None:
+        _active.span(name, seconds)
+
+
+@contextlib.contextmanager
+def capture() -> Iterator[Dict[str, float]]:
+    """Collect the stage timings of the enclosed work into a dict instead of the active
+    :class:`Metrics`. ``TOTAL`` is set to the wall time of the block."""
+    timings: Dict[str, float] = {}
+    token = _capture.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings[TOTAL] = time.perf_counter() - start
+        _capture.reset(token)
+
+
+def activate(metrics: Optional["Metrics"]) -> None:
+    """Make ``metrics`` the process-wide recorder (None switches recording off)."""
+    global _active
+    _active = metrics
+
+
+def active() -> Optional["Metrics"]:
+    return _active
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# Samples kept per stage for the percentiles. Below this every sample is kept, so small
+# runs get exact figures; past it a uniform reservoir stands in for the rest.
+RESERVOIR = 4096
+
+
+class _Samples:
+    """Running count, total and max of a stage, plus a bounded reservoir of samples."""
+
+    __slots__ = ("count", "total", "max", "reservoir", "_random")
+
+    def __init__(self, rng: random.Random):
+        self.count = 0
+        self.total = 0.0
+        self.max = float("-inf")
+        self.reservoir: "array[float]" = array("d")
+        self._random = rng
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if len(self.reservoir) < RESERVOIR:
+            self.reservoir.append(seconds)
+        else:
+            slot = self._random.randrange(self.count)
+            if slot < RESERVOIR:
+                self.reservoir[slot] = seconds
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.reservoir)
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 4),
+            "mean_ms": round(1000 * self.total / self.count, 3),
+            "p50_ms": round(1000 * _percentile(ordered, 0.50), 3),
+            "p90_ms": round(1000 * _percentile(ordered, 0.90), 3),
+            "p99_ms": round(1000 * _percentile(ordered, 0.99), 3),
+            "max_ms": round(1000 * self.max, 3),
+        }
+
+
+class Metrics:
+    """Aggregated timings for one run (or one RPC server). Thread-safe.
+
+    Memory does not grow with the run: each stage keeps exact count, total and max, and
+    its percentiles come from at most :data:`RESERVOIR` samples. The slowest files are
+    kept in a bounded heap.
+    """
+
+    def __init__(self, *, top: int = 20):
+        self.top = top
+        self.started = time.perf_counter()
+        self.counters: Dict[str, int] = {}
+        self._stages: Dict[str, _Samples] = {}
+        self._spans: Dict[str, _Samples] = {}
+        self._random = random.Random(0)
+        self._slowest: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._stages.get(stage)
+            if samples is None:
+                samples = self._stages[stage] = _Samples(self._random)
+            samples.add(seconds)
+
+    def span(self, name: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._spans.get(name)
+            if samples is None:
+                samples = self._spans[name] = _Samples(self._random)
+            samples.add(seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def time(self, stage: str):
+        """Time a stage directly into this object (whether or not it is the active one)."""
+        return _Timer(stage) if _active is self else _DirectTimer(self, stage)
+
+    def merge(self, timings: Dict[str, float]) -> None:
+        """Add the stages of a :func:`capture` dict, one sample each."""
+        for stage, seconds in timings.items():
+            if not stage.startswith("_"):
+                self.add(stage, seconds)
+
+    def file(self, path: Any, size: Optional[int], timings: Dict[str, float]) -> None:
+        """Merge a captured dict and consider the file for the slowest-N list."""
+        self.merge(timings)
+        seconds = timings.get(TOTAL, 0.0)
+        entry = {
+            "path": str(path),
+            "size": size,
+            "seconds": round(seconds, 4),
+            "stages": {k: round(v, 4) for k, v in sorted(timings.items(), key=lambda kv: -kv[1]) if not k.startswith("_")},
+        }
+        with self._lock:
+            self._seq += 1
+            item = (seconds, self._seq, entry)
+            if len(self._slowest) < self.top:
+                heapq.heappush(self._slowest, item)
+            elif seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            wall = time.perf_counter() - self.started
+            stages = {name: s.summary() for name, s in self._stages.items()}
+            spans = {name: s.summary() for name, s in self._spans.items()}
+            slowest = [entry for _, _, entry in sorted(self._slowest, reverse=True)]
+            counters = dict(self.counters)
+        for stage in stages.values():
+            stage["share"] = round(stage["total_s"] / wall, 4) if wall else None
+        measured = sum(s["total_s"] for s in stages.values())
+        return {
+            "wall_s": round(wall, 4),
+            "unattributed_s": round(max(0.0, wall - measured), 4),
+            "stages": dict(sorted(stages.items(), key=lambda kv: -kv[1]["total_s"])),
+            "spans": spans,
+            "counters": counters,
+            "slowest_files": slowest,
+        }
+
+    def write(self, path: Path, **extra: Any) -> None:
+        data = dict(extra, **self.summary())
+        Path(path).write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+class _DirectTimer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: Metrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self) -> "_DirectTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.add(self.stage, time.perf_counter() - self.start)
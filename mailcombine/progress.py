@@ -0,0 +1,163 @@
+"""Progress events for ``mailcombine.cli``: producer and consumers.
+
+Events are JSON objects with a ``phase`` (``scan``, ``processed``, ``pst_start``,
+``pst_extracted``, ``done``). They are written as JSON Lines to ``--progress-file`` and/or
+handed to an in-process callback (the GUI runs the CLI in a thread and forwards them as a
+Qt signal).
+
+:class:`ProgressReporter` keeps the file open for the whole run. It coalesces the
+per-message ``processed`` events to at most one per ``interval``. Every other phase goes
+out immediately, after any pending ``processed`` event, so order is preserved.
+``processed`` events carry byte-weighted progress (``bytes_done``, ``bytes_total``,
+``percent``) and an ``eta_s`` based on the throughput of the current run. With
+``--stream`` the total is never known up front: ``scan`` comes after the .msg/.eml
+files and ``percent`` is null.
+
+:class:`ProgressTail` reads a progress file incrementally from a byte offset, so polling
+costs only the new bytes.
+"""
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import timed
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+DEFAULT_INTERVAL = 0.25
+
+
+class ProgressReporter:
+    """Write progress events to ``path`` and/or pass them to ``callback``.
+
+    Errors from either sink are swallowed: progress must never fail a conversion.
+    """
+
+    def __init__(self, path: Optional[Path] = None, callback: Optional[ProgressCallback] = None, *, interval: float = DEFAULT_INTERVAL):
+        self.path = Path(path) if path else None
+        self.callback = callback
+        self.interval = interval
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self._bytes_start = 0
+        self._started = time.monotonic()
+        self._last = 0.0
+        self._pending: Optional[Dict[str, Any]] = None
+        self._file = None
+        if self.path is not None:
+            try:
+                self._file = open(self.path, "w", encoding="utf-8")
+            except OSError:
+                self._file = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None or self.callback is not None
+
+    def set_total(self, bytes_total: int, *, done: int = 0) -> None:
+        """Set the work to do in bytes; ``done`` is already finished (e.g. by a resumed run)
+        and does not count towards the throughput used for the ETA."""
+        self.bytes_total = bytes_total
+        self.bytes_done = self._bytes_start = done
+        self._started = time.monotonic()
+
+    def emit(self, payload: Dict[str, Any]) -> None:
+        """Send a milestone event now, after any coalesced ``processed`` event."""
+        self._flush_pending()
+        self._send(payload)
+
+    def advance(self, nbytes: int = 0, **fields: Any) -> None:
+        """Account for ``nbytes`` of finished input and queue a ``processed`` event.
+
+        ``fields`` (e.g. ``processed``, ``file``) replace those of the queued event, so a
+        burst of calls collapses into one event carrying the latest values.
+        """
+        self.bytes_done += nbytes
+        if not self.enabled:
+            return
+        self._pending = dict(self._pending or {}, phase="processed", **fields)
+        if time.monotonic() - self._last >= self.interval:
+            self._flush_pending()
+
+    def close(self) -> None:
+        self._flush_pending()
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def __enter__(self) -> "ProgressReporter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _flush_pending(self) -> None:
+        if self._pending is None:
+            return
+        payload, self._pending = self._pending, None
+        payload.update(self._position())
+        self._send(payload)
+
+    def _position(self) -> Dict[str, Any]:
+        done, total = self.bytes_done, self.bytes_total
+        position: Dict[str, Any] = {"bytes_done": done, "bytes_total": total, "percent": round(100.0 * done / total, 1) if total else None}
+        elapsed = time.monotonic() - self._started
+        rate = (done - self._bytes_start) / elapsed if elapsed > 0 else 0.0
+        position["eta_s"] = round((total - done) / rate, 1) if rate > 0 and total >= done else None
+        return position
+
+    def _send(self, payload: Dict[str, Any]) -> None:
+        self._last = time.monotonic()
+        if self._file is not None:
+            try:
+                with timed("progress"):
+                    self._file.write(json.dumps(payload, ensure_ascii=False) + "\n")
+                    self._file.flush()
+            except (OSError, ValueError):
+                self._file = None
+        if self.callback is not None:
+            try:
+                self.callback(payload)
+            except Exception:
+                pass
+
+
+class ProgressTail:
+    """Incremental reader for a progress file that is still being written.
+
+    Each :meth:`read` returns only the events appended since the previous call. A trailing
+    partial line is kept until it is complete. If the file is replaced by a shorter one,
+    reading starts again from the top.
+    """
+
+    def __init__(self, path: Path, offset: int = 0):
+        self.path = Path(path)
+        self.offset = offset
+        self._partial = b""
+
+    def read(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, 2)
+                if f.tell() < self.offset:
+                    self.offset, self._partial = 0, b""
+                f.seek(self.offset)
+                chunk = f.read()
+        except OSError:
+            return []
+        self.offset += len(chunk)
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events
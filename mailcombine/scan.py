@@ -0,0 +1,102 @@
+"""Find input files under a directory without stat-ing every entry.
+
+``Path.rglob("*")`` followed by ``is_file()`` costs a stat per entry, and the caller gets
+nothing until the whole tree has been listed. :func:`walk_files` uses ``os.scandir``
+instead: names are filtered by suffix first, and the file type comes from the directory
+listing itself (``d_type``), so on most filesystems only symlinks are stat-ed. Directory
+listings run on a small thread pool ahead of the consumer, which hides the per-directory
+round trip of network shares, and paths are yielded while the walk is still going.
+
+Like ``rglob``, the walk does not descend into symlinked directories and skips
+directories it cannot read.
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Collection, Iterator, List, Optional, Tuple
+
+# Directories listed concurrently. Listing is I/O bound, so this is independent of CPUs.
+SCAN_WORKERS = 8
+
+Listing = Tuple[List[str], List[str]]
+
+
+def _suffix(name: str) -> str:
+    # Same rule as ``PurePath.suffix``: a leading dot does not start a suffix.
+    i = name.rfind(".")
+    return name[i:].lower() if 0 < i < len(name) - 1 else ""
+
+
+def _list_dir(path: str, suffixes: Collection[str]) -> Listing:
+    """``(file names, subdirectory names)`` of ``path``; files only if their suffix matches."""
+    files: List[str] = []
+    dirs: List[str] = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif _suffix(entry.name) in suffixes and entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, dirs
+
+
+def walk_files(root: Path, suffixes: Collection[str], *, ordered: bool = True, workers: int = SCAN_WORKERS) -> Iterator[Path]:
+    """Yield the files below ``root`` whose suffix (lower-cased) is in ``suffixes``.
+
+    With ``ordered`` the paths come in ``sorted()`` order, exactly as from
+    ``sorted(root.rglob("*"))``: each directory's entries are merged by name, depth first,
+    and subdirectories are listed ahead of time so the order costs no extra waiting.
+    Otherwise they come in whatever order the listings finish.
+    """
+    suffixes = {s.lower() for s in suffixes}
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan")
+    try:
+        if ordered:
+            yield from _walk_ordered(pool, str(root), suffixes)
+        else:
+            yield from _walk_unordered(pool, str(root), suffixes)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _walk_ordered(pool: ThreadPoolExecutor, root: str, suffixes: Collection[str]) -> Iterator[Path]:
+    # A stack of per-directory entry iterators; an entry carries the future of its own
+    # listing if it is a directory, None if it is a file.
+    stack: List[Iterator[Tuple[str, Optional["Future[Listing]"]]]] = [iter([(root, pool.submit(_list_dir, root, suffixes))])]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+        path, listing = entry
+        if listing is None:
+            yield Path(path)
+            continue
+        files, dirs = listing.result()
+        names = [(name, None) for name in files]
+        names += [(name, pool.submit(_list_dir, os.path.join(path, name), suffixes)) for name in dirs]
+        # normcase: Windows paths sort case-insensitively, as PureWindowsPath does.
+        names.sort(key=lambda item: os.path.normcase(item[0]))
+        stack.append(iter([(os.path.join(path, name), sub) for name, sub in names]))
+
+
+def _walk_unordered(pool: ThreadPoolExecutor, root: str, suffixes: Collection[str]) -> Iterator[Path]:
+    def listed(path: str) -> Tuple[str, Listing]:
+        return path, _list_dir(path, suffixes)
+
+    pending = {pool.submit(listed, root)}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, (files, dirs) = future.result()
+            pending.update(pool.submit(listed, os.path.join(path, name)) for name in dirs)
+            for name in files:
+                yield Path(path, name)
@@ -33,3 +33,9 @@ def write_header(out, source_root: str):
     )
     out.write(header)
 
+
+def write_error(out, heading: str, detail: str):
+    out.write(SEP + "\n")
+    out.write(heading + "\n")
+    out.write(detail)
+    out.write(SEP + "\n\n")
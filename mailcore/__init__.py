@@ -1,20 +1,25 @@
 """Shared mailcore package exposing neutral email data models."""
 
-from .models import Mailbox, Folder, Message, Attachment, BodyPart, HashInfo
+from .models import Mailbox, Folder, Message, MessageSummary, Attachment, BodyPart, HashInfo
 from .api import (
     load_messages_from_files,
     load_mailbox,
+    load_message_summary,
     load_single_message,
+    load_summaries,
 )
 
 __all__ = [
     "Mailbox",
     "Folder",
     "Message",
+    "MessageSummary",
     "Attachment",
     "BodyPart",
     "HashInfo",
     "load_messages_from_files",
     "load_mailbox",
+    "load_message_summary",
     "load_single_message",
+    "load_summaries",
 ]
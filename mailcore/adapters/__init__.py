@@ -1,11 +1,16 @@
 """Adapters bridging existing extractors into mailcore models."""
 
-from .eml import load_eml_message
-from .msg import load_msg_message
-from .pst import load_pst_mailbox
+from .eml import load_eml_message, load_eml_summary
+from .msg import load_msg_message, load_msg_summary
+from .pst import iter_pst_messages, load_pst_mailbox, load_pst_message, pst_message_key
 
 __all__ = [
     "load_eml_message",
     "load_msg_message",
+    "load_eml_summary",
+    "load_msg_summary",
     "load_pst_mailbox",
+    "iter_pst_messages",
+    "load_pst_message",
+    "pst_message_key",
 ]
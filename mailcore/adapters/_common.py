@@ -2,9 +2,12 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
+from sys import intern
 from typing import Any, Dict, Iterable, List, Optional
 
-from ..models import Attachment, BodyPart, HashInfo, Message
+from mailcombine.metrics import timed_call
+
+from ..models import Attachment, HashInfo, Message, MessageSummary
 
 
 def _try_parse_datetime(raw: Optional[str]) -> Optional[datetime]:
@@ -21,21 +24,30 @@ def _try_parse_datetime(raw: Optional[str]) -> Optional[datetime]:
         return None
 
 
+def _intern(value: Any) -> Any:
+    # Senders, recipients, content types and common filenames repeat across a mailbox;
+    # interning keeps one copy of each.
+    return intern(value) if type(value) is str else value
+
+
 def _split_addresses(value: Optional[str]) -> List[str]:
     if not value:
         return []
     parts = [p.strip() for p in value.replace(";", ",").split(",")]
-    return [p for p in parts if p]
+    return [intern(p) for p in parts if p]
 
 
-def record_to_message(record: Dict[str, Any], *, source_override: Optional[str] = None) -> Message:
+@timed_call("to_message")
+def record_to_message(record: Dict[str, Any], *, source_override: Optional[str] = None, source_path: Optional[Path] = None) -> Message:
+    """``source_path`` is the file the message was read from, when ``source`` names a
+    place inside a container rather than a file."""
     raw_source = record.get('source', record.get('file', ''))
-    source_path = Path(raw_source) if raw_source else None
+    record_path = Path(raw_source) if raw_source else None
     if source_override:
         source_str = source_override
     else:
         source_str = raw_source or ''
-    message_id = record.get('message_id') or (source_path.stem if source_path else source_str or 'message')
+    message_id = record.get('message_id') or (record_path.stem if record_path else source_str or 'message')
     body = record.get("body") or ""
 
     attachments_in = record.get("attachments") or []
@@ -45,34 +57,50 @@ def record_to_message(record: Dict[str, Any], *, source_override: Optional[str]
         attachments.append(
             Attachment(
                 id=str(att_id),
-                filename=att.get("filename") or att_id,
+                filename=_intern(att.get("filename") or att_id),
                 size=att.get("size"),
-                content_type=att.get("content_type"),
+                content_type=_intern(att.get("content_type")),
                 sha256=att.get("sha256"),
-                source_path=None,
+                source_path=att.get("source_path") or (record_path if att.get("locator") else None),
                 data_base64=att.get("content_base64"),
+                locator=att.get("locator"),
+                data=att.get("content"),
             )
         )
 
     hash_value = record.get("source_sha256")
     hashes = [HashInfo(algorithm="sha256", value=hash_value)] if hash_value else []
 
-    body_parts = [BodyPart(content_type="text/plain", content=body)] if body else []
-
     return Message(
         id=str(message_id),
         source=source_str,
-        source_path=source_path,
+        source_path=source_path or record_path,
         subject=record.get("subject") or "",
-        sender=record.get("from") or "",
+        sender=_intern(record.get("from") or ""),
         to=_split_addresses(record.get("to")),
         cc=_split_addresses(record.get("cc")),
         bcc=_split_addresses(record.get("bcc")),
         sent_at=_try_parse_datetime(record.get("date")),
         body_text=body or None,
         body_html=record.get("body_html"),
-        body_parts=body_parts,
         attachments=attachments,
-        headers={},
         hashes=hashes,
+        locator=record.get("locator"),
+    )
+
+
+def record_to_summary(record: Dict[str, Any]) -> MessageSummary:
+    """Build a :class:`MessageSummary` from a summary record (the header fields of a
+    legacy record plus ``attachment_count`` and ``size``)."""
+    raw_source = record.get("source", record.get("file", ""))
+    return MessageSummary(
+        source=raw_source or "",
+        source_path=Path(raw_source) if raw_source else None,
+        subject=record.get("subject") or "",
+        sender=_intern(record.get("from") or ""),
+        to=_split_addresses(record.get("to")),
+        sent_at=_try_parse_datetime(record.get("date")),
+        message_id=record.get("message_id") or "",
+        attachment_count=int(record.get("attachment_count") or 0),
+        size=record.get("size"),
     )
@@ -1,14 +1,163 @@
 """EML adapter bridging legacy extractor output into mailcore models."""
 from __future__ import annotations
 
+import re
+from email import policy
+from email.message import Message as EmailMessage
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
-from mailcombine.extractors import extract_from_eml
+from mailcombine.cache import ExtractionCache, cached_extract
+from mailcombine.extractors import clean_text, extract_from_eml
+from mailcombine.metrics import timed_call
 
-from ._common import record_to_message
-from ..models import Message
+from ._common import record_to_message, record_to_summary
+from ..models import Message, MessageSummary
 
+_HEADER_END = re.compile(rb"\r?\n\r?\n")
+# Headers a summary reads, and the subset the MIME walk needs on every part.
+_SUMMARY_FIELDS = frozenset({"subject", "from", "to", "date", "message-id", "content-type", "content-disposition"})
+_STRUCTURE_FIELDS = frozenset({"content-type", "content-disposition"})
+# message/rfc822 parts nest; deeper structures are not walked for the count.
+_MAX_DEPTH = 32
 
-def load_eml_message(path: Path) -> Message:
-    record = extract_from_eml(path)
+
+def load_eml_message(
+    path: Path, *, keep_attachment_data: bool = False, cache: Optional[ExtractionCache] = None
+) -> Message:
+    record = cached_extract(extract_from_eml, path, keep_content=keep_attachment_data, cache=cache)
     return record_to_message(record)
+
+
+def _split_head(data: bytes) -> Tuple[bytes, bytes]:
+    if data.startswith((b"\n", b"\r\n")):
+        return b"", data[data.index(b"\n") + 1:]
+    match = _HEADER_END.search(data)
+    if match is None:
+        return data, b""
+    return data[:match.start()], data[match.end():]
+
+
+def _scan_headers(head: bytes, wanted: frozenset) -> Dict[str, str]:
+    """First value of each ``wanted`` header, unfolded as the email package does."""
+    fields: Dict[str, str] = {}
+    current = None
+    for line in head.decode("ascii", "surrogateescape").splitlines():
+        if line[:1] in (" ", "\t"):
+            if current is not None:
+                fields[current] += line
+            continue
+        name, sep, value = line.partition(":")
+        name = name.strip().lower()
+        current = name if sep and name in wanted and name not in fields else None
+        if current is not None:
+            fields[current] = value.lstrip(" \t")
+    return fields
+
+
+def _structure(fields: Dict[str, str], default_type: str) -> EmailMessage:
+    # A bare compat32 message carrying only the headers the MIME walk looks at, so
+    # content-type defaults and parameter parsing match the full parse.
+    part = EmailMessage(policy.compat32)
+    part.set_default_type(default_type)
+    for name in _STRUCTURE_FIELDS:
+        if name in fields:
+            part[name] = fields[name]
+    return part
+
+
+def _mime_parts(body: bytes, boundary: str) -> List[bytes]:
+    """The parts of a multipart body, without preamble and epilogue."""
+    marker = b"--" + boundary.encode("ascii", "replace")
+    parts: List[bytes] = []
+    start = None
+    pos = 0
+    while True:
+        idx = body.find(marker, pos)
+        if idx < 0:
+            break
+        pos = idx + len(marker)
+        line_end = body.find(b"\n", pos)
+        if line_end < 0:
+            line_end = len(body)
+        rest = body[pos:line_end].rstrip(b" \t\r")
+        if (idx and body[idx - 1] != 0x0A) or rest not in (b"", b"--"):
+            continue  # not a delimiter line
+        if start is not None:
+            parts.append(body[start:idx])
+        if rest == b"--":
+            return parts
+        start = pos = line_end + 1
+    if start is not None:
+        parts.append(body[start:])  # unterminated: the last part runs to the end
+    return parts
+
+
+def _count_attachments(part: EmailMessage, body: bytes, depth: int = 0) -> int:
+    # Mirrors ``extract_from_eml``: every part of ``msg.walk()`` whose disposition is
+    # "attachment" counts, including parts of attached messages.
+    count = 1 if part.get_content_disposition() == "attachment" else 0
+    if depth >= _MAX_DEPTH:
+        return count
+    ctype = part.get_content_type()
+    if ctype.startswith("multipart/"):
+        boundary = part.get_boundary()
+        if boundary:
+            child_type = "message/rfc822" if ctype == "multipart/digest" else "text/plain"
+            for chunk in _mime_parts(body, boundary):
+                head, sub_body = _split_head(chunk)
+                count += _count_attachments(_structure(_scan_headers(head, _STRUCTURE_FIELDS), child_type), sub_body, depth + 1)
+    elif ctype == "message/rfc822":
+        head, sub_body = _split_head(body)
+        count += _count_attachments(_structure(_scan_headers(head, _STRUCTURE_FIELDS), "text/plain"), sub_body, depth + 1)
+    return count
+
+
+@lru_cache(maxsize=4096)
+def _address_header(name: str, value: str) -> str:
+    # Address lists are normalised by the header registry; the same sender or recipient
+    # list recurs throughout a mailbox, so the (slow) parse is cached.
+    return str(policy.default.header_factory(name, value))
+
+
+def _text_header(name: str, value: Optional[str]) -> str:
+    if value is None:
+        return ""
+    if value.isascii() and "=?" not in value:
+        return value  # nothing to decode: the registry would return it unchanged
+    return str(policy.default.header_factory(name, value))
+
+
+def summarize_eml(path: Path) -> Dict[str, Any]:
+    """Header fields and attachment count of a .eml without decoding any payload.
+
+    Only the headers a listing shows are read. The MIME tree is walked by scanning for
+    boundary lines, so bodies and attachments are never decoded or hashed. Values are
+    rendered as the full parse (``policy.default``) renders them.
+    """
+    data = path.read_bytes()
+    head, body = _split_head(data)
+    fields = _scan_headers(head, _SUMMARY_FIELDS)
+    date = fields.get("date")
+    try:
+        sent_at = parsedate_to_datetime(date) if date else None
+    except (TypeError, ValueError):
+        sent_at = None
+    return {
+        "file": path.name,
+        "source": str(path),
+        "date": sent_at.isoformat() if sent_at else clean_text(date),
+        "from": clean_text(_address_header("from", fields["from"]) if "from" in fields else None),
+        "to": clean_text(_address_header("to", fields["to"]) if "to" in fields else None),
+        "subject": clean_text(_text_header("subject", fields.get("subject"))),
+        "message_id": clean_text(_text_header("message-id", fields.get("message-id"))),
+        "attachment_count": _count_attachments(_structure(fields, "text/plain"), body),
+        "size": len(data),
+    }
+
+
+@timed_call("summarize")
+def load_eml_summary(path: Path) -> MessageSummary:
+    return record_to_summary(summarize_eml(Path(path)))
@@ -1,16 +1,267 @@
-"""MSG adapter bridging legacy extractor output into mailcore models."""
+"""MSG adapter: a lean reader over :mod:`.msgfile`, with extract_msg as the fallback.
+
+The lean path maps the compound file and reads only the streams a record needs. Files it
+does not reproduce exactly go through ``mailcombine.extractors.extract_from_msg``: ANSI
+(non-Unicode) strings, bodies that extract_msg would derive from RTF, embedded messages
+and other non-data attachments, and undecodable text. Both paths produce the same record.
+"""
 from __future__ import annotations
 
+import hashlib
+import html
+import os
+import struct
+from email import policy
+from email.header import decode_header
+from email.parser import HeaderParser
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
+
+from mailcombine.cache import ExtractionCache, cached_extract
+from mailcombine.extractors import clean_text, extract_from_msg, html_to_text, read_attachment_bytes
+from mailcombine.metrics import timed, timed_call
+
+from . import pstfile as P
+from ._common import record_to_message, record_to_summary
+from .msgfile import FILETIME_NULL_DATES, FILETIME_UNIX_EPOCH, PROPERTIES_STREAM, MsgFile, MsgFormatError
+from ..models import Message, MessageSummary
+
+try:  # extract_msg sniffs missing attachment types with python-magic when it is installed
+    import magic
+except ImportError:
+    magic = None
+
+# Set MAILCORE_MSG_BACKEND=extract_msg to bypass the lean reader.
+_BACKEND_ENV = "MAILCORE_MSG_BACKEND"
+
 
-from mailcombine.extractors import extract_from_msg
+class _Unsupported(Exception):
+    """The file needs something only extract_msg does; take the fallback path."""
 
-from ._common import record_to_message
-from ..models import Message
 
+_HEADER_PREFIX = "Microsoft Mail Internet Headers Version 2.0"
+MAPI_TO = 1
+# Recipient types extract_msg knows (sender, to, cc, bcc); others make it fail.
+_RECIPIENT_TYPES = range(4)
+# Errors that mean "this file is beyond the lean reader". IndexError is a LookupError, but
+# is named for the truncated tables and sector chains of a damaged file.
+_FALLBACK_ERRORS = (_Unsupported, MsgFormatError, UnicodeError, IndexError, LookupError, struct.error)
 
-def load_msg_message(path: Path) -> Message:
+
+def _use_lean() -> bool:
+    return os.environ.get(_BACKEND_ENV, "native").lower() != "extract_msg"
+
+
+def load_msg_message(
+    path: Path, *, keep_attachment_data: bool = False, cache: Optional[ExtractionCache] = None
+) -> Message:
     """Load a single .msg file into a :class:`Message`."""
-    record = extract_from_msg(path)
+    record = cached_extract(read_msg_record, path, keep_content=keep_attachment_data, cache=cache)
     return record_to_message(record)
+
+
+def _decode_rfc2047(value: str, errors: str = "replace") -> str:
+    value = value.replace("\r\n", "")
+    parts = []
+    for text, charset in decode_header(value):
+        if isinstance(text, bytes):
+            try:
+                text = text.decode(charset or "raw-unicode-escape", errors=errors)
+            except LookupError:
+                if errors == "strict":
+                    raise
+                text = text.decode("latin-1")  # unknown charset
+        parts.append(text)
+    return "".join(parts)
+
+
+def _one_line(value: str) -> str:
+    # extract_msg's recipient formatting: unfold, then collapse runs of spaces.
+    value = value.replace(" \r\n\t", " ").replace("\r\n\t ", " ").replace("\r\n\t", " ")
+    value = value.replace("\r\n", " ").replace("\r", " ").replace("\n", " ")
+    while "  " in value:
+        value = value.replace("  ", " ")
+    return value
+
+
+def _transport_headers(msg: MsgFile, errors: str = "replace"):
+    text = msg.string(P.PR_TRANSPORT_MESSAGE_HEADERS, errors=errors)
+    if not text:
+        return None
+    if text.startswith(_HEADER_PREFIX):
+        text = text[len(_HEADER_PREFIX):].lstrip()
+    return HeaderParser(policy=policy.compat32).parsestr(text)
+
+
+def _sender(msg: MsgFile, header, errors: str = "replace") -> Optional[str]:
+    sender = header["from"] if header is not None else None
+    if sender is not None:
+        return _decode_rfc2047(sender, errors)
+    name = msg.string(P.PR_SENDER_NAME, errors=errors)
+    address = msg.string(P.PR_SENDER_SMTP_ADDRESS, errors=errors)
+    if name is None:
+        return address
+    return f"{name} <{address}>" if address is not None else name
+
+
+def _recipient_type(msg: MsgFile, storage: str) -> int:
+    flags = msg.value(P.PR_RECIPIENT_TYPE, storage)
+    return flags & 0xF if isinstance(flags, int) else 0
+
+
+def _recipients(msg: MsgFile, kind: int, errors: str = "replace") -> str:
+    found = []
+    for storage in msg.recipients():
+        if _recipient_type(msg, storage) != kind:
+            continue
+        address = msg.string(P.PR_SMTP_ADDRESS, storage, errors=errors) or msg.string(P.PR_EMAIL_ADDRESS, storage, errors=errors)
+        found.append(f"{msg.string(P.PR_DISPLAY_NAME, storage, errors=errors)} <{address}>")
+    return "; ".join(found)
+
+
+def _to(msg: MsgFile, header, errors: str = "replace") -> Optional[str]:
+    to = _decode_rfc2047(header["to"], errors).replace(",", ";") if header is not None and header["to"] else None
+    if not to:
+        to = _recipients(msg, MAPI_TO, errors)
+    return _one_line(to) if to else to
+
+
+def summarize_msg(path: Path) -> Dict[str, Any]:
+    """Header fields and attachment count of a .msg, read from its property streams.
+
+    Fields follow extract_msg's precedence (transport headers first, then MAPI
+    properties), so they match what a full load reports. Bodies, recipients' other
+    properties and attachment data are never read.
+    """
+    with MsgFile(path) as msg:
+        header = _transport_headers(msg)
+        message_id = header["message-id"] if header is not None else None
+        if message_id is None:
+            message_id = msg.string(P.PR_INTERNET_MESSAGE_ID)
+
+        sent_at = msg.sent_at
+        return {
+            "file": path.name,
+            "source": str(path),
+            "date": sent_at.isoformat() if sent_at else "",
+            "from": clean_text(_sender(msg, header)),
+            "to": clean_text(_to(msg, header)),
+            "subject": clean_text(msg.string(P.PR_SUBJECT)),
+            "message_id": clean_text(message_id),
+            "attachment_count": len(msg.attachments()),
+            "size": path.stat().st_size,
+        }
+
+
+@timed_call("summarize")
+def load_msg_summary(path: Path) -> MessageSummary:
+    return record_to_summary(summarize_msg(Path(path)))
+
+
+def _html_body(msg: MsgFile, body: Optional[str]) -> Optional[bytes]:
+    html_body = msg.binary(P.PR_HTML)
+    if not html_body and body:
+        # extract_msg renders a missing HTML body from the plain text.
+        escaped = html.escape(body).replace("\r", "").replace("\n", "<br />")
+        html_body = f"<html><body>{escaped}</body></html>".encode("ascii", "xmlcharrefreplace")
+    return html_body
+
+
+def _attachment_record(msg: MsgFile, storage: str, idx: int, keep_content: bool) -> Dict[str, Any]:
+    data = msg.binary(P.PR_ATTACH_DATA, storage)
+    if data is None or not msg.cfb.exists(f"{storage}/{PROPERTIES_STREAM}"):
+        raise _Unsupported("attachment is not plain data")  # embedded message, OLE object, web link, ...
+    name = (
+        msg.string(P.PR_ATTACH_LONG_FILENAME, storage, errors="strict")
+        or msg.string(P.PR_ATTACH_FILENAME, storage, errors="strict")
+        or "attachment"
+    )
+    content_type = msg.string(P.PR_ATTACH_MIME_TAG, storage, errors="strict")
+    if not content_type and magic is not None:
+        try:
+            content_type = magic.from_buffer(data, mime=True)
+        except Exception:
+            pass
+    sha = None
+    if data:
+        with timed("hash"):
+            sha = hashlib.sha256(data).hexdigest()
+    att = {"filename": name, "size": len(data), "sha256": sha, "content_type": content_type, "locator": f"attachment:{idx}"}
+    if keep_content and data is not None:
+        att["content"] = data
+    return att
+
+
+def _lean_record(path: Path, keep_content: bool) -> Dict[str, Any]:
+    with timed("parse_msg"), MsgFile(path) as msg:
+        if not msg.unicode:
+            raise _Unsupported("ANSI strings")
+        with timed("hash"):
+            source_sha256 = hashlib.sha256(msg.cfb.buffer).hexdigest()
+
+        for storage in msg.recipients():
+            if _recipient_type(msg, storage) not in _RECIPIENT_TYPES or not msg.cfb.exists(f"{storage}/{PROPERTIES_STREAM}"):
+                raise _Unsupported("malformed recipient")
+        header = _transport_headers(msg, "strict")
+        sender = _sender(msg, header, "strict")
+        to = _to(msg, header, "strict")
+
+        raw_date = msg.filetime(P.PR_CLIENT_SUBMIT_TIME)
+        if msg.sent and raw_date is not None and not FILETIME_UNIX_EPOCH <= raw_date <= FILETIME_NULL_DATES:
+            raise _Unsupported("date outside extract_msg's regular range")
+        sent_at = msg.sent_at
+
+        body = msg.string(P.PR_BODY, errors="strict")
+        if (body is None or msg.binary_size(P.PR_HTML) is None) and msg.binary_size(P.PR_RTF_COMPRESSED):
+            raise _Unsupported("body derived from RTF")
+        html_body = _html_body(msg, body)
+        body_html = html_body.decode("utf-8", errors="ignore") if html_body else ""
+        if not body and body_html:
+            body = html_to_text(body_html)
+
+        attachments = [_attachment_record(msg, storage, idx, keep_content) for idx, storage in enumerate(msg.attachments())]
+        return {
+            "file": path.name,
+            "source": str(path),
+            "date": sent_at.isoformat() if sent_at else "",
+            "from": clean_text(sender),
+            "to": clean_text(to),
+            "subject": clean_text(msg.string(P.PR_SUBJECT, errors="strict")),
+            # extract_from_msg asks extract_msg for ``message_id``, which it does not
+            # have, so .msg records have always carried an empty one.
+            "message_id": "",
+            "body": clean_text(body) if body else "(No Body Extracted)",
+            "body_html": body_html or None,
+            "attachments": attachments,
+            "source_sha256": source_sha256,
+        }
+
+
+def read_msg_record(path: Path, *, keep_content: bool = False) -> Dict[str, Any]:
+    """Extract a .msg into the same legacy record as ``extract_from_msg``.
+
+    The lean reader handles the file when it can reproduce extract_msg's result exactly;
+    everything else falls back to extract_msg.
+    """
+    path = Path(path)
+    if _use_lean():
+        try:
+            return _lean_record(path, keep_content)
+        except _FALLBACK_ERRORS:
+            pass
+    return extract_from_msg(path, keep_content=keep_content)
+
+
+def read_msg_attachment(path: Path, locator: str) -> Optional[bytes]:
+    """Resolve an ``attachment:<n>`` locator, reading only that attachment's data stream."""
+    if _use_lean():
+        idx = int(locator.partition(":")[2])
+        try:
+            with MsgFile(Path(path)) as msg:
+                storages = msg.attachments()
+                data = msg.binary(P.PR_ATTACH_DATA, storages[idx]) if idx < len(storages) else None
+            if data is not None:
+                return data
+        except MsgFormatError:
+            pass
+    return read_attachment_bytes(path, locator)
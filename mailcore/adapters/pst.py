@@ -1,23 +1,317 @@
-"""PST adapter using existing readpst pipeline."""
+"""PST/OST adapter: native in-process reader with the readpst pipeline as fallback."""
 from __future__ import annotations
 
+import hashlib
+import logging
+import os
 import tempfile
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from sys import intern
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
-from mailcombine.extractors import extract_from_eml, iter_eml_paths_from_pst
+from mailcombine.extractors import clean_text, extract_from_eml, html_to_text, iter_eml_paths_from_pst_streaming
+from mailcombine.metrics import timed_call
 
 from ._common import record_to_message
+from . import pstfile as P
+from .pstfile import PstFile, PstFormatError
 from ..models import Folder, Mailbox, Message
 
+# Set MAILCORE_PST_BACKEND=readpst to bypass the native reader.
+_BACKEND_ENV = "MAILCORE_PST_BACKEND"
 
-def load_pst_mailbox(path: Path) -> Mailbox:
-    messages: List[Message] = []
+# Called as ``on_error(where, exc)`` for a folder or message of a store that could not be
+# read (``where`` is its folder path, plus the nid for a message, or the temporary .eml
+# readpst wrote for it). The rest of the store is still read. Without a callback the
+# error is logged.
+PstErrorCallback = Callable[[str, Exception], None]
+
+_log = logging.getLogger(__name__)
+
+# Record fields that identify a natively read message, in digest order.
+_DIGEST_FIELDS = ("date", "from", "to", "cc", "bcc", "subject", "message_id", "body", "body_html")
+
+
+def _use_native() -> bool:
+    return os.environ.get(_BACKEND_ENV, "native").lower() != "readpst"
+
+
+def _address(name: Optional[str], addr: Optional[str]) -> str:
+    name = (name or "").strip()
+    addr = (addr or "").strip()
+    if addr and "@" in addr:
+        return f"{name} <{addr}>" if name and name != addr else addr
+    return name or addr
+
+
+def _recipients(msg: P.PstMessage, kind: int, fallback: Optional[str]) -> str:
+    parts = [
+        _address(r.get(P.PR_DISPLAY_NAME), r.get(P.PR_SMTP_ADDRESS) or r.get(P.PR_EMAIL_ADDRESS))
+        for r in msg.recipients
+        if r.get(P.PR_RECIPIENT_TYPE) == kind
+    ]
+    parts = [p for p in parts if p]
+    return ", ".join(parts) if parts else (fallback or "")
+
+
+def _html_text(raw: Any, props: Dict[int, Any]) -> Optional[str]:
+    if not raw:
+        return None
+    if isinstance(raw, str):
+        return raw
+    codec = P._codec_for_codepage(props.get(P.PR_INTERNET_CPID))
+    return raw.decode(codec, errors="replace")
+
+
+def _record_digest(record: Dict[str, Any]) -> str:
+    """SHA-256 over a message's fields and attachment digests.
+
+    A message inside a store has no file bytes of its own to hash. This digest stands in
+    for one in the hash CSV and ``--dedupe sha256``. It leaves out where the message
+    lives, so the same message in two stores gets the same digest.
+    """
+    h = hashlib.sha256()
+    for name in _DIGEST_FIELDS:
+        h.update((record.get(name) or "").encode("utf-8", "surrogatepass") + b"\0")
+    for att in record["attachments"]:
+        h.update(f"{att['filename']}\0{att['size']}\0{att['sha256'] or ''}\0".encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+
+def pst_message_key(message: Message) -> str:
+    """Name a message of a store independently of the order it was read in.
+
+    Natively read messages are named by their locator (``pst:<nid>``). Messages read
+    through readpst have none, and readpst's temp file names follow its write order, so
+    they are named by a SHA-256 over their content. Identical copies of a message share
+    the key; callers that need to tell them apart count occurrences.
+    """
+    if message.locator:
+        return message.locator
+    h = hashlib.sha256()
+    sent = message.sent_at.isoformat() if message.sent_at else ""
+    for value in (message.id, message.sender, *message.to, "", *message.cc, "", *message.bcc, "", sent, message.subject, message.body_text, message.body_html):
+        h.update((value or "").encode("utf-8", "surrogatepass") + b"\0")
+    for att in message.attachments:
+        h.update(f"{att.filename}\0{att.size}\0{att.sha256 or ''}\0".encode("utf-8", "surrogatepass"))
+    return f"sha256:{h.hexdigest()}"
+
+
+def _report(on_error: Optional[PstErrorCallback], path: Path, where: str, exc: Exception) -> None:
+    if on_error is not None:
+        on_error(where, exc)
+    else:
+        _log.warning("Skipping unreadable %s in %s: %s", where, path, exc)
+
+
+@timed_call("parse_pst")
+def pst_message_record(pst: PstFile, folder: P.PstFolder, msg: P.PstMessage, *, keep_content: bool = False) -> Dict[str, Any]:
+    """Build the legacy record for a native PST message, mirroring ``extract_from_eml``."""
+    props = msg.props
+    subject = props.get(P.PR_SUBJECT) or ""
+    if subject.startswith("\x01") and len(subject) >= 2:
+        subject = subject[2:]  # normalized-subject prefix marker
+    sent = props.get(P.PR_CLIENT_SUBMIT_TIME) or props.get(P.PR_MESSAGE_DELIVERY_TIME)
+    sender_addr = props.get(P.PR_SENDER_SMTP_ADDRESS) or props.get(P.PR_SENDER_EMAIL_ADDRESS)
+    body_html = _html_text(props.get(P.PR_HTML), props)
+    body = props.get(P.PR_BODY) or ""
+    if not body and body_html:
+        body = html_to_text(body_html)
+
+    atts: List[Dict[str, Any]] = []
+    for att in msg.attachments:
+        ap = att.props
+        name = ap.get(P.PR_ATTACH_LONG_FILENAME) or ap.get(P.PR_ATTACH_FILENAME) or ap.get(P.PR_DISPLAY_NAME) or "attachment"
+        data = pst.read_attachment(att)
+        entry: Dict[str, Any] = {
+            "filename": name,
+            "size": len(data) if data is not None else None,
+            "sha256": hashlib.sha256(data).hexdigest() if data else None,
+            "content_type": ap.get(P.PR_ATTACH_MIME_TAG),
+            "locator": f"pst:{msg.nid}:{att.nid}",
+            "source_path": pst.path,
+        }
+        if keep_content and data is not None:
+            entry["content"] = data
+        atts.append(entry)
+
+    record = {
+        "file": str(msg.nid),
+        "source": f"{folder.path.rstrip('/')}/{msg.nid}",
+        "date": sent.isoformat() if sent else "",
+        "from": clean_text(_address(props.get(P.PR_SENDER_NAME), sender_addr)),
+        "to": clean_text(_recipients(msg, 1, props.get(P.PR_DISPLAY_TO))),
+        "cc": clean_text(_recipients(msg, 2, props.get(P.PR_DISPLAY_CC))),
+        "bcc": clean_text(_recipients(msg, 3, props.get(P.PR_DISPLAY_BCC))),
+        "subject": clean_text(subject),
+        "message_id": clean_text(props.get(P.PR_INTERNET_MESSAGE_ID)),
+        "body": clean_text(body) if body else "(No Body Extracted)",
+        "body_html": body_html,
+        "attachments": atts,
+        "source_sha256": None,
+        "locator": f"pst:{msg.nid}",
+    }
+    record["source_sha256"] = _record_digest(record)
+    return record
+
+
+def _native_message(pst: PstFile, folder: P.PstFolder, nid: int, keep_content: bool = False) -> Message:
+    record = pst_message_record(pst, folder, pst.message(nid), keep_content=keep_content)
+    return record_to_message(record, source_override=f"{pst.path} :: {record['source']}", source_path=pst.path)
+
+
+def _iter_folders(pst: PstFile, on_error: Optional[PstErrorCallback]) -> Iterator[P.PstFolder]:
+    return pst.iter_folders(on_error=lambda path, exc: _report(on_error, pst.path, path, exc))
+
+
+def _iter_native_messages(pst: PstFile, keep_content: bool, on_error: Optional[PstErrorCallback] = None) -> Iterator[Message]:
+    for folder in _iter_folders(pst, on_error):
+        for nid in folder.message_nids:
+            try:
+                message = _native_message(pst, folder, nid, keep_content)
+            except Exception as exc:
+                # One damaged message must not cost the rest of the store.
+                _report(on_error, pst.path, f"{folder.path.rstrip('/')}/{nid}", exc)
+                continue
+            yield message
+
+
+def _iter_readpst_messages(path: Path, on_error: Optional[PstErrorCallback] = None) -> Iterator[Message]:
     with tempfile.TemporaryDirectory(prefix="mailcore_pst_") as tdir:
         temp_root = Path(tdir)
-        for eml_path in iter_eml_paths_from_pst(path, temp_root):
-            record = extract_from_eml(eml_path)
-            source_label = f'{path} :: {eml_path}'
-            messages.append(record_to_message(record, source_override=source_label))
+        for eml_path in iter_eml_paths_from_pst_streaming(path, temp_root):
+            try:
+                # The temp file is deleted right away, so attachment bytes can't be lazy here.
+                record = extract_from_eml(eml_path, keep_content=True)
+                message = record_to_message(record, source_override=f"{path} :: {eml_path}")
+            except Exception as exc:
+                _report(on_error, path, str(eml_path), exc)
+                continue
+            finally:
+                eml_path.unlink()
+            yield message
+
+
+def _open_native(path: Path) -> Optional[PstFile]:
+    if not _use_native():
+        return None
+    try:
+        return PstFile(path)
+    except PstFormatError:
+        return None
+
+
+def iter_pst_messages(path: Path, *, keep_attachment_data: bool = False, on_error: Optional[PstErrorCallback] = None) -> Iterator[Message]:
+    """Yield messages from a PST/OST.
+
+    The native reader builds messages straight from the mapped file, with attachment
+    content left lazy. Stores it cannot open at all go through readpst instead. That path
+    streams while readpst runs and deletes each temporary .eml before its message is
+    yielded, so peak temp-disk usage stays around one message. Either way, a message or
+    folder that cannot be read is reported to ``on_error`` and skipped.
+    """
+    path = Path(path)
+    pst = _open_native(path)
+    if pst is None:
+        yield from _iter_readpst_messages(path, on_error)
+        return
+    with pst:
+        yield from _iter_native_messages(pst, keep_attachment_data, on_error)
+
+
+def read_pst_attachment(path: Path, locator: str) -> Optional[bytes]:
+    """Resolve a ``pst:<message nid>:<attachment nid>`` locator against the store at ``path``."""
+    _, msg_nid, att_nid = locator.split(":")
+    with PstFile(path) as pst:
+        return pst.attachment_data(int(msg_nid), int(att_nid))
+
+
+def iter_pst_attachment(path: Path, locator: str) -> Iterator[bytes]:
+    """Like :func:`read_pst_attachment`, but yields the content block by block."""
+    _, msg_nid, att_nid = locator.split(":")
+    with PstFile(path) as pst:
+        yield from pst.iter_attachment_data(int(msg_nid), int(att_nid))
+
+
+@lru_cache(maxsize=16)
+def _message_folders(path: str, size: int, mtime_ns: int) -> Dict[int, P.PstFolder]:
+    # One folder walk per version of a store, shared by every lookup into it. Size and
+    # mtime are part of the key so a store that changed is walked again.
+    with PstFile(Path(path)) as pst:
+        return {nid: folder for folder in _iter_folders(pst, None) for nid in folder.message_nids}
+
+
+def load_pst_message(path: Path, locator: str, *, keep_attachment_data: bool = False) -> Message:
+    """Load a single message by its locator.
+
+    ``pst:<nid>`` names a natively read message. ``sha256:<hex>`` (see
+    :func:`pst_message_key`) names a message of a store only readpst can read; finding it
+    takes a readpst pass over the whole store.
+    """
+    path = Path(path)
+    kind, _, value = locator.partition(":")
+    if kind == "sha256":
+        for message in _iter_readpst_messages(path):
+            if pst_message_key(message) == locator:
+                return message
+        raise KeyError(f"Message {locator} not found in {path}")
+    nid = int(value)
+    st = os.stat(path)
+    folder = _message_folders(os.path.abspath(path), st.st_size, st.st_mtime_ns).get(nid)
+    if folder is None:
+        raise KeyError(f"Message {locator} not found in {path}")
+    with PstFile(path) as pst:
+        return _native_message(pst, folder, nid, keep_attachment_data)
+
+
+def _native_mailbox(
+    pst: PstFile,
+    path: Path,
+    keep_content: bool,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    on_error: Optional[PstErrorCallback] = None,
+) -> Mailbox:
+    folders: Dict[int, Folder] = {}
+    roots: List[Folder] = []
+    parents: Dict[int, int] = {}
+    pst_folders = list(_iter_folders(pst, on_error))
+    total = sum(len(pf.message_nids) for pf in pst_folders)
+    done = 0
+    for pf in pst_folders:
+        folder = Folder(id=str(pf.nid), name=intern(pf.name or path.stem or path.name), path=intern(pf.path))
+        for nid in pf.message_nids:
+            try:
+                folder.messages.append(_native_message(pst, pf, nid, keep_content))
+            except Exception as exc:
+                _report(on_error, path, f"{pf.path.rstrip('/')}/{nid}", exc)
+            done += 1
+            if progress:
+                progress(done, total)
+        folders[pf.nid] = folder
+        for child in pf.subfolder_nids:
+            parents[child] = pf.nid
+        parent = folders.get(parents.get(pf.nid, -1))
+        (parent.subfolders if parent else roots).append(folder)
+    return Mailbox(source_path=path, display_name=path.name, folders=roots)
+
+
+def load_pst_mailbox(
+    path: Path,
+    *,
+    keep_attachment_data: bool = False,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    on_error: Optional[PstErrorCallback] = None,
+) -> Mailbox:
+    path = Path(path)
+    pst = _open_native(path)
+    if pst is not None:
+        with pst:
+            return _native_mailbox(pst, path, keep_attachment_data, progress, on_error)
+    messages: List[Message] = []
+    for message in _iter_readpst_messages(path, on_error):
+        messages.append(message)
+        if progress:
+            progress(len(messages), None)
     root_folder = Folder(id=path.stem or str(path), name=path.stem or path.name, path="/", messages=messages)
     return Mailbox(source_path=path, display_name=path.name, folders=[root_folder])
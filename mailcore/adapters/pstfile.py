@@ -0,0 +1,612 @@
+"""Pure-Python, memory-mapped reader for Outlook PST/OST files.
+
+Implements the three layers of [MS-PST] that are needed to pull messages out of a store:
+
+* NDB – header, node/block B-trees, data trees (XBLOCK/XXBLOCK) and subnode trees;
+* LTP – heap-on-node, BTH, property contexts and table contexts;
+* messaging – folder hierarchy, contents tables, recipients and attachments.
+
+Only reading is supported. Stores using the "cyclic" encryption method raise
+:class:`PstFormatError` so callers can fall back to readpst.
+"""
+from __future__ import annotations
+
+import mmap
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class PstFormatError(ValueError):
+    """Raised when a file is not a PST/OST this reader can handle."""
+
+
+# NDB_CRYPT_PERMUTE encode table (mpbbR); decoding uses its inverse.
+_PERMUTE_ENCODE = bytes((
+    65, 54, 19, 98, 168, 33, 110, 187, 244, 22, 204, 4, 127, 100, 232, 93,
+    30, 242, 203, 42, 116, 197, 94, 53, 210, 149, 71, 158, 150, 45, 154, 136,
+    76, 125, 132, 63, 219, 172, 49, 182, 72, 95, 246, 196, 216, 57, 139, 231,
+    35, 59, 56, 142, 200, 193, 223, 37, 177, 32, 165, 70, 96, 78, 156, 251,
+    170, 211, 86, 81, 69, 124, 85, 0, 7, 201, 43, 157, 133, 155, 9, 160,
+    143, 173, 179, 15, 99, 171, 137, 75, 215, 167, 21, 90, 113, 102, 66, 191,
+    38, 74, 107, 152, 250, 234, 119, 83, 178, 112, 5, 44, 253, 89, 58, 134,
+    126, 206, 6, 235, 130, 120, 87, 199, 141, 67, 175, 180, 28, 212, 91, 205,
+    226, 233, 39, 79, 195, 8, 114, 128, 207, 176, 239, 245, 40, 109, 190, 48,
+    77, 52, 146, 213, 14, 60, 34, 50, 229, 228, 249, 159, 194, 209, 10, 129,
+    18, 225, 238, 145, 131, 118, 227, 151, 230, 97, 138, 23, 121, 164, 183, 220,
+    144, 122, 92, 140, 2, 166, 202, 105, 222, 80, 26, 17, 147, 185, 82, 135,
+    88, 252, 237, 29, 55, 73, 27, 106, 224, 41, 51, 153, 189, 108, 217, 148,
+    243, 64, 84, 111, 240, 198, 115, 184, 214, 62, 101, 24, 68, 31, 221, 103,
+    16, 241, 12, 25, 236, 174, 3, 161, 20, 123, 169, 11, 255, 248, 163, 192,
+    162, 1, 247, 46, 188, 36, 104, 117, 13, 254, 186, 47, 181, 208, 218, 61,
+))
+_PERMUTE_DECODE = bytes(_PERMUTE_ENCODE.index(i) for i in range(256))
+
+CRYPT_NONE = 0x00
+CRYPT_PERMUTE = 0x01
+CRYPT_CYCLIC = 0x02
+
+NID_TYPE_HID = 0x00
+NID_TYPE_NORMAL_FOLDER = 0x02
+NID_TYPE_HIERARCHY_TABLE = 0x0D
+NID_TYPE_CONTENTS_TABLE = 0x0E
+NID_ROOT_FOLDER = 0x122
+NID_ATTACHMENT_TABLE = 0x671
+NID_RECIPIENT_TABLE = 0x692
+
+# Property ids used by the messaging layer.
+PR_SUBJECT = 0x0037
+PR_CLIENT_SUBMIT_TIME = 0x0039
+PR_TRANSPORT_MESSAGE_HEADERS = 0x007D
+PR_RECIPIENT_TYPE = 0x0C15
+PR_SENDER_NAME = 0x0C1A
+PR_SENDER_EMAIL_ADDRESS = 0x0C1F
+PR_DISPLAY_BCC = 0x0E02
+PR_DISPLAY_CC = 0x0E03
+PR_DISPLAY_TO = 0x0E04
+PR_MESSAGE_DELIVERY_TIME = 0x0E06
+PR_MESSAGE_SIZE = 0x0E08
+PR_ATTACH_SIZE = 0x0E20
+PR_BODY = 0x1000
+PR_RTF_COMPRESSED = 0x1009
+PR_HTML = 0x1013
+PR_INTERNET_MESSAGE_ID = 0x1035
+PR_DISPLAY_NAME = 0x3001
+PR_EMAIL_ADDRESS = 0x3003
+PR_CONTENT_COUNT = 0x3602
+PR_ATTACH_DATA = 0x3701
+PR_ATTACH_FILENAME = 0x3704
+PR_ATTACH_METHOD = 0x3705
+PR_ATTACH_LONG_FILENAME = 0x3707
+PR_ATTACH_MIME_TAG = 0x370E
+PR_SMTP_ADDRESS = 0x39FE
+PR_INTERNET_CPID = 0x3FDE
+PR_MESSAGE_CODEPAGE = 0x3FFD
+PR_SENDER_SMTP_ADDRESS = 0x5D01
+PR_LTP_ROW_ID = 0x67F2
+
+PT_SHORT = 0x0002
+PT_LONG = 0x0003
+PT_FLOAT = 0x0004
+PT_DOUBLE = 0x0005
+PT_CURRENCY = 0x0006
+PT_APPTIME = 0x0007
+PT_ERROR = 0x000A
+PT_BOOLEAN = 0x000B
+PT_OBJECT = 0x000D
+PT_LONGLONG = 0x0014
+PT_STRING8 = 0x001E
+PT_UNICODE = 0x001F
+PT_SYSTIME = 0x0040
+PT_CLSID = 0x0048
+PT_BINARY = 0x0102
+
+_FILETIME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+
+def filetime_to_datetime(value: int) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return _FILETIME_EPOCH + timedelta(microseconds=value // 10)
+    except OverflowError:
+        return None
+
+
+def _codec_for_codepage(codepage: Optional[int]) -> str:
+    if codepage == 65001:
+        return "utf-8"
+    if codepage == 20127:
+        return "ascii"
+    if codepage == 28591:
+        return "latin-1"
+    if codepage:
+        name = f"cp{codepage}"
+        try:
+            "".encode(name)
+            return name
+        except LookupError:
+            pass
+    return "cp1252"
+
+
+class _Node:
+    """A node (bidData + bidSub) with lazily resolved data blocks and subnodes."""
+
+    __slots__ = ("pst", "bid_data", "bid_sub", "_subnodes")
+
+    def __init__(self, pst: "PstFile", bid_data: int, bid_sub: int):
+        self.pst = pst
+        self.bid_data = bid_data
+        self.bid_sub = bid_sub
+        self._subnodes: Optional[Dict[int, Tuple[int, int]]] = None
+
+    def blocks(self) -> List[bytes]:
+        return self.pst._data_blocks(self.bid_data)
+
+    def iter_blocks(self) -> Iterator[bytes]:
+        return self.pst._iter_data_blocks(self.bid_data)
+
+    def data(self) -> bytes:
+        return b"".join(self.blocks())
+
+    def subnode(self, nid: int) -> "_Node":
+        if self._subnodes is None:
+            self._subnodes = self.pst._subnode_map(self.bid_sub)
+        try:
+            bid_data, bid_sub = self._subnodes[nid]
+        except KeyError:
+            raise PstFormatError(f"Subnode {nid:#x} not found") from None
+        return _Node(self.pst, bid_data, bid_sub)
+
+    def has_subnode(self, nid: int) -> bool:
+        if self._subnodes is None:
+            self._subnodes = self.pst._subnode_map(self.bid_sub)
+        return nid in self._subnodes
+
+
+class _Heap:
+    """Heap-on-node (HN) allocations spread over the node's data blocks."""
+
+    __slots__ = ("blocks", "client_sig", "user_root")
+
+    def __init__(self, blocks: List[bytes]):
+        if not blocks or len(blocks[0]) < 12 or blocks[0][2] != 0xEC:
+            raise PstFormatError("Invalid heap-on-node header")
+        self.blocks = blocks
+        self.client_sig = blocks[0][3]
+        self.user_root = struct.unpack_from("<I", blocks[0], 4)[0]
+
+    def get(self, hid: int) -> bytes:
+        if hid == 0:
+            return b""
+        block = self.blocks[hid >> 16]
+        index = (hid >> 5) & 0x7FF
+        ib_hnpm = struct.unpack_from("<H", block, 0)[0]
+        c_alloc = struct.unpack_from("<H", block, ib_hnpm)[0]
+        if index < 1 or index > c_alloc:
+            raise PstFormatError(f"Heap id {hid:#x} out of range")
+        start, end = struct.unpack_from("<HH", block, ib_hnpm + 4 + (index - 1) * 2)
+        return block[start:end]
+
+    def bth(self, hid: int) -> List[Tuple[bytes, bytes]]:
+        """Return every ``(key, data)`` record of the BTH rooted at ``hid``."""
+        header = self.get(hid)
+        if len(header) < 8 or header[0] != 0xB5:
+            raise PstFormatError("Invalid BTH header")
+        cb_key, cb_ent, levels = header[1], header[2], header[3]
+        hid_root = struct.unpack_from("<I", header, 4)[0]
+        records: List[Tuple[bytes, bytes]] = []
+        if hid_root:
+            self._bth_walk(hid_root, levels, cb_key, cb_ent, records)
+        return records
+
+    def _bth_walk(self, hid: int, level: int, cb_key: int, cb_ent: int, out: List[Tuple[bytes, bytes]]) -> None:
+        data = self.get(hid)
+        if level == 0:
+            size = cb_key + cb_ent
+            for off in range(0, len(data) - size + 1, size):
+                out.append((data[off:off + cb_key], data[off + cb_key:off + size]))
+            return
+        size = cb_key + 4
+        for off in range(0, len(data) - size + 1, size):
+            child = struct.unpack_from("<I", data, off + cb_key)[0]
+            self._bth_walk(child, level - 1, cb_key, cb_ent, out)
+
+
+class PstFolder(NamedTuple):
+    nid: int
+    name: str
+    path: str
+    message_nids: List[int]
+    subfolder_nids: List[int]
+
+
+class PstAttachment(NamedTuple):
+    nid: int
+    props: Dict[int, Any]
+    node: _Node
+
+
+class PstMessage(NamedTuple):
+    nid: int
+    props: Dict[int, Any]
+    recipients: List[Dict[int, Any]]
+    attachments: List[PstAttachment]
+
+
+class PstFile:
+    """Read-only view over a PST/OST file through ``mmap``."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fh = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._fh.close()
+            raise PstFormatError(f"Not a PST/OST file: {self.path}") from None
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+        self._page = lru_cache(maxsize=4096)(self._parse_page)
+
+    # ---- NDB layer ----
+    def _read_header(self) -> None:
+        mm = self._mm
+        if len(mm) < 564 or mm[0:4] != b"!BDN":
+            raise PstFormatError(f"Not a PST/OST file: {self.path}")
+        version = struct.unpack_from("<H", mm, 10)[0]
+        if version in (14, 15):
+            self.unicode = False
+            self.page_size = 512
+            self._nbt_root = struct.unpack_from("<I", mm, 188)[0]
+            self._bbt_root = struct.unpack_from("<I", mm, 196)[0]
+            self.crypt_method = mm[461]
+        elif version >= 23:
+            self.unicode = True
+            self.page_size = 4096 if version >= 36 else 512
+            self._nbt_root = struct.unpack_from("<Q", mm, 224)[0]
+            self._bbt_root = struct.unpack_from("<Q", mm, 240)[0]
+            self.crypt_method = mm[513]
+        else:
+            raise PstFormatError(f"Unsupported PST version {version}")
+        if self.crypt_method not in (CRYPT_NONE, CRYPT_PERMUTE):
+            raise PstFormatError(f"Unsupported PST encryption method {self.crypt_method}")
+        self.version = version
+        self.is_ost = mm[8:10] == b"SO"
+
+    def close(self) -> None:
+        mm = getattr(self, "_mm", None)
+        if mm is not None and not mm.closed:
+            mm.close()
+        if not self._fh.closed:
+            self._fh.close()
+
+    def __enter__(self) -> "PstFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _parse_page(self, ib: int) -> Tuple[int, int, int, bytes]:
+        """Return ``(level, count, entry_size, entries)`` for the B-tree page at ``ib``."""
+        page = self._mm[ib:ib + self.page_size]
+        if len(page) != self.page_size:
+            raise PstFormatError(f"Truncated B-tree page at {ib:#x}")
+        if self.page_size == 4096:
+            count = struct.unpack_from("<H", page, 4056)[0]
+            cb_ent, level = page[4060], page[4061]
+            entries = page[:4056]
+        elif self.unicode:
+            count, cb_ent, level = page[488], page[490], page[491]
+            entries = page[:488]
+        else:
+            count, cb_ent, level = page[496], page[498], page[499]
+            entries = page[:496]
+        return level, count, cb_ent, entries
+
+    def _bt_find(self, root_ib: int, key: int) -> Optional[bytes]:
+        """Descend a node or block B-tree and return the raw leaf entry for ``key``."""
+        fmt = "<Q" if self.unicode else "<I"
+        key_size = 8 if self.unicode else 4
+        ib = root_ib
+        for _ in range(64):
+            level, count, cb_ent, entries = self._page(ib)
+            lo, hi = 0, count - 1
+            found = -1
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                k = struct.unpack_from(fmt, entries, mid * cb_ent)[0]
+                if k <= key:
+                    found = mid
+                    lo = mid + 1
+                else:
+                    hi = mid - 1
+            if found < 0:
+                return None
+            off = found * cb_ent
+            if level == 0:
+                if struct.unpack_from(fmt, entries, off)[0] != key:
+                    return None
+                return entries[off:off + cb_ent]
+            # BTENTRY: btkey followed by BREF (bid, ib)
+            ib = struct.unpack_from(fmt, entries, off + 2 * key_size)[0]
+        raise PstFormatError("B-tree too deep")
+
+    def _lookup_node(self, nid: int) -> Tuple[int, int]:
+        entry = self._bt_find(self._nbt_root, nid)
+        if entry is None:
+            raise PstFormatError(f"Node {nid:#x} not found")
+        if self.unicode:
+            _, bid_data, bid_sub = struct.unpack_from("<QQQ", entry, 0)
+        else:
+            _, bid_data, bid_sub = struct.unpack_from("<III", entry, 0)
+        return bid_data, bid_sub
+
+    def _read_block(self, bid: int) -> bytes:
+        entry = self._bt_find(self._bbt_root, bid & ~1)
+        if entry is None:
+            raise PstFormatError(f"Block {bid:#x} not found")
+        if self.unicode:
+            _, ib, cb = struct.unpack_from("<QQH", entry, 0)
+        else:
+            _, ib, cb = struct.unpack_from("<IIH", entry, 0)
+        data = self._mm[ib:ib + cb]
+        if len(data) != cb:
+            raise PstFormatError(f"Truncated block {bid:#x}")
+        if bid & 0x2:
+            return data  # internal blocks are never encrypted
+        if self.page_size == 4096 and len(entry) >= 20:
+            inflated = struct.unpack_from("<H", entry, 18)[0]
+            if inflated > cb:
+                data = zlib.decompress(data)
+        if self.crypt_method == CRYPT_PERMUTE:
+            data = data.translate(_PERMUTE_DECODE)
+        return data
+
+    def _data_blocks(self, bid: int) -> List[bytes]:
+        return list(self._iter_data_blocks(bid))
+
+    def _iter_data_blocks(self, bid: int) -> Iterator[bytes]:
+        # Blocks are read as they are reached, so a large value is never held whole.
+        if not bid:
+            return
+        data = self._read_block(bid)
+        if not bid & 0x2:
+            yield data
+            return
+        btype, level, count = data[0], data[1], struct.unpack_from("<H", data, 2)[0]
+        if btype != 0x01:
+            raise PstFormatError(f"Unexpected block type {btype:#x} in data tree")
+        fmt = f"<{count}{'Q' if self.unicode else 'I'}"
+        bids = struct.unpack_from(fmt, data, 8)
+        for b in bids:
+            if level == 1:
+                yield self._read_block(b)
+            else:
+                yield from self._iter_data_blocks(b)
+
+    def _subnode_map(self, bid: int) -> Dict[int, Tuple[int, int]]:
+        result: Dict[int, Tuple[int, int]] = {}
+        if not bid:
+            return result
+        data = self._read_block(bid)
+        btype, level, count = data[0], data[1], struct.unpack_from("<H", data, 2)[0]
+        if btype != 0x02:
+            raise PstFormatError(f"Unexpected block type {btype:#x} in subnode tree")
+        header = 8 if self.unicode else 4
+        if level == 0:
+            fmt, size = ("<QQQ", 24) if self.unicode else ("<III", 12)
+            for i in range(count):
+                nid, bid_data, bid_sub = struct.unpack_from(fmt, data, header + i * size)
+                result[nid & 0xFFFFFFFF] = (bid_data, bid_sub)
+        else:
+            fmt, size = ("<QQ", 16) if self.unicode else ("<II", 8)
+            for i in range(count):
+                _, child = struct.unpack_from(fmt, data, header + i * size)
+                result.update(self._subnode_map(child))
+        return result
+
+    def node(self, nid: int) -> _Node:
+        bid_data, bid_sub = self._lookup_node(nid)
+        return _Node(self, bid_data, bid_sub)
+
+    # ---- LTP layer ----
+    def _hnid_data(self, node: _Node, heap: _Heap, hnid: int) -> bytes:
+        if hnid == 0:
+            return b""
+        if hnid & 0x1F == NID_TYPE_HID:
+            return heap.get(hnid)
+        return node.subnode(hnid).data()
+
+    def _decode(self, ptype: int, raw: bytes, codec: str) -> Any:
+        if ptype == PT_UNICODE:
+            return raw.decode("utf-16-le", errors="replace").rstrip("\x00")
+        if ptype == PT_STRING8:
+            return raw.decode(codec, errors="replace").rstrip("\x00")
+        if ptype in (PT_SYSTIME,):
+            return filetime_to_datetime(struct.unpack_from("<Q", raw)[0]) if len(raw) >= 8 else None
+        if ptype in (PT_LONGLONG, PT_CURRENCY):
+            return struct.unpack_from("<q", raw)[0] if len(raw) >= 8 else None
+        if ptype in (PT_DOUBLE, PT_APPTIME):
+            return struct.unpack_from("<d", raw)[0] if len(raw) >= 8 else None
+        return raw
+
+    def property_context(self, node: _Node, *, skip: Tuple[int, ...] = (), codec: str = "cp1252") -> Dict[int, Any]:
+        """Decode the PC stored in ``node``; ids in ``skip`` are returned as ``(ptype, hnid)``."""
+        heap = _Heap(node.blocks())
+        if heap.client_sig != 0xBC:
+            raise PstFormatError("Node is not a property context")
+        props: Dict[int, Any] = {}
+        for key, ent in heap.bth(heap.user_root):
+            prop_id = struct.unpack_from("<H", key)[0]
+            ptype, value = struct.unpack_from("<HI", ent)
+            if prop_id in skip:
+                props[prop_id] = (ptype, value)
+            elif ptype == PT_SHORT:
+                props[prop_id] = struct.unpack("<h", struct.pack("<I", value)[:2])[0]
+            elif ptype in (PT_LONG, PT_ERROR):
+                props[prop_id] = value
+            elif ptype == PT_BOOLEAN:
+                props[prop_id] = bool(value & 0xFF)
+            elif ptype == PT_FLOAT:
+                props[prop_id] = struct.unpack("<f", struct.pack("<I", value))[0]
+            else:
+                props[prop_id] = self._decode(ptype, self._hnid_data(node, heap, value), codec)
+        return props
+
+    def property_value(self, node: _Node, ptype: int, hnid: int, *, codec: str = "cp1252") -> Any:
+        """Resolve a value deferred through ``property_context(skip=...)``."""
+        heap = _Heap(node.blocks())
+        return self._decode(ptype, self._hnid_data(node, heap, hnid), codec)
+
+    def table_context(self, node: _Node, *, codec: str = "cp1252") -> List[Dict[int, Any]]:
+        heap = _Heap(node.blocks())
+        if heap.client_sig != 0x7C:
+            raise PstFormatError("Node is not a table context")
+        info = heap.get(heap.user_root)
+        n_cols = info[1]
+        _, _, ib_1b, ib_bm = struct.unpack_from("<4H", info, 2)
+        hid_row_index, hnid_rows = struct.unpack_from("<II", info, 10)
+        columns = [struct.unpack_from("<IHBB", info, 22 + i * 8) for i in range(n_cols)]
+        row_size = ib_bm
+        row_count = len(heap.bth(hid_row_index)) if hid_row_index else 0
+        if not row_count or not hnid_rows or not row_size:
+            return []
+        if hnid_rows & 0x1F == NID_TYPE_HID:
+            row_blocks = [heap.get(hnid_rows)]
+        else:
+            row_blocks = node.subnode(hnid_rows).blocks()
+
+        rows: List[Dict[int, Any]] = []
+        for block in row_blocks:
+            for off in range(0, len(block) - row_size + 1, row_size):
+                if len(rows) >= row_count:
+                    return rows
+                row = block[off:off + row_size]
+                ceb = row[ib_1b:ib_bm]
+                values: Dict[int, Any] = {}
+                for tag, ib_data, cb_data, i_bit in columns:
+                    if not ceb[i_bit // 8] & (1 << (7 - i_bit % 8)):
+                        continue
+                    ptype, prop_id = tag & 0xFFFF, tag >> 16
+                    cell = row[ib_data:ib_data + cb_data]
+                    if ptype == PT_SHORT:
+                        values[prop_id] = struct.unpack("<h", cell[:2])[0]
+                    elif ptype in (PT_LONG, PT_ERROR):
+                        values[prop_id] = struct.unpack("<I", cell[:4])[0]
+                    elif ptype == PT_BOOLEAN:
+                        values[prop_id] = bool(cell[0])
+                    elif ptype == PT_FLOAT:
+                        values[prop_id] = struct.unpack("<f", cell[:4])[0]
+                    elif cb_data == 8 and ptype in (PT_SYSTIME, PT_LONGLONG, PT_CURRENCY, PT_DOUBLE, PT_APPTIME):
+                        values[prop_id] = self._decode(ptype, cell, codec)
+                    else:
+                        hnid = struct.unpack("<I", cell[:4])[0]
+                        values[prop_id] = self._decode(ptype, self._hnid_data(node, heap, hnid), codec)
+                rows.append(values)
+        return rows
+
+    # ---- messaging layer ----
+    def folder(self, nid: int, parent_path: str = "") -> PstFolder:
+        props = self.property_context(self.node(nid))
+        name = props.get(PR_DISPLAY_NAME) or ""
+        path = f"{parent_path}/{name}" if name else (parent_path or "/")
+        base = nid & ~0x1F
+        subfolders: List[int] = []
+        messages: List[int] = []
+        try:
+            subfolders = [r[PR_LTP_ROW_ID] for r in self.table_context(self.node(base | NID_TYPE_HIERARCHY_TABLE)) if PR_LTP_ROW_ID in r]
+        except PstFormatError:
+            pass
+        try:
+            messages = [r[PR_LTP_ROW_ID] for r in self.table_context(self.node(base | NID_TYPE_CONTENTS_TABLE)) if PR_LTP_ROW_ID in r]
+        except PstFormatError:
+            pass
+        return PstFolder(nid, name, path, messages, subfolders)
+
+    def iter_folders(self, root_nid: int = NID_ROOT_FOLDER, *, on_error: Optional[Callable[[str, Exception], None]] = None) -> Iterator[PstFolder]:
+        """Walk the folder hierarchy depth-first, in hierarchy-table order.
+
+        With ``on_error``, a folder that cannot be read is reported as
+        ``on_error("<parent path>/<nid>", exc)`` and skipped with everything below it;
+        otherwise the error is raised.
+        """
+        stack: List[Tuple[int, str]] = [(root_nid, "")]
+        seen = set()
+        while stack:
+            nid, parent_path = stack.pop()
+            if nid in seen:
+                continue
+            seen.add(nid)
+            try:
+                folder = self.folder(nid, parent_path if parent_path != "/" else "")
+            except Exception as exc:
+                if on_error is None:
+                    raise
+                on_error(f"{parent_path.rstrip('/')}/{nid}", exc)
+                continue
+            yield folder
+            for child in reversed(folder.subfolder_nids):
+                if child & 0x1F == NID_TYPE_NORMAL_FOLDER:
+                    stack.append((child, folder.path))
+
+    def message(self, nid: int) -> PstMessage:
+        """Load a message's properties, recipients and attachment metadata.
+
+        Attachment payloads (``PR_ATTACH_DATA``) are left as ``(ptype, hnid)``; read them with
+        :meth:`attachment_data`.
+        """
+        node = self.node(nid)
+        props = self.property_context(node)
+        codec = _codec_for_codepage(props.get(PR_MESSAGE_CODEPAGE) or props.get(PR_INTERNET_CPID))
+        if codec != "cp1252" and not self.unicode:
+            props = self.property_context(node, codec=codec)
+        recipients: List[Dict[int, Any]] = []
+        if node.has_subnode(NID_RECIPIENT_TABLE):
+            recipients = self.table_context(node.subnode(NID_RECIPIENT_TABLE), codec=codec)
+        attachments: List[PstAttachment] = []
+        if node.has_subnode(NID_ATTACHMENT_TABLE):
+            for row in self.table_context(node.subnode(NID_ATTACHMENT_TABLE), codec=codec):
+                att_nid = row.get(PR_LTP_ROW_ID)
+                if att_nid is None or not node.has_subnode(att_nid):
+                    continue
+                att_node = node.subnode(att_nid)
+                att_props = self.property_context(att_node, skip=(PR_ATTACH_DATA,), codec=codec)
+                attachments.append(PstAttachment(att_nid, att_props, att_node))
+        return PstMessage(nid, props, recipients, attachments)
+
+    def read_attachment(self, attachment: PstAttachment) -> Optional[bytes]:
+        deferred = attachment.props.get(PR_ATTACH_DATA)
+        if not deferred:
+            return None
+        ptype, hnid = deferred
+        if ptype != PT_BINARY:
+            return None  # embedded message / OLE object
+        return self.property_value(attachment.node, ptype, hnid)
+
+    def attachment_data(self, message_nid: int, attachment_nid: int) -> Optional[bytes]:
+        att_node = self.node(message_nid).subnode(attachment_nid)
+        props = self.property_context(att_node, skip=(PR_ATTACH_DATA,))
+        return self.read_attachment(PstAttachment(attachment_nid, props, att_node))
+
+    def iter_attachment_data(self, message_nid: int, attachment_nid: int) -> Iterator[bytes]:
+        """Like :meth:`attachment_data`, but yields the content one data block at a time."""
+        att_node = self.node(message_nid).subnode(attachment_nid)
+        props = self.property_context(att_node, skip=(PR_ATTACH_DATA,))
+        deferred = props.get(PR_ATTACH_DATA)
+        if not deferred or deferred[0] != PT_BINARY:
+            return
+        hnid = deferred[1]
+        if hnid == 0:
+            return
+        if hnid & 0x1F == NID_TYPE_HID:
+            yield _Heap(att_node.blocks()).get(hnid)
+        else:
+            yield from att_node.subnode(hnid).iter_blocks()
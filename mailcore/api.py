@@ -2,55 +2,116 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import List, Sequence
+from typing import Callable, List, Optional, Sequence
 
-from .adapters import load_eml_message, load_msg_message, load_pst_mailbox
-from .models import Folder, Mailbox, Message
+from mailcombine.cache import ExtractionCache
+from mailcombine.scan import walk_files
+
+from .adapters import load_eml_message, load_eml_summary, load_msg_message, load_msg_summary, load_pst_mailbox
+from .models import Folder, Mailbox, Message, MessageSummary
 
 _MESSAGE_EXTS = {".msg", ".eml"}
 _MAILBOX_EXTS = {".pst", ".ost"}
 
+# Called as ``progress(done, total)`` after each message is loaded; ``total`` is None when
+# unknown. Raising from the callback aborts the load at that message boundary.
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+def load_single_message(
+    path: Path, *, keep_attachment_data: bool = False, cache: Optional[ExtractionCache] = None
+) -> Message:
+    """Load a single message file (.msg / .eml).
 
-def load_single_message(path: Path) -> Message:
-    """Load a single message file (.msg / .eml)."""
+    Attachment bytes are hashed but not retained unless ``keep_attachment_data`` is set;
+    use :mod:`mailcore.content` to fetch them later. With ``cache``, an unchanged file is
+    served from the extraction cache instead of being parsed again.
+    """
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(path)
     ext = path.suffix.lower()
     if ext == ".msg":
-        return load_msg_message(path)
+        return load_msg_message(path, keep_attachment_data=keep_attachment_data, cache=cache)
     if ext == ".eml":
-        return load_eml_message(path)
+        return load_eml_message(path, keep_attachment_data=keep_attachment_data, cache=cache)
     raise ValueError(f"Unsupported message extension: {path.suffix}")
 
 
-def load_messages_from_files(paths: Sequence[Path]) -> List[Message]:
-    messages: List[Message] = []
+def load_message_summary(path: Path) -> MessageSummary:
+    """Read only the listing fields of a .msg / .eml (subject, sender, recipients, date,
+    Message-ID, attachment count); bodies and attachments are not decoded."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(path)
+    ext = path.suffix.lower()
+    if ext == ".msg":
+        return load_msg_summary(path)
+    if ext == ".eml":
+        return load_eml_summary(path)
+    raise ValueError(f"Unsupported message extension: {path.suffix}")
+
+
+def message_files(paths: Sequence[Path]) -> List[Path]:
+    """Expand directories in ``paths`` into the .msg/.eml files below them, sorted."""
+    files: List[Path] = []
     for raw in paths:
         path = Path(raw)
         if path.is_dir():
-            for child in sorted(path.rglob("*")):
-                if child.suffix.lower() in _MESSAGE_EXTS:
-                    messages.append(load_single_message(child))
+            files.extend(walk_files(path, _MESSAGE_EXTS))
         else:
-            messages.append(load_single_message(path))
+            files.append(path)
+    return files
+
+
+def load_summaries(paths: Sequence[Path], *, progress: Optional[ProgressCallback] = None) -> List[MessageSummary]:
+    """Summaries for message files and directories of them (searched recursively)."""
+    files = message_files(paths)
+    summaries: List[MessageSummary] = []
+    for path in files:
+        summaries.append(load_message_summary(path))
+        if progress:
+            progress(len(summaries), len(files))
+    return summaries
+
+
+def load_messages_from_files(
+    paths: Sequence[Path],
+    *,
+    keep_attachment_data: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cache: Optional[ExtractionCache] = None,
+) -> List[Message]:
+    files = message_files(paths)
+    messages: List[Message] = []
+    for path in files:
+        messages.append(load_single_message(path, keep_attachment_data=keep_attachment_data, cache=cache))
+        if progress:
+            progress(len(messages), len(files))
     return messages
 
 
-def load_mailbox(path: Path) -> Mailbox:
+def load_mailbox(
+    path: Path,
+    *,
+    keep_attachment_data: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cache: Optional[ExtractionCache] = None,
+) -> Mailbox:
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(path)
     ext = path.suffix.lower()
     if path.is_dir():
-        candidates = [p for p in path.rglob('*') if p.is_file() and p.suffix.lower() in _MESSAGE_EXTS]
-        messages = load_messages_from_files(candidates)
+        messages = load_messages_from_files([path], keep_attachment_data=keep_attachment_data, progress=progress, cache=cache)
         folder = Folder(id=path.name, name=path.name, path='/', messages=messages)
         return Mailbox(source_path=path, display_name=path.name, folders=[folder])
     if ext in _MAILBOX_EXTS:
-        return load_pst_mailbox(path)
+        return load_pst_mailbox(path, keep_attachment_data=keep_attachment_data, progress=progress)
     if ext in _MESSAGE_EXTS:
-        message = load_single_message(path)
+        message = load_single_message(path, keep_attachment_data=keep_attachment_data, cache=cache)
+        if progress:
+            progress(1, 1)
         folder = Folder(id=path.stem or path.name, name=path.stem or path.name, path="/", messages=[message])
         return Mailbox(source_path=path, display_name=path.name, folders=[folder])
     raise ValueError(f"Unsupported mailbox source: {path}")
@@ -0,0 +1,118 @@
+"""Content-addressed attachment store: each distinct attachment is written once.
+
+A blob lives at ``<root>/<sha[:2]>/<sha[2:4]>/<sha>``, named by the SHA-256 of its bytes,
+and exports refer to it by that relative path instead of inlining base64. An attachment
+whose digest is already in the store is not read or written again.
+
+Blobs are streamed to a temporary file inside the store, hashed on the way, fsync'd and
+renamed into place. Readers therefore never see a partial blob. Concurrent writers of the
+same content (worker processes, RPC jobs) do not clash either: both renames install
+identical bytes. Temporary files a killed writer left behind are removed the next time
+the store is opened, once they are old enough that no live writer can own them.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from mailcombine.metrics import timed
+
+from .content import attachment_chunks
+from .models import Attachment
+
+_CHUNK = 1024 * 1024
+_INCOMING = ".incoming-"
+# Seconds after which a temporary file is taken to be abandoned rather than still being written.
+_STALE_INCOMING = 3600
+
+
+def blob_relpath(sha256: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def _chunks(data: Union[bytes, Iterable[bytes]]) -> Iterable[memoryview]:
+    pieces = [data] if isinstance(data, (bytes, bytearray, memoryview)) else data
+    for piece in pieces:
+        view = memoryview(piece)
+        for i in range(0, len(view), _CHUNK):
+            yield view[i:i + _CHUNK]
+
+
+class AttachmentStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Blobs this instance wrote, and attachments it found already stored.
+        self.written = 0
+        self.reused = 0
+        self._known: set = set()
+        self._remove_stale_incoming()
+
+    def _remove_stale_incoming(self) -> None:
+        cutoff = time.time() - _STALE_INCOMING
+        try:
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if not entry.name.startswith(_INCOMING):
+                        continue
+                    try:
+                        if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                            os.unlink(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+
+    def path(self, sha256: str) -> Path:
+        return self.root / blob_relpath(sha256)
+
+    def __contains__(self, sha256: str) -> bool:
+        if sha256 in self._known:
+            return True
+        if self.path(sha256).exists():
+            self._known.add(sha256)
+            return True
+        return False
+
+    def put(self, data: Union[bytes, Iterable[bytes]]) -> str:
+        """Store ``data`` (bytes, or an iterable of chunks) and return its SHA-256."""
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(prefix=_INCOMING, dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in _chunks(data):
+                    digest.update(chunk)
+                    fh.write(chunk)
+                fh.flush()
+                os.fsync(fh.fileno())
+            sha256 = digest.hexdigest()
+            dest = self.path(sha256)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, dest)
+            self._known.add(sha256)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.written += 1
+        return sha256
+
+    def put_attachment(self, att: Attachment) -> Optional[str]:
+        """Store ``att`` unless its digest is already present; returns the blob's relative
+        path, or None for an attachment without content."""
+        if att.sha256 and att.sha256 in self:
+            self.reused += 1
+            return blob_relpath(att.sha256)
+        with timed("store_attachment"):
+            chunks = iter(attachment_chunks(att))
+            first = next((chunk for chunk in chunks if chunk), None)
+            if first is None:
+                return None
+            return blob_relpath(self.put(itertools.chain([first], chunks)))
@@ -0,0 +1,76 @@
+"""On-demand access to attachment content for lazily loaded messages."""
+from __future__ import annotations
+
+import base64
+from typing import Iterator, Optional
+
+from mailcombine.extractors import read_attachment_bytes
+from mailcombine.metrics import timed
+
+from .models import Attachment, Message
+
+
+def attachment_bytes(att: Attachment) -> Optional[bytes]:
+    """Return the raw bytes of ``att``, re-reading its source file if needed."""
+    if att.data is not None:
+        return att.data
+    if att.data_base64:
+        return base64.b64decode(att.data_base64)
+    if att.size == 0:
+        return b""
+    if att.source_path and att.locator:
+        if att.locator.startswith("pst:"):
+            from .adapters.pst import read_pst_attachment
+
+            return read_pst_attachment(att.source_path, att.locator)
+        if att.locator.startswith("attachment:"):
+            from .adapters.msg import read_msg_attachment
+
+            return read_msg_attachment(att.source_path, att.locator)
+        return read_attachment_bytes(att.source_path, att.locator)
+    return None
+
+
+def attachment_chunks(att: Attachment) -> Iterator[bytes]:
+    """Yield the raw bytes of ``att`` in pieces.
+
+    Attachments inside a PST are streamed from the store one data block at a time; the
+    others come whole from :func:`attachment_bytes`, since their parsers decode whole parts.
+    """
+    if att.data is None and not att.data_base64 and att.size != 0 and att.source_path and att.locator and att.locator.startswith("pst:"):
+        from .adapters.pst import iter_pst_attachment
+
+        yield from iter_pst_attachment(att.source_path, att.locator)
+        return
+    data = attachment_bytes(att)
+    if data:
+        yield data
+
+
+def attachment_base64(att: Attachment) -> Optional[str]:
+    if att.data_base64:
+        return att.data_base64
+    data = attachment_bytes(att)
+    if not data:
+        return None
+    with timed("base64"):
+        return base64.b64encode(data).decode("ascii")
+
+
+def load_attachment_data(message: Message) -> Message:
+    """Materialize ``data`` for every attachment of ``message`` with a single read of its source."""
+    missing = [att for att in message.attachments if att.data is None and not att.data_base64 and att.size != 0 and att.locator and att.source_path]
+    if not missing:
+        return message
+    if missing[0].locator.startswith("pst:"):
+        # PST attachments are addressed individually; there is no per-message file to re-read.
+        for att in missing:
+            att.data = attachment_bytes(att)
+        return message
+    from .api import load_single_message
+
+    loaded = load_single_message(missing[0].source_path, keep_attachment_data=True)
+    by_locator = {att.locator: att.data for att in loaded.attachments}
+    for att in missing:
+        att.data = by_locator.get(att.locator)
+    return message
@@ -1,7 +1,21 @@
 """Export helpers re-used by CLI and future UI."""
 
-from .text import export_text
-from .json_sidecar import export_json
-from .hashes import export_hashes
+from .pipeline import ExportPipeline, Sink
+from .text import TextSink, export_text
+from .json_sidecar import JsonSidecarWriter, JsonSink, export_json
+from .hashes import HashCsvSink, export_hashes
+from .sqlite import SqliteSink, export_sqlite
 
-__all__ = ["export_text", "export_json", "export_hashes"]
+__all__ = [
+    "export_text",
+    "export_json",
+    "export_hashes",
+    "export_sqlite",
+    "JsonSidecarWriter",
+    "ExportPipeline",
+    "Sink",
+    "TextSink",
+    "JsonSink",
+    "HashCsvSink",
+    "SqliteSink",
+]
@@ -3,23 +3,73 @@ from __future__ import annotations
 
 import csv
 from pathlib import Path
-from typing import Iterable, List
+from typing import Any, Dict, Iterable, Optional
 
+from mailcombine.journal import fsync_file, restore_file
+
+from .pipeline import ExportPipeline, Sink
 from ..models import Message
 
+HASH_COLUMNS = ["type", "parent_source", "filename", "size", "sha256"]
+
+
+class HashCsvSink(Sink):
+    """One row per message and one per attachment.
+
+    ``lazy`` and ``resume`` (a byte offset from :meth:`sync`) work as for ``JsonSink``.
+    With ``blobs`` a ``blob`` column gives each attachment's path in the attachment store.
+    """
+
+    stage = "write_hashes"
+    label = "hashes CSV"
+
+    def __init__(self, dest: Path, *, resume: Optional[int] = None, lazy: bool = False, blobs: bool = False, required: bool = True):
+        super().__init__(required=required)
+        self.dest = Path(dest)
+        self.blobs = blobs
+        self._resume = resume
+        self._fh = None
+        self._writer = None
+        if not lazy:
+            self._open()
+
+    def _open(self) -> None:
+        self.dest.parent.mkdir(parents=True, exist_ok=True)
+        if restore_file(self.dest, self._resume):
+            self._fh = open(self.dest, "a", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._fh)
+        else:
+            self._fh = open(self.dest, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._fh)
+            self._writer.writerow(HASH_COLUMNS + ["blob"] if self.blobs else HASH_COLUMNS)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._writer is None:
+            self._open()
+        source = record["source"]
+        rows = [["message", source, record["file"], "", record.get("source_sha256") or ""] + ([""] if self.blobs else [])]
+        for att in record.get("attachments") or []:
+            size = att.get("size")
+            row = ["attachment", source, att.get("filename", ""), str(size if size is not None else ""), att.get("sha256") or ""]
+            if self.blobs:
+                row.append(att.get("blob") or "")
+            rows.append(row)
+        self._writer.writerows(rows)
+
+    def sync(self) -> Dict[str, Any]:
+        if self._fh is not None and not self.failed:
+            return {"hashes": fsync_file(self._fh)}
+        if self._resume is not None:
+            return {"hashes": self._resume}
+        return {}
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+        else:
+            restore_file(self.dest, self._resume)
+
 
 def export_hashes(messages: Iterable[Message], dest: Path) -> None:
-    dest = Path(dest)
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    rows: List[List[str]] = []
-    for msg in messages:
-        sha256 = next((h.value for h in msg.hashes if h.algorithm.lower() == "sha256"), "")
-        filename = msg.source_path.name if msg.source_path else msg.id
-        rows.append(["message", msg.source, filename, "", sha256 or ""])
-        for att in msg.attachments:
-            size = att.size if att.size is not None else ""
-            rows.append(["attachment", msg.source, att.filename, str(size), att.sha256 or ""])
-    with open(dest, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.writer(fh)
-        writer.writerow(["type", "parent_source", "filename", "size", "sha256"])
-        writer.writerows(rows)
+    with ExportPipeline([HashCsvSink(dest)]) as pipeline:
+        pipeline.export(messages)
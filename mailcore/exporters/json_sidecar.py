@@ -2,20 +2,140 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Any, Dict, Iterable, Optional, Tuple
 
-from ..legacy import message_to_record
+from .pipeline import ExportPipeline, Sink
+from ..blobstore import AttachmentStore
 from ..models import Message
 
 
-def export_json(messages: Iterable[Message], dest: Path, *, source_label: str, output_text_path: Optional[Path]) -> None:
-    dest = Path(dest)
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    payload = {
-        "source_root": str(source_label),
-        "output_text": str(output_text_path) if output_text_path else "",
-        "messages": [message_to_record(msg) for msg in messages],
-    }
-    with open(dest, "w", encoding="utf-8") as fh:
-        json.dump(payload, fh, ensure_ascii=False, indent=2)
+class JsonSidecarWriter:
+    """Write the sidecar one record at a time instead of building it in memory.
+
+    The default layout is byte-for-byte what ``json.dump(payload, indent=2)`` produces for
+    ``{"source_root", "output_text", "messages": [...]}``. With ``lines=True`` the file is
+    JSON Lines instead: one compact record per line, with no envelope.
+
+    ``resume=(offset, count)`` continues a file that an interrupted run left behind. The
+    file is cut back to ``offset`` (a value from :meth:`sync`), which held ``count``
+    records, and writing carries on from there.
+    """
+
+    def __init__(
+        self,
+        dest: Path,
+        *,
+        source_label: str,
+        output_text_path: Optional[Path],
+        lines: bool = False,
+        resume: Optional[Tuple[int, int]] = None,
+    ):
+        self.dest = Path(dest)
+        self.dest.parent.mkdir(parents=True, exist_ok=True)
+        self.lines = lines
+        self.count = 0
+        if resume is not None:
+            offset, self.count = resume
+            os.truncate(self.dest, offset)
+            self._fh = open(self.dest, "a", encoding="utf-8")
+            return
+        self._fh = open(self.dest, "w", encoding="utf-8")
+        if not lines:
+            head = json.dumps(
+                {"source_root": str(source_label), "output_text": str(output_text_path) if output_text_path else ""},
+                ensure_ascii=False,
+                indent=2,
+            )
+            # Re-open the envelope object so records can be appended to "messages".
+            self._fh.write(head[:-2] + ',\n  "messages": [')
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self.lines:
+            self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            body = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+            self._fh.write(("," if self.count else "") + "\n    " + body)
+        self.count += 1
+
+    def sync(self) -> int:
+        """Flush and fsync what has been written so far; returns the file's byte length."""
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        return self._fh.tell()
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        if not self.lines:
+            self._fh.write("\n  ]\n}" if self.count else "]\n}")
+        self._fh.close()
+
+    def __enter__(self) -> "JsonSidecarWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class JsonSink(Sink):
+    """Pipeline sink around :class:`JsonSidecarWriter`.
+
+    With ``lazy`` the file is only created once there is a record to write; a lazy sink
+    given ``resume`` that receives nothing still closes the resumed file properly.
+    """
+
+    stage = "write_json"
+    label = "JSON log"
+    needs_content = True
+
+    def __init__(
+        self,
+        dest: Path,
+        *,
+        source_label: str,
+        output_text_path: Optional[Path],
+        lines: bool = False,
+        resume: Optional[Tuple[int, int]] = None,
+        lazy: bool = False,
+        required: bool = True,
+    ):
+        super().__init__(required=required)
+        self.dest = Path(dest)
+        self._args = {"source_label": source_label, "output_text_path": output_text_path, "lines": lines, "resume": resume}
+        self._resume = resume
+        self._writer: Optional[JsonSidecarWriter] = None if lazy else JsonSidecarWriter(self.dest, **self._args)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._writer is None:
+            self._writer = JsonSidecarWriter(self.dest, **self._args)
+        self._writer.write(record)
+
+    def sync(self) -> Dict[str, Any]:
+        if self._writer is not None and not self.failed:
+            return {"json": self._writer.sync(), "json_count": self._writer.count}
+        if self._resume is not None:
+            return {"json": self._resume[0], "json_count": self._resume[1]}
+        return {}
+
+    def close(self) -> None:
+        if self._writer is None and self._resume is not None:
+            # Everything was written before the interruption; only the closing bracket is missing.
+            self._writer = JsonSidecarWriter(self.dest, **self._args)
+        if self._writer is not None:
+            self._writer.close()
+
+
+def export_json(
+    messages: Iterable[Message],
+    dest: Path,
+    *,
+    source_label: str,
+    output_text_path: Optional[Path],
+    lines: bool = False,
+    store: Optional[AttachmentStore] = None,
+) -> None:
+    """With a ``store``, attachments are written there and referenced by ``blob`` path."""
+    with ExportPipeline([JsonSink(dest, source_label=source_label, output_text_path=output_text_path, lines=lines)], store=store) as pipeline:
+        pipeline.export(messages)
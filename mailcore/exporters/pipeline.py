@@ -0,0 +1,154 @@
+"""Single-pass export: one walk over the messages feeds every registered sink.
+
+Each message is converted to a legacy record once (:func:`message_to_record`) and the
+same record is handed to each sink in turn, so adding an output format costs one more
+write per message rather than another pass over the mailbox.
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from mailcombine.metrics import timed
+
+from ..blobstore import AttachmentStore
+from ..legacy import message_to_record
+from ..models import Message
+
+
+class Sink(ABC):
+    """One export output. Subclasses implement :meth:`write`; the rest is optional.
+
+    A ``required`` sink's errors abort the export. Otherwise the pipeline reports the error
+    through its ``on_error`` callback, marks the sink ``failed`` and stops feeding it.
+    """
+
+    # Metrics stage :meth:`write` is timed under, and the name used in warnings.
+    stage = "write"
+    label = "output"
+    # Whether records must carry attachment ``content_base64``.
+    needs_content = False
+
+    def __init__(self, *, required: bool = True):
+        self.required = required
+        self.failed = False
+        self.count = 0
+
+    @abstractmethod
+    def write(self, record: Dict[str, Any]) -> None:
+        """Write one record."""
+
+    def write_error(self, heading: str, detail: str) -> None:
+        """Note an item that could not be read. Only the text output records these."""
+
+    def sync(self) -> Dict[str, Any]:
+        """Flush to disk and return the state a resumed run needs (see ``RunJournal``)."""
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class ExportPipeline:
+    """Feed records to a set of sinks in one pass.
+
+    ``on_error(sink, exc)`` is called when a non-required sink fails. With a ``store``,
+    attachment content goes to that :class:`AttachmentStore` and records reference it by
+    ``blob`` path instead of carrying base64. Use it as a context manager, or call
+    :meth:`close` when done.
+    """
+
+    def __init__(
+        self,
+        sinks: Iterable[Sink] = (),
+        *,
+        on_error: Optional[Callable[[Sink, Exception], None]] = None,
+        store: Optional[AttachmentStore] = None,
+    ):
+        self.sinks: List[Sink] = list(sinks)
+        self.on_error = on_error
+        self.store = store
+
+    def add(self, sink: Sink) -> Sink:
+        self.sinks.append(sink)
+        return sink
+
+    @property
+    def needs_content(self) -> bool:
+        return any(sink.needs_content and not sink.failed for sink in self.sinks)
+
+    @property
+    def needs_attachment_data(self) -> bool:
+        """Whether messages should be loaded with their attachment bytes."""
+        return self.store is not None or self.needs_content
+
+    def convert(self, message: Message) -> Dict[str, Any]:
+        """The record every sink receives, with attachment content only if one needs it."""
+        return message_to_record(message, include_content=self.needs_content, store=self.store)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        for sink in self.sinks:
+            if sink.failed:
+                continue
+            try:
+                with timed(sink.stage):
+                    sink.write(record)
+            except Exception as exc:
+                self._fail(sink, exc)
+            else:
+                sink.count += 1
+
+    def write_message(self, message: Message) -> Dict[str, Any]:
+        record = self.convert(message)
+        self.write(record)
+        return record
+
+    def export(self, messages: Iterable[Message]) -> int:
+        """Write every message; returns how many there were."""
+        count = 0
+        for message in messages:
+            self.write_message(message)
+            count += 1
+        return count
+
+    def write_error(self, heading: str, detail: str) -> None:
+        for sink in self.sinks:
+            if sink.failed:
+                continue
+            try:
+                sink.write_error(heading, detail)
+            except Exception as exc:
+                self._fail(sink, exc)
+
+    def sync(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {}
+        for sink in self.sinks:
+            state.update(sink.sync())
+        return state
+
+    def close(self) -> None:
+        # Every sink gets closed; the first error of a required one is raised afterwards.
+        error: Optional[Exception] = None
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as exc:
+                if sink.required:
+                    error = error or exc
+                elif not sink.failed:
+                    self._fail(sink, exc)
+        if error is not None:
+            raise error
+
+    def _fail(self, sink: Sink, exc: Exception) -> None:
+        if sink.required:
+            raise exc
+        sink.failed = True
+        if self.on_error is not None:
+            self.on_error(sink, exc)
+
+    def __enter__(self) -> "ExportPipeline":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,242 @@
+"""SQLite exporter: the converted messages as normalized, queryable tables.
+
+``sources`` holds one row per file read (a .msg/.eml, or a PST/OST for every message
+inside it) with its SHA-256. ``messages`` references its source, ``recipients`` and
+``attachments`` reference their message, and the ``hashes`` view lists the same rows as
+the hash CSV. Row ids are assigned here, in write order, so whole batches go in with
+``executemany`` and no lookups. The load runs in large transactions without any
+secondary index, and the indexes are built once at :meth:`SqliteSink.close`.
+
+``resume`` takes a message count from :meth:`SqliteSink.sync` and deletes everything
+written after it, the way the file outputs are cut back to a byte offset.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+from email.utils import getaddresses
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from mailcombine.metrics import timed
+
+from .pipeline import ExportPipeline, Sink
+from ..models import Message
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    sha256 TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources (id),
+    source TEXT NOT NULL,
+    file TEXT,
+    date TEXT,
+    sender TEXT,
+    "to" TEXT,
+    cc TEXT,
+    bcc TEXT,
+    subject TEXT,
+    internet_message_id TEXT,
+    body TEXT,
+    body_html TEXT,
+    attachment_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recipients (
+    message_id INTEGER NOT NULL REFERENCES messages (id),
+    kind TEXT NOT NULL,
+    name TEXT,
+    address TEXT
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    id INTEGER PRIMARY KEY,
+    message_id INTEGER NOT NULL REFERENCES messages (id),
+    position INTEGER NOT NULL,
+    filename TEXT,
+    size INTEGER,
+    content_type TEXT,
+    sha256 TEXT
+);
+-- The rows of the hashes CSV, without storing any digest twice.
+CREATE VIEW IF NOT EXISTS hashes AS
+    SELECT m.id AS message_id, NULL AS attachment_id, 'message' AS type, m.source AS parent_source,
+           m.file AS filename, NULL AS size, s.sha256 AS sha256
+    FROM messages m JOIN sources s ON s.id = m.source_id
+    UNION ALL
+    SELECT a.message_id, a.id, 'attachment', m.source, a.filename, a.size, a.sha256
+    FROM attachments a JOIN messages m ON m.id = a.message_id;
+"""
+
+# Built after the load: maintaining them row by row is what makes bulk inserts slow.
+_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS sources_path ON sources (path);
+CREATE INDEX IF NOT EXISTS messages_source ON messages (source_id);
+CREATE INDEX IF NOT EXISTS messages_date ON messages (date);
+CREATE INDEX IF NOT EXISTS messages_internet_message_id ON messages (internet_message_id);
+CREATE INDEX IF NOT EXISTS recipients_message ON recipients (message_id);
+CREATE INDEX IF NOT EXISTS recipients_address ON recipients (address);
+CREATE INDEX IF NOT EXISTS attachments_message ON attachments (message_id);
+CREATE INDEX IF NOT EXISTS attachments_sha256 ON attachments (sha256);
+CREATE INDEX IF NOT EXISTS sources_sha256 ON sources (sha256);
+"""
+
+_INSERTS = {
+    "sources": "INSERT INTO sources VALUES (?, ?, ?, ?)",
+    "messages": "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "recipients": "INSERT INTO recipients VALUES (?, ?, ?, ?)",
+    "attachments": "INSERT INTO attachments VALUES (?, ?, ?, ?, ?, ?, ?)",
+}
+
+# Messages buffered per executemany, and per transaction.
+_BATCH = 2000
+_COMMIT_EVERY = 50000
+
+# Messages inside a container have sources like "<store.pst> :: /Inbox/123".
+_CONTAINER_SEP = " :: "
+
+
+# "Name <addr>" or a bare "addr", with nothing that needs the full RFC 5322 parser.
+_ATOM = r'[^<>()\[\]:;@\\,"\s]+'
+_SIMPLE_ADDRESS = re.compile(rf'([^<>()\[\]:;@\\,"]*?)\s*<({_ATOM}@{_ATOM})>|({_ATOM}@{_ATOM})')
+
+
+@lru_cache(maxsize=16384)
+def _addresses(line: str) -> Tuple[Tuple[str, str], ...]:
+    """``(name, address)`` pairs of a recipient line (.msg records separate them with ";").
+
+    The lines of a mailbox repeat a lot, so results are cached. Plain lists are split
+    with a regular expression; anything else goes through ``getaddresses``.
+    """
+    line = line.replace(";", ",")
+    pairs = []
+    for part in line.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = _SIMPLE_ADDRESS.fullmatch(part)
+        if match is None:
+            return tuple(pair for pair in getaddresses([line]) if any(pair))
+        name, address, bare = match.groups()
+        pairs.append(("", bare) if bare else (" ".join(name.split()), address))
+    return tuple(pairs)
+
+
+class SqliteSink(Sink):
+    stage = "write_sqlite"
+    label = "SQLite database"
+
+    def __init__(self, dest: Path, *, resume: Optional[int] = None, required: bool = True):
+        super().__init__(required=required)
+        self.dest = Path(dest)
+        self.dest.parent.mkdir(parents=True, exist_ok=True)
+        if resume is None or not self.dest.exists():
+            resume = 0
+            for stale in (self.dest, Path(str(self.dest) + "-wal"), Path(str(self.dest) + "-shm")):
+                try:
+                    stale.unlink()
+                except FileNotFoundError:
+                    pass
+        self._db = sqlite3.connect(str(self.dest))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA temp_store=MEMORY")
+        self._db.execute("PRAGMA cache_size=-65536")
+        self._db.executescript(_SCHEMA)
+        self._sources: Dict[str, int] = {}
+        self._rows: Dict[str, List[tuple]] = {table: [] for table in _INSERTS}
+        self._uncommitted = 0
+        self.messages = self._synced = resume
+        if resume:
+            self._truncate(resume)
+        self._last_source = max(self._sources.values(), default=0)
+        self._next_attachment = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM attachments").fetchone()[0] + 1
+
+    def _truncate(self, keep: int) -> None:
+        for table in ("recipients", "attachments"):
+            self._db.execute(f"DELETE FROM {table} WHERE message_id > ?", (keep,))
+        self._db.execute("DELETE FROM messages WHERE id > ?", (keep,))
+        self._db.execute("DELETE FROM sources WHERE id NOT IN (SELECT source_id FROM messages)")
+        self._db.commit()
+        self._sources = {path: source_id for source_id, path in self._db.execute("SELECT id, path FROM sources")}
+
+    def _source_id(self, source: str, sha256: Optional[str]) -> int:
+        path = source.split(_CONTAINER_SEP, 1)[0]
+        source_id = self._sources.get(path)
+        if source_id is None:
+            self._last_source += 1
+            source_id = self._sources[path] = self._last_source
+            kind = os.path.splitext(path)[1].lower().lstrip(".")
+            # A container's own digest is not known here; only standalone files carry one.
+            self._rows["sources"].append((source_id, path, kind, None if _CONTAINER_SEP in source else sha256))
+        return source_id
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.messages += 1
+        message_id = self.messages
+        source = record.get("source") or ""
+        sha256 = record.get("source_sha256")
+        attachments = record.get("attachments") or []
+        rows = self._rows
+        rows["messages"].append((
+            message_id, self._source_id(source, sha256), source, record.get("file"), record.get("date"), record.get("from"),
+            record.get("to"), record.get("cc"), record.get("bcc"), record.get("subject"), record.get("message_id"),
+            record.get("body"), record.get("body_html"), len(attachments),
+        ))
+        for kind in ("to", "cc", "bcc"):
+            line = record.get(kind)
+            if line:
+                rows["recipients"].extend((message_id, kind, name, address) for name, address in _addresses(line))
+        for position, att in enumerate(attachments):
+            attachment_id = self._next_attachment
+            self._next_attachment += 1
+            rows["attachments"].append((attachment_id, message_id, position, att.get("filename"), att.get("size"), att.get("content_type"), att.get("sha256")))
+        if len(rows["messages"]) >= _BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        pending = len(self._rows["messages"])
+        for table, sql in _INSERTS.items():
+            rows = self._rows[table]
+            if rows:
+                self._db.executemany(sql, rows)
+                rows.clear()
+        self._uncommitted += pending
+        if self._uncommitted >= _COMMIT_EVERY:
+            self._db.commit()
+            self._uncommitted = 0
+
+    def sync(self) -> Dict[str, Any]:
+        """Commit everything written so far; returns ``{"sqlite": <message count>}``."""
+        if not self.failed:
+            self._flush()
+            self._db.commit()
+            self._uncommitted = 0
+            self._synced = self.messages
+        return {"sqlite": self._synced}
+
+    def close(self) -> None:
+        if self._db is None:
+            return
+        try:
+            if not self.failed:
+                self._flush()
+                self._db.commit()
+                with timed("sqlite_index"):
+                    self._db.executescript(_INDEXES)
+                    self._db.execute("PRAGMA optimize")
+                self._db.commit()
+        finally:
+            self._db.close()
+            self._db = None
+
+
+def export_sqlite(messages: Iterable[Message], dest: Path) -> int:
+    """Write ``messages`` to a new SQLite database at ``dest``; returns the message count."""
+    with ExportPipeline([SqliteSink(dest)]) as pipeline:
+        return pipeline.export(messages)
@@ -2,19 +2,58 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Dict, Iterable, Optional
 
-from mailcombine.writer import write_header, write_record
+from mailcombine.journal import fsync_file, restore_file
+from mailcombine.writer import write_error, write_header, write_record
 
-from ..legacy import message_to_record
+from .pipeline import ExportPipeline, Sink
 from ..models import Message
 
 
+class TextSink(Sink):
+    """The combined text file. It is created (with its header) straight away.
+
+    ``resume`` is a byte offset from :meth:`sync`: an existing file is cut back to it and
+    appended to instead of being rewritten.
+    """
+
+    stage = "write_text"
+    label = "text output"
+
+    def __init__(
+        self,
+        dest: Path,
+        *,
+        source_label: str,
+        show_attachments: bool = False,
+        encoding: str = "utf-8",
+        resume: Optional[int] = None,
+        required: bool = True,
+    ):
+        super().__init__(required=required)
+        self.dest = Path(dest)
+        self.dest.parent.mkdir(parents=True, exist_ok=True)
+        self.show_attachments = show_attachments
+        if restore_file(self.dest, resume):
+            self._out = open(self.dest, "a", encoding=encoding, errors="replace")
+        else:
+            self._out = open(self.dest, "w", encoding=encoding, errors="replace")
+            write_header(self._out, str(source_label))
+
+    def write(self, record: Dict[str, Any]) -> None:
+        write_record(self._out, record, show_attachments=self.show_attachments)
+
+    def write_error(self, heading: str, detail: str) -> None:
+        write_error(self._out, heading, detail)
+
+    def sync(self) -> Dict[str, Any]:
+        return {"txt": fsync_file(self._out)}
+
+    def close(self) -> None:
+        self._out.close()
+
+
 def export_text(messages: Iterable[Message], dest: Path, *, source_label: str, show_attachments: bool = False, encoding: str = "utf-8") -> None:
-    dest = Path(dest)
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    with open(dest, "w", encoding=encoding, errors="replace") as out:
-        write_header(out, source_label)
-        for msg in messages:
-            rec = message_to_record(msg)
-            write_record(out, rec, show_attachments=show_attachments)
+    with ExportPipeline([TextSink(dest, source_label=source_label, show_attachments=show_attachments, encoding=encoding)]) as pipeline:
+        pipeline.export(messages)
@@ -0,0 +1,156 @@
+"""SQLite FTS5 full-text index over converted messages.
+
+The index is built from legacy records while a conversion streams them out. It covers
+subject, sender, recipients, body and attachment filenames. Each document remembers
+where its message came from: the file ``path``, plus a ``locator`` for messages inside a
+container (``pst:<nid>``, or ``sha256:<hex>`` for a store only readpst can read). A
+search hit can therefore be re-opened without re-reading its whole mailbox, except for
+readpst stores. Adding the same source twice replaces the earlier document, so a resumed
+run never indexes a message twice.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    locator TEXT,
+    source TEXT,
+    date TEXT,
+    message_id TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    subject, sender, recipients, body, attachments,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# bm25 column weights: subject, sender, recipients, body, attachments.
+_RANK = "bm25(10.0, 4.0, 4.0, 1.0, 3.0)"
+
+_COMMIT_EVERY = 2000
+
+
+def _fallback_query(query: str) -> str:
+    """Quote every term, for input that is not valid FTS5 query syntax."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class SearchIndex:
+    def __init__(self, db_path: Path, *, readonly: bool = False, reset: bool = False):
+        self.db_path = Path(db_path)
+        self.readonly = readonly
+        self.added = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        if readonly:
+            if not self.db_path.exists():
+                raise FileNotFoundError(f"Search index not found: {self.db_path}")
+            uri = self.db_path.resolve().as_uri() + "?mode=ro"
+            self._db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if reset:
+            self._db.executescript("DROP TABLE IF EXISTS docs; DROP TABLE IF EXISTS docs_fts;")
+        fresh = self._db.execute("SELECT 1 FROM sqlite_master WHERE name = 'docs_fts'").fetchone() is None
+        self._db.executescript(_SCHEMA)
+        if fresh:
+            self._db.execute("INSERT INTO docs_fts(docs_fts, rank) VALUES ('rank', ?)", (_RANK,))
+            self._db.commit()
+
+    def add(self, record: Mapping[str, Any], *, path: Path, locator: Optional[str] = None) -> None:
+        """Index one legacy record (as produced by ``message_to_record``)."""
+        key = f"{path}#{locator}" if locator else str(path)
+        recipients = " ".join(record.get(k) or "" for k in ("to", "cc", "bcc"))
+        attachments = " ".join(a.get("filename") or "" for a in record.get("attachments") or [])
+        meta = (str(path), locator, record.get("source"), record.get("date"), record.get("message_id"))
+        text = (record.get("subject") or "", record.get("from") or "", recipients, record.get("body") or "", attachments)
+        with self._lock:
+            row = self._db.execute("SELECT id FROM docs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                doc_id = self._db.execute(
+                    "INSERT INTO docs (key, path, locator, source, date, message_id) VALUES (?, ?, ?, ?, ?, ?)", (key,) + meta
+                ).lastrowid
+            else:
+                doc_id = row[0]
+                self._db.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+                self._db.execute(
+                    "UPDATE docs SET path = ?, locator = ?, source = ?, date = ?, message_id = ? WHERE id = ?", meta + (doc_id,)
+                )
+            self._db.execute(
+                "INSERT INTO docs_fts (rowid, subject, sender, recipients, body, attachments) VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id,) + text,
+            )
+            self.added += 1
+            self._pending += 1
+            if self._pending >= _COMMIT_EVERY:
+                self._db.commit()
+                self._pending = 0
+
+    def sync(self) -> None:
+        """Commit the documents added since the last commit, e.g. before a journal checkpoint."""
+        with self._lock:
+            if self._pending:
+                self._db.commit()
+                self._pending = 0
+
+    def search(self, query: str, *, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Best matches first. ``query`` uses FTS5 syntax (``subject:invoice AND "wire transfer"``);
+        input that is not valid syntax is searched as plain terms."""
+        sql = (
+            "SELECT d.path, d.locator, d.source, d.date, d.message_id, f.subject, f.sender, "
+            "snippet(docs_fts, -1, '[', ']', '...', 16), f.rank "
+            "FROM docs_fts f JOIN docs d ON d.id = f.rowid "
+            "WHERE docs_fts MATCH ? ORDER BY f.rank LIMIT ? OFFSET ?"
+        )
+        with self._lock:
+            try:
+                rows = self._db.execute(sql, (query, limit, offset)).fetchall()
+            except sqlite3.OperationalError:
+                rows = self._db.execute(sql, (_fallback_query(query), limit, offset)).fetchall()
+        return [
+            {
+                "path": path,
+                "locator": locator,
+                "source": source,
+                "date": date,
+                "message_id": message_id,
+                "subject": subject,
+                "sender": sender,
+                "snippet": snippet,
+                "score": -rank,
+            }
+            for path, locator, source, date, message_id, subject, sender, snippet, rank in rows
+        ]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self, *, optimize: bool = False) -> None:
+        """Commit; ``optimize`` merges the FTS segments, which keeps queries fast on large indexes."""
+        with self._lock:
+            if self._db is None:
+                return
+            if not self.readonly:
+                self._db.commit()
+                if optimize:
+                    self._db.execute("INSERT INTO docs_fts(docs_fts) VALUES ('optimize')")
+                    self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def __enter__(self) -> "SearchIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
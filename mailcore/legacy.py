@@ -2,17 +2,29 @@
 
 from __future__ import annotations
 
-from typing import Dict
+from typing import Dict, Optional
 
+from mailcombine.metrics import timed_call
+
+from .blobstore import AttachmentStore
+from .content import attachment_base64, load_attachment_data
 from .models import Message
 
 
-def message_to_record(message: Message) -> Dict[str, object]:
-    """Convert a :class:`Message` into the legacy dict format expected by writer/exporters."""
+@timed_call("to_record")
+def message_to_record(message: Message, *, include_content: bool = True, store: Optional[AttachmentStore] = None) -> Dict[str, object]:
+    """Convert a :class:`Message` into the legacy dict format expected by writer/exporters.
+
+    ``content_base64`` is only materialized when ``include_content`` is set; the text
+    writer never looks at it. With a ``store`` the content is written there instead and
+    each attachment gets a ``blob`` key: its path relative to the store.
+    """
     to_line = ", ".join(message.to)
     cc_line = ", ".join(message.cc)
     bcc_line = ", ".join(message.bcc)
     sent = message.sent_at.isoformat() if message.sent_at else ""
+    if include_content and store is None:
+        load_attachment_data(message)  # one read of the source, not one per attachment
 
     attachments = [
         {
@@ -21,17 +33,26 @@ def message_to_record(message: Message) -> Dict[str, object]:
             "size": att.size,
             "sha256": att.sha256,
             "content_type": att.content_type,
-            "content_base64": att.data_base64,
+            "content_base64": attachment_base64(att) if include_content and store is None else None,
         }
         for att in message.attachments
     ]
+    if store is not None:
+        for entry, att in zip(attachments, message.attachments):
+            entry["blob"] = store.put_attachment(att)
 
     sha256_hash = next((h.value for h in message.hashes if h.algorithm.lower() == "sha256"), None)
 
     body = message.body_text or ""
 
+    if message.locator:
+        # A message inside a store is named by its place there (".../Inbox/123" -> "123").
+        file_name = message.source.rsplit("/", 1)[-1]
+    else:
+        file_name = message.source_path.name if message.source_path else message.id
+
     return {
-        "file": message.source_path.name if message.source_path else message.id,
+        "file": file_name,
         "source": message.source,
         "date": sent,
         "from": message.sender,
@@ -1,19 +1,26 @@
-"""Dataclasses describing email entities shared across tooling."""
+"""Dataclasses describing email entities shared across tooling.
+
+The classes use ``__slots__`` where the interpreter supports it (Python 3.10+), which
+takes the per-instance ``__dict__`` off every message and attachment of a loaded mailbox.
+"""
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence
+from typing import Dict, Iterator, List, Optional, Sequence
+
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class HashInfo:
     algorithm: str
     value: str
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Attachment:
     id: str
     filename: str
@@ -22,16 +29,20 @@ class Attachment:
     sha256: Optional[str] = None
     source_path: Optional[Path] = None
     data_base64: Optional[str] = None
+    # Content is lazy: ``locator`` identifies the attachment inside ``source_path`` and
+    # ``data`` only holds raw bytes when the source cannot be re-opened later.
+    locator: Optional[str] = None
+    data: Optional[bytes] = field(default=None, repr=False)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class BodyPart:
     content_type: str
     content: str
     charset: Optional[str] = None
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Message:
     id: str
     source: str
@@ -44,13 +55,32 @@ class Message:
     sent_at: Optional[datetime] = None
     body_text: Optional[str] = None
     body_html: Optional[str] = None
+    # Alternative bodies beyond ``body_text``/``body_html``; the plain text is not repeated here.
     body_parts: List[BodyPart] = field(default_factory=list)
     attachments: List[Attachment] = field(default_factory=list)
     headers: Dict[str, str] = field(default_factory=dict)
     hashes: List[HashInfo] = field(default_factory=list)
+    # Where the message lives inside a container (``pst:<nid>``); None for standalone files.
+    locator: Optional[str] = None
+
+
+@dataclass(**_SLOTS)
+class MessageSummary:
+    """Listing fields of a message file, read without decoding bodies or attachments."""
+
+    source: str
+    source_path: Optional[Path] = None
+    subject: str = ""
+    sender: str = ""
+    to: Sequence[str] = field(default_factory=list)
+    sent_at: Optional[datetime] = None
+    message_id: str = ""
+    attachment_count: int = 0
+    # Size of the source file in bytes.
+    size: Optional[int] = None
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Folder:
     id: str
     name: str
@@ -59,17 +89,16 @@ class Folder:
     subfolders: List["Folder"] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Mailbox:
     source_path: Path
     display_name: str
     folders: List[Folder] = field(default_factory=list)
 
-    def all_messages(self) -> List[Message]:
+    def all_messages(self) -> Iterator[Message]:
+        """Yield every message, folder by folder, without building a combined list."""
         stack = list(self.folders)
-        collected: List[Message] = []
         while stack:
             folder = stack.pop()
-            collected.extend(folder.messages)
+            yield from folder.messages
             stack.extend(folder.subfolders)
-        return collected
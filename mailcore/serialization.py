@@ -4,9 +4,11 @@ from __future__ import annotations
 from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-from .models import Attachment, BodyPart, HashInfo, Mailbox, Message
+from .blobstore import AttachmentStore
+from .content import attachment_base64, attachment_bytes
+from .models import Attachment, BodyPart, HashInfo, Mailbox, Message, MessageSummary
 
 
 def _iso(dt: datetime | None) -> str | None:
@@ -18,26 +20,39 @@ def _iso(dt: datetime | None) -> str | None:
         return None
 
 
-def mailbox_to_dict(mailbox: Mailbox) -> Dict[str, Any]:
+def _attachment_data(att: Attachment, raw: bool, store: Optional[AttachmentStore] = None) -> Dict[str, Any]:
+    # ``raw`` is for the binary RPC framing, which ships bytes as-is instead of base64.
+    # With a ``store`` the content is written there and referenced by its blob path.
+    if store is not None:
+        return {"DataBase64": None, "Blob": store.put_attachment(att)}
+    if raw:
+        return {"Data": attachment_bytes(att)}
+    return {"DataBase64": attachment_base64(att)}
+
+
+def mailbox_to_dict(
+    mailbox: Mailbox, *, include_attachment_data: bool = True, raw: bool = False, store: Optional[AttachmentStore] = None
+) -> Dict[str, Any]:
     return {
         "SourcePath": str(mailbox.source_path),
         "DisplayName": mailbox.display_name,
-        "Folders": [_folder_to_dict(f) for f in mailbox.folders],
+        "Folders": [_folder_to_dict(f, include_attachment_data, raw, store) for f in mailbox.folders],
     }
 
 
-def _folder_to_dict(folder) -> Dict[str, Any]:
+def _folder_to_dict(folder, include_attachment_data: bool = True, raw: bool = False, store: Optional[AttachmentStore] = None) -> Dict[str, Any]:
     return {
         "Id": folder.id,
         "Name": folder.name,
         "Path": folder.path,
-        "Messages": [message_to_dict(m) for m in folder.messages],
-        "Subfolders": [_folder_to_dict(sub) for sub in folder.subfolders],
+        "Messages": [message_to_dict(m, include_attachment_data=include_attachment_data, raw=raw, store=store) for m in folder.messages],
+        "Subfolders": [_folder_to_dict(sub, include_attachment_data, raw, store) for sub in folder.subfolders],
     }
 
 
-
-def message_to_dict(message: Message) -> Dict[str, Any]:
+def message_to_dict(
+    message: Message, *, include_attachment_data: bool = True, raw: bool = False, store: Optional[AttachmentStore] = None
+) -> Dict[str, Any]:
     return {
         "Id": message.id,
         "Source": message.source,
@@ -57,13 +72,56 @@ def message_to_dict(message: Message) -> Dict[str, Any]:
                 "Size": att.size,
                 "Sha256": att.sha256,
                 "ContentType": att.content_type,
-                "DataBase64": att.data_base64,
+                **(_attachment_data(att, raw, store) if include_attachment_data else {"DataBase64": None}),
             }
             for att in message.attachments
         ],
     }
 
 
+def message_size(message: Message) -> int:
+    """Approximate content size: body text, HTML and attachment bytes."""
+    size = len(message.body_text or "") + len(message.body_html or "")
+    return size + sum(att.size or 0 for att in message.attachments)
+
+
+def message_summary_to_dict(message: Message, key: str) -> Dict[str, Any]:
+    """Lightweight listing row; ``key`` is the server-side handle used to fetch the full message."""
+    return {
+        "Key": key,
+        "Id": message.id,
+        "Subject": message.subject,
+        "Sender": message.sender,
+        "SentAt": _iso(message.sent_at),
+        "Size": message_size(message),
+        "AttachmentCount": len(message.attachments),
+    }
+
+
+def summary_to_dict(summary: MessageSummary) -> Dict[str, Any]:
+    """Listing row for a message file read header-only (see ``mailcore.load_message_summary``)."""
+    return {
+        "Source": summary.source,
+        "Subject": summary.subject,
+        "Sender": summary.sender,
+        "To": list(summary.to),
+        "SentAt": _iso(summary.sent_at),
+        "MessageId": summary.message_id,
+        "AttachmentCount": summary.attachment_count,
+        "Size": summary.size,
+    }
+
+
+def attachment_content_to_dict(att: Attachment, *, raw: bool = False, store: Optional[AttachmentStore] = None) -> Dict[str, Any]:
+    return {
+        "Id": att.id,
+        "Filename": att.filename,
+        "Size": att.size,
+        "ContentType": att.content_type,
+        **_attachment_data(att, raw, store),
+    }
+
+
 def dict_to_message(data: Dict[str, Any]) -> Message:
     attachments = [
         Attachment(
@@ -73,6 +131,7 @@ def dict_to_message(data: Dict[str, Any]) -> Message:
             content_type=att.get("ContentType"),
             sha256=att.get("Sha256"),
             data_base64=att.get("DataBase64"),
+            data=att.get("Data") if isinstance(att.get("Data"), bytes) else None,
         )
         for att in data.get("Attachments", [])
     ]
@@ -0,0 +1,86 @@
+"""Server-side mailbox views backing the paged browsing RPC methods."""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from ..models import Folder, Mailbox, Message
+from ..serialization import message_size, message_summary_to_dict
+
+
+class MailboxView:
+    """Index a loaded :class:`Mailbox` so folders can be listed and paged cheaply.
+
+    Every message gets a key (``"<folder id>/<position>"``) that stays valid for the
+    lifetime of the view, independent of Message-ID collisions.
+    """
+
+    def __init__(self, mailbox: Mailbox):
+        self.mailbox = mailbox
+        self._folders: Dict[str, Folder] = {}
+        self._messages: Dict[str, Message] = {}
+        stack: List[Folder] = list(mailbox.folders)
+        while stack:
+            folder = stack.pop()
+            self._folders[folder.id] = folder
+            for idx, message in enumerate(folder.messages):
+                self._messages[self._key(folder, idx)] = message
+            stack.extend(folder.subfolders)
+
+    @staticmethod
+    def _key(folder: Folder, idx: int) -> str:
+        return f"{folder.id}/{idx}"
+
+    def folder_tree(self) -> Dict[str, Any]:
+        def node(folder: Folder) -> Dict[str, Any]:
+            children = [node(sub) for sub in folder.subfolders]
+            return {
+                "Id": folder.id,
+                "Name": folder.name,
+                "Path": folder.path,
+                "MessageCount": len(folder.messages),
+                "TotalCount": len(folder.messages) + sum(c["TotalCount"] for c in children),
+                "Subfolders": children,
+            }
+
+        return {
+            "SourcePath": str(self.mailbox.source_path),
+            "DisplayName": self.mailbox.display_name,
+            "Folders": [node(f) for f in self.mailbox.folders],
+        }
+
+    def folder(self, folder_id: str) -> Folder:
+        try:
+            return self._folders[folder_id]
+        except KeyError:
+            raise ValueError(f"Unknown folder: {folder_id}") from None
+
+    def page(self, folder_id: str, offset: int = 0, limit: int = 100) -> Dict[str, Any]:
+        folder = self.folder(folder_id)
+        offset = max(0, int(offset))
+        limit = max(0, int(limit))
+        rows = [
+            message_summary_to_dict(folder.messages[idx], self._key(folder, idx))
+            for idx in range(offset, min(offset + limit, len(folder.messages)))
+        ]
+        return {"FolderId": folder.id, "Total": len(folder.messages), "Offset": offset, "Messages": rows}
+
+    def message(self, key: str) -> Message:
+        try:
+            return self._messages[key]
+        except KeyError:
+            raise ValueError(f"Unknown message key: {key}") from None
+
+    def messages(self, keys: List[str]) -> List[Message]:
+        return [self.message(k) for k in keys]
+
+    def keys(self) -> List[str]:
+        return list(self._messages)
+
+    def folder_keys(self, folder: Folder) -> List[str]:
+        return [self._key(folder, idx) for idx in range(len(folder.messages))]
+
+    def estimated_size(self) -> int:
+        return sum(message_size(m) for m in self._messages.values())
+
+    def __len__(self) -> int:
+        return len(self._messages)
@@ -0,0 +1,114 @@
+"""Length-prefixed binary framing for the RPC bridge.
+
+Every frame is a 13-byte little-endian header ``kind (u8), ref (u32), length (u64)`` and
+then ``length`` bytes of payload:
+
+* ``KIND_JSON`` carries one JSON-RPC envelope as compact UTF-8 JSON. ``ref`` is the number
+  of blob frames that follow and belong to it.
+* ``KIND_BLOB`` carries raw bytes. ``ref`` is the blob index inside the preceding envelope.
+
+In the envelope, ``{"$blob": i}`` stands for ``bytes`` and ``{"$text": i}`` for a string
+whose UTF-8 bytes were sent as blob ``i``. That way attachment data never gets base64
+encoded, and large bodies are never escaped into JSON.
+"""
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any, BinaryIO, List, Optional, Tuple
+
+HEADER = struct.Struct("<BIQ")
+KIND_JSON = 1
+KIND_BLOB = 2
+
+# Strings at least this long (in characters) are moved out of the JSON into a blob.
+TEXT_BLOB_MIN = 4096
+
+
+class FramingError(ValueError):
+    pass
+
+
+def _extract(obj: Any, blobs: List[bytes]) -> Any:
+    if isinstance(obj, dict):
+        return {k: _extract(v, blobs) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_extract(v, blobs) for v in obj]
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        blobs.append(bytes(obj))
+        return {"$blob": len(blobs) - 1}
+    if isinstance(obj, str) and len(obj) >= TEXT_BLOB_MIN:
+        blobs.append(obj.encode("utf-8", "surrogatepass"))
+        return {"$text": len(blobs) - 1}
+    return obj
+
+
+def _restore(obj: Any, blobs: List[bytes]) -> Any:
+    if isinstance(obj, dict):
+        if len(obj) == 1:
+            if "$blob" in obj:
+                return blobs[obj["$blob"]]
+            if "$text" in obj:
+                return blobs[obj["$text"]].decode("utf-8", "surrogatepass")
+        return {k: _restore(v, blobs) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_restore(v, blobs) for v in obj]
+    return obj
+
+
+def write_frame(out: BinaryIO, kind: int, ref: int, payload: bytes) -> None:
+    out.write(HEADER.pack(kind, ref, len(payload)))
+    out.write(payload)
+
+
+def write_message(out: BinaryIO, message: Any) -> int:
+    """Write ``message`` and its blobs; returns the number of bytes written. Does not flush."""
+    blobs: List[bytes] = []
+    body = json.dumps(_extract(message, blobs), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    write_frame(out, KIND_JSON, len(blobs), body)
+    for index, blob in enumerate(blobs):
+        write_frame(out, KIND_BLOB, index, blob)
+    return HEADER.size * (1 + len(blobs)) + len(body) + sum(len(b) for b in blobs)
+
+
+def _read_exact(inp: BinaryIO, size: int) -> Optional[bytes]:
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = inp.read(remaining)
+        if not chunk:
+            if remaining == size:
+                return None
+            raise FramingError("Truncated frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_frame(inp: BinaryIO) -> Optional[Tuple[int, int, bytes]]:
+    """Read one frame as ``(kind, ref, payload)``, or None at a clean end of stream."""
+    header = _read_exact(inp, HEADER.size)
+    if header is None:
+        return None
+    kind, ref, length = HEADER.unpack(header)
+    payload = _read_exact(inp, length) if length else b""
+    if payload is None:
+        raise FramingError("Truncated frame")
+    return kind, ref, payload
+
+
+def read_message(inp: BinaryIO) -> Optional[Any]:
+    """Read one envelope plus its blobs and return it with blob references resolved."""
+    frame = read_frame(inp)
+    if frame is None:
+        return None
+    kind, count, payload = frame
+    if kind != KIND_JSON:
+        raise FramingError(f"Expected a JSON frame, got kind {kind}")
+    blobs: List[bytes] = []
+    for index in range(count):
+        blob = read_frame(inp)
+        if blob is None or blob[0] != KIND_BLOB or blob[1] != index:
+            raise FramingError("Missing blob frame")
+        blobs.append(blob[2])
+    return _restore(json.loads(payload.decode("utf-8")), blobs)
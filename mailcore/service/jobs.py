@@ -0,0 +1,98 @@
+"""Per-request job context for background RPC handlers: progress reporting and cancellation."""
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# JSON-RPC error code for a request stopped by ``cancel`` (same value LSP uses).
+REQUEST_CANCELLED = -32800
+
+_current: contextvars.ContextVar[Optional["Job"]] = contextvars.ContextVar("mailcore_rpc_job", default=None)
+
+
+class JobCancelled(Exception):
+    """Raised at the next message boundary after a job has been cancelled."""
+
+
+class Job:
+    """One in-flight request.
+
+    Handlers never see the job directly: they call :func:`track` / :func:`progress_callback`,
+    which find it through a context variable and are no-ops outside a job. ``notify`` is
+    called with the ``progress`` notification params; it must be thread-safe.
+    """
+
+    def __init__(
+        self,
+        request_id: Any,
+        method: str,
+        notify: Optional[Callable[[Dict[str, Any]], None]] = None,
+        interval: float = 0.25,
+    ):
+        self.id = request_id
+        self.method = method
+        self._notify = notify
+        self._interval = interval
+        self._last = 0.0
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def check(self) -> None:
+        if self._cancelled.is_set():
+            raise JobCancelled(f"Request {self.id} ({self.method}) was cancelled")
+
+    def progress(self, stage: str, done: int, total: Optional[int] = None) -> None:
+        """Check for cancellation, then emit a rate-limited ``progress`` notification."""
+        self.check()
+        if self._notify is None:
+            return
+        now = time.monotonic()
+        if now - self._last < self._interval and done != total:
+            return
+        self._last = now
+        self._notify({"id": self.id, "stage": stage, "done": done, "total": total})
+
+    def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Call ``fn`` with this job as the current one (used as the executor entry point)."""
+        token = _current.set(self)
+        try:
+            self.check()
+            return fn(*args)
+        finally:
+            _current.reset(token)
+
+
+def current_job() -> Optional[Job]:
+    return _current.get()
+
+
+def track(items: Iterable[T], stage: str, total: Optional[int] = None) -> Iterator[T]:
+    """Yield ``items``, reporting progress and honouring cancellation between them."""
+    job = _current.get()
+    if job is None:
+        yield from items
+        return
+    if total is None and hasattr(items, "__len__"):
+        total = len(items)  # type: ignore[arg-type]
+    job.progress(stage, 0, total)
+    for done, item in enumerate(items, 1):
+        yield item
+        job.progress(stage, done, total)
+
+
+def progress_callback(stage: str) -> Optional[Callable[[int, Optional[int]], None]]:
+    """A ``progress(done, total)`` callback for the loading API, bound to the current job."""
+    job = _current.get()
+    if job is None:
+        return None
+    return lambda done, total: job.progress(stage, done, total)
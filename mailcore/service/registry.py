@@ -0,0 +1,96 @@
+"""LRU registry of server-side objects (mailboxes, messages) addressed by handle."""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class MessageRef(NamedTuple):
+    """A message that is known (e.g. from a search hit) but not loaded yet.
+
+    ``locator`` addresses it inside a container (``pst:<nid>``, or ``sha256:<hex>`` for a
+    store only readpst can read); None for a standalone file.
+    """
+
+    path: Path
+    locator: Optional[str] = None
+
+
+# Registry size estimate for a MessageRef entry.
+REF_SIZE = 256
+
+
+def source_handle(kind: str, path: Path, locator: Optional[str] = None) -> str:
+    """Stable handle for ``path`` (and ``locator`` inside it): the same unchanged file
+    always maps to the same handle."""
+    path = Path(path).resolve()
+    try:
+        st = os.stat(path)
+        ident = f"{kind}:{path}:{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        ident = f"{kind}:{path}"
+    if locator:
+        ident += f"#{locator}"
+    return hashlib.sha1(ident.encode("utf-8", "surrogatepass")).hexdigest()[:20]
+
+
+class HandleRegistry:
+    """Keep loaded objects alive between RPC calls, bounded by an estimated memory budget.
+
+    Entries are evicted least-recently-used first once the summed size estimate exceeds
+    ``max_bytes``; the most recent entry is always kept even if it alone is over budget.
+    Safe to share between the server's worker threads.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+
+    def put(self, handle: str, obj: Any, size: int) -> str:
+        with self._lock:
+            self.release(handle)
+            self._entries[handle] = (obj, max(0, int(size)))
+            self.total_bytes += max(0, int(size))
+            self._evict()
+        return handle
+
+    def get(self, handle: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            self._entries.move_to_end(handle)
+            return entry[0]
+
+    def release(self, handle: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(handle, None)
+            if entry is None:
+                return False
+            self.total_bytes -= entry[1]
+            return True
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.total_bytes, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+    def __contains__(self, handle: str) -> bool:
+        return handle in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
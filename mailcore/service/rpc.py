@@ -1,85 +1,578 @@
 """Lightweight JSON-RPC server exposing mailcore functions."""
 from __future__ import annotations
 
+import asyncio
 import json
+import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Callable, Dict, Iterable, List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from .. import load_mailbox, load_single_message
-from ..exporters import export_hashes, export_json, export_text
-from ..serialization import dict_to_message, mailbox_to_dict, message_to_dict
+from mailcombine.cache import ExtractionCache
+from mailcombine.metrics import Metrics, activate, active, capture
+
+from .. import load_mailbox, load_message_summary, load_single_message
+from ..api import message_files
+from ..blobstore import AttachmentStore
+from ..adapters import load_pst_message
+from ..index import SearchIndex
+from ..models import Folder, Message
+from ..exporters import ExportPipeline, HashCsvSink, JsonSink, SqliteSink, TextSink, export_hashes, export_json, export_sqlite, export_text
+from ..serialization import attachment_content_to_dict, dict_to_message, mailbox_to_dict, message_size, message_to_dict, summary_to_dict
+from .browse import MailboxView
+from .framing import FramingError, read_message, write_message
+from .jobs import REQUEST_CANCELLED, Job, JobCancelled, progress_callback, track
+from .registry import DEFAULT_MAX_BYTES, REF_SIZE, HandleRegistry, MessageRef, source_handle
+
+# Upper bound (MB) for loaded mailboxes/messages kept between calls.
+_CACHE_ENV = "MAILCORE_RPC_CACHE_MB"
+# Optional SQLite extraction cache shared with ``mailcombine.cli --cache``.
+_EXTRACTION_CACHE_ENV = "MAILCORE_EXTRACTION_CACHE"
+
+
+def _default_cache_bytes() -> int:
+    try:
+        return int(os.environ[_CACHE_ENV]) * 1024 * 1024
+    except (KeyError, ValueError):
+        return DEFAULT_MAX_BYTES
+
+
+# Methods that can take a long time run on the worker pool as cancellable jobs; the rest
+# are answered inline so ping/cancel/list_* stay responsive while jobs are running.
+_BACKGROUND_METHODS = {
+    "load_mailbox",
+    "load_message",
+    "load_attachment",
+    "open_mailbox",
+    "get_message",
+    "get_attachment",
+    "export_text",
+    "export_json",
+    "export_hashes",
+    "export_sqlite",
+    "export_bundle",
+    "search",
+    "list_summaries",
+}
+
+
+def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+class _HandleMessages:
+    """The messages behind already looked-up handles, loaded one at a time while iterated.
+
+    Referenced messages are not put back into the registry, so a large export does not
+    push every other handle out of it.
+    """
+
+    def __init__(self, server: "MailcoreJsonRpcServer", objects: List[Any]):
+        self._server = server
+        self._objects = objects
+
+    def __len__(self) -> int:
+        return sum(len(obj) if isinstance(obj, MailboxView) else 1 for obj in self._objects)
+
+    def __iter__(self) -> Iterator[Message]:
+        for obj in self._objects:
+            yield from self._server._messages_of(obj)
 
 
 class MailcoreJsonRpcServer:
-    def __init__(self, instream=None, outstream=None):
+    def __init__(self, instream=None, outstream=None, cache_bytes: Optional[int] = None, workers: Optional[int] = None):
         self.instream = instream or sys.stdin
         self.outstream = outstream or sys.stdout
         self._running = True
+        self.registry = HandleRegistry(cache_bytes if cache_bytes is not None else _default_cache_bytes())
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._jobs: Dict[Any, Job] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # "lines" (newline JSON) until a ``hello`` switches both directions to "binary".
+        self.framing = "lines"
+        self._binary_in = getattr(self.instream, "buffer", None)
+        self._binary_out = getattr(self.outstream, "buffer", None)
+        self._write_lock = threading.Lock()
+        cache_db = os.environ.get(_EXTRACTION_CACHE_ENV)
+        self.extraction_cache: Optional[ExtractionCache] = ExtractionCache(Path(cache_db)) if cache_db else None
+        # Search indexes opened read-only by ``search``, one connection per index file.
+        self._indexes: Dict[str, SearchIndex] = {}
+        self._indexes_lock = threading.Lock()
+        self._stores: Dict[str, AttachmentStore] = {}
+        self._stores_lock = threading.Lock()
+        # Stage timings of everything this server does, plus per-method latency; see ``stats``.
+        self.metrics = Metrics()
         self.handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {
             "ping": self.handle_ping,
+            "hello": self.handle_hello,
             "shutdown": self.handle_shutdown,
             "load_mailbox": self.handle_load_mailbox,
             "load_message": self.handle_load_message,
+            "load_attachment": self.handle_load_attachment,
             "export_text": self.handle_export_text,
             "export_json": self.handle_export_json,
             "export_hashes": self.handle_export_hashes,
+            "export_sqlite": self.handle_export_sqlite,
             "export_bundle": self.handle_export_bundle,
+            "open_mailbox": self.handle_open_mailbox,
+            "list_folders": self.handle_list_folders,
+            "list_messages": self.handle_list_messages,
+            "get_message": self.handle_get_message,
+            "get_attachment": self.handle_get_attachment,
+            "close_mailbox": self.handle_close_mailbox,
+            "release": self.handle_release,
+            "cancel": self.handle_cancel,
+            "search": self.handle_search,
+            "list_summaries": self.handle_list_summaries,
+            "stats": self.handle_stats,
         }
 
     def serve_forever(self) -> None:
-        while self._running:
-            line = self.instream.readline()
-            if not line:
-                break
-            line = line.strip()
-            if not line:
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        """Read requests until EOF or ``shutdown``; background jobs may complete out of order.
+
+        Requests are read on a daemon thread so a client that never closes stdin can't keep
+        the process alive after ``shutdown``.
+        """
+        self._loop = asyncio.get_running_loop()
+        activate(self.metrics)
+        requests: "asyncio.Queue[Any]" = asyncio.Queue()
+        threading.Thread(target=self._read_requests, args=(requests,), name="mailcore-rpc-reader", daemon=True).start()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mailcore-rpc")
+        tasks: set = set()
+        try:
+            while self._running:
+                request = await requests.get()
+                if request is None:
+                    break
+                if isinstance(request, dict) and request.get("method") in _BACKGROUND_METHODS:
+                    task = asyncio.ensure_future(self._run_job(request, pool))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    self._send(self._respond(request))
+            if not self._running:
+                for job in self._jobs.values():
+                    job.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            pool.shutdown(wait=True)
+            self._loop = None
+            if active() is self.metrics:
+                activate(None)
+            if self.extraction_cache is not None:
+                self.extraction_cache.close()
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
+
+    def _read_requests(self, requests: "asyncio.Queue[Any]") -> None:
+        """Reader thread: parse requests and hand them to the loop; None marks end of input.
+
+        ``hello`` is answered here rather than on the loop. If it switches to binary framing,
+        the very next read has to use frames, so the reply must go out before reading again.
+        """
+        loop = self._loop
+        assert loop is not None
+        while True:
+            if self.framing == "binary":
+                try:
+                    request: Any = read_message(self._binary_in)
+                except FramingError as exc:
+                    # A bad frame leaves the stream unsynchronised: report it and stop reading.
+                    loop.call_soon_threadsafe(requests.put_nowait, exc)
+                    request = None
+                except ValueError as exc:
+                    request = exc
+            else:
+                line = self._readline()
+                if not line:
+                    request = None
+                elif not line.strip():
+                    continue
+                else:
+                    request = self._parse(line.strip())
+            if isinstance(request, dict) and request.get("method") == "hello":
+                self._answer_hello(request)
                 continue
-            response = self._process_line(line)
-            self.outstream.write(json.dumps(response) + "\n")
+            loop.call_soon_threadsafe(requests.put_nowait, request)
+            if request is None:
+                return
+
+    def _readline(self) -> str:
+        # Read from the byte stream when there is one, so a text wrapper's read-ahead can't
+        # swallow the first frame after a switch to binary framing.
+        if self._binary_in is not None:
+            return self._binary_in.readline().decode("utf-8", errors="replace")
+        return self.instream.readline()
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        with self._write_lock:
+            self._write(message)
+
+    def _write(self, message: Dict[str, Any]) -> None:
+        # Callers hold ``_write_lock``.
+        if self.framing == "binary":
+            write_message(self._binary_out, message)
+            self._binary_out.flush()
+        else:
+            self.outstream.write(json.dumps(message) + "\n")
             self.outstream.flush()
 
-    def _process_line(self, line: str) -> Dict[str, Any]:
-        request: Dict[str, Any] = {}
+    def _answer_hello(self, request: Dict[str, Any]) -> None:
+        """Reply to ``hello`` in the current framing, then switch to the one it negotiated.
+
+        The write lock is held across both steps, so no job result or progress notification
+        can be written in between, in either framing.
+        """
+        with self._write_lock:
+            response = self._respond(request)
+            self._write(response)
+            framing = (response.get("result") or {}).get("framing")
+            if framing:
+                self.framing = framing
+
+    def _notify_progress(self, params: Dict[str, Any]) -> None:
+        """Thread-safe: called from worker threads while a job runs."""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._send, {"jsonrpc": "2.0", "method": "progress", "params": params})
+
+    async def _run_job(self, request: Dict[str, Any], pool: ThreadPoolExecutor) -> None:
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+        if request_id is not None and request_id in self._jobs:
+            self._send(_error(request_id, -32600, f"Request id already in flight: {request_id}"))
+            return
+        job = Job(request_id, method, notify=self._notify_progress if params.get("progress") else None)
+        if request_id is not None:
+            self._jobs[request_id] = job
+        started = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, job.run, self.handlers[method], params)
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except JobCancelled as exc:
+            response = _error(request_id, REQUEST_CANCELLED, str(exc))
+        except Exception as exc:
+            response = _error(request_id, -32603, str(exc))
+        finally:
+            self._jobs.pop(request_id, None)
+        self._record_call(method, started, "error" in response)
+        self._send(response)
+
+    def _parse(self, line: str) -> Any:
+        try:
+            return json.loads(line)
+        except ValueError as exc:
+            return exc
+
+    def _respond(self, request: Any) -> Dict[str, Any]:
+        if isinstance(request, Exception):
+            return _error(None, -32603, str(request))
         try:
-            request = json.loads(line)
             method = request.get("method")
             params = request.get("params") or {}
             request_id = request.get("id")
             if method not in self.handlers:
                 raise ValueError(f"Unknown method: {method}")
-            result = self.handlers[method](params)
+            started = time.perf_counter()
+            try:
+                result = self.handlers[method](params)
+            except Exception:
+                self._record_call(method, started, True)
+                raise
+            self._record_call(method, started, False)
             return {"jsonrpc": "2.0", "id": request_id, "result": result}
         except Exception as exc:
-            return {
-                "jsonrpc": "2.0",
-                "id": request.get("id") if isinstance(request, dict) else None,
-                "error": {"code": -32603, "message": str(exc)},
-            }
+            return _error(request.get("id") if isinstance(request, dict) else None, -32603, str(exc))
+
+    def _record_call(self, method: str, started: float, failed: bool) -> None:
+        self.metrics.span(method, time.perf_counter() - started)
+        self.metrics.count("requests")
+        if failed:
+            self.metrics.count("errors")
+
+    def _process_line(self, line: str) -> Dict[str, Any]:
+        """Handle one request synchronously (no job context: progress and cancel are no-ops)."""
+        return self._respond(self._parse(line))
 
     def handle_ping(self, params: Dict[str, Any]) -> str:
         return "pong"
 
+    def handle_hello(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Negotiate the transport. The reply goes out in the old framing; the reader thread
+        switches to the returned one only after it has been written."""
+        wanted = params.get("framing", "lines")
+        framing = self.framing
+        if wanted == "binary" and self._binary_in is not None and self._binary_out is not None:
+            framing = "binary"
+        elif wanted == "lines":
+            framing = "lines"
+        return {"protocol": 1, "framing": framing, "methods": sorted(self.handlers)}
+
     def handle_shutdown(self, params: Dict[str, Any]) -> Dict[str, str]:
         self._running = False
         return {"status": "closing"}
 
+    def handle_cancel(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask an in-flight job to stop; it ends with a REQUEST_CANCELLED error at the next message."""
+        job = self._jobs.get(params.get("id"))
+        if job is None:
+            return {"cancelled": False}
+        job.cancel()
+        return {"cancelled": True}
+
     def handle_load_mailbox(self, params: Dict[str, Any]) -> Dict[str, Any]:
         path = Path(params["path"])
-        mailbox = load_mailbox(path)
-        return mailbox_to_dict(mailbox)
+        include_data = bool(params.get("include_attachment_data", True))
+        handle, view = self._open_view(path, keep_attachment_data=include_data)
+        result = mailbox_to_dict(view.mailbox, include_attachment_data=include_data, raw=self.framing == "binary", store=self._attachment_store(params))
+        for folder_dict, folder in zip(result["Folders"], view.mailbox.folders):
+            self._annotate_handles(handle, view, folder_dict, folder)
+        result["Handle"] = handle
+        return result
 
     def handle_load_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
         path = Path(params["path"])
-        message = load_single_message(path)
-        return message_to_dict(message)
+        include_data = bool(params.get("include_attachment_data", True))
+        with capture() as timings:
+            message = load_single_message(path, keep_attachment_data=include_data, cache=self.extraction_cache)
+        self.metrics.file(path, path.stat().st_size, timings)
+        handle = self.registry.put(source_handle("message", path), message, message_size(message))
+        result = message_to_dict(message, include_attachment_data=include_data, raw=self.framing == "binary", store=self._attachment_store(params))
+        result["Handle"] = handle
+        return result
+
+    def handle_load_attachment(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        path = Path(params["path"])
+        attachment_id = params["attachment_id"]
+        message = load_single_message(path, cache=self.extraction_cache)
+        for att in message.attachments:
+            if att.id == attachment_id:
+                return attachment_content_to_dict(att, raw=self.framing == "binary", store=self._attachment_store(params))
+        raise ValueError(f"Attachment not found: {attachment_id}")
+
+    # ---- server-side handles ----
+    def _open_view(self, path: Path, *, keep_attachment_data: bool = False) -> Tuple[str, MailboxView]:
+        handle = source_handle("mailbox", path)
+        view = self.registry.get(handle)
+        if not isinstance(view, MailboxView):
+            mailbox = load_mailbox(
+                path,
+                keep_attachment_data=keep_attachment_data,
+                progress=progress_callback("load"),
+                cache=self.extraction_cache,
+            )
+            view = MailboxView(mailbox)
+            self.registry.put(handle, view, view.estimated_size())
+        return handle, view
+
+    def _annotate_handles(self, handle: str, view: MailboxView, folder_dict: Dict[str, Any], folder: Folder) -> None:
+        for msg_dict, key in zip(folder_dict["Messages"], view.folder_keys(folder)):
+            msg_dict["Handle"] = f"{handle}:{key}"
+        for sub_dict, sub in zip(folder_dict["Subfolders"], folder.subfolders):
+            self._annotate_handles(handle, view, sub_dict, sub)
+
+    def _view(self, params: Dict[str, Any]) -> MailboxView:
+        handle = params.get("mailbox")
+        view = self.registry.get(handle)
+        if not isinstance(view, MailboxView):
+            raise ValueError(f"Unknown or expired mailbox handle: {handle}")
+        return view
+
+    def _lookup(self, handle: str) -> Any:
+        """The object behind ``handle``, or a ``(view, key)`` pair for ``<mailbox>:<key>``;
+        None if the handle is unknown or has been evicted."""
+        obj = self.registry.get(handle)
+        if obj is not None:
+            return obj
+        mailbox, sep, key = handle.partition(":")
+        view = self.registry.get(mailbox) if sep else None
+        return (view, key) if isinstance(view, MailboxView) else None
 
-    def _messages_from_params(self, params: Dict[str, Any]) -> List:
+    def _messages_of(self, obj: Any) -> List[Message]:
+        if isinstance(obj, MailboxView):
+            return obj.messages(obj.keys())
+        if isinstance(obj, Message):
+            return [obj]
+        if isinstance(obj, MessageRef):
+            return [self._load_ref(obj)]
+        view, key = obj
+        return [view.message(key)]
+
+    def _resolve_handle(self, handle: str) -> List[Message]:
+        """A handle names a whole mailbox, a loaded or referenced message, or ``<mailbox>:<key>``."""
+        obj = self._lookup(handle)
+        if obj is None:
+            raise ValueError(f"Unknown or expired handle: {handle}")
+        messages = self._messages_of(obj)
+        if isinstance(obj, MessageRef):
+            self.registry.put(handle, messages[0], message_size(messages[0]))
+        return messages
+
+    def handle_open_mailbox(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Load a mailbox server-side and return its handle plus the folder tree (counts only)."""
+        handle, view = self._open_view(Path(params["path"]))
+        result = view.folder_tree()
+        result["Handle"] = handle
+        return result
+
+    def handle_list_folders(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self._view(params).folder_tree()
+
+    def handle_list_messages(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        view = self._view(params)
+        page = view.page(params["folder_id"], params.get("offset", 0), params.get("limit", 100))
+        for row in page["Messages"]:
+            row["Handle"] = f"{params['mailbox']}:{row['Key']}"
+        return page
+
+    def _load_ref(self, ref: MessageRef) -> Message:
+        if ref.locator is None:
+            return load_single_message(Path(ref.path), cache=self.extraction_cache)
+        if ref.locator.startswith(("pst:", "sha256:")):
+            return load_pst_message(Path(ref.path), ref.locator)
+        raise ValueError(f"Message {ref.locator} in {ref.path} can only be reached by opening the mailbox")
+
+    def _message_from_params(self, params: Dict[str, Any]) -> Message:
+        """``{"handle"}`` for any single-message handle, or ``{"mailbox", "key"}``."""
+        if params.get("handle"):
+            messages = self._resolve_handle(params["handle"])
+            if len(messages) != 1:
+                raise ValueError(f"Handle does not name a single message: {params['handle']}")
+            return messages[0]
+        return self._view(params).message(params["key"])
+
+    def handle_get_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        message = self._message_from_params(params)
+        include_data = bool(params.get("include_attachment_data", False))
+        result = message_to_dict(message, include_attachment_data=include_data, raw=self.framing == "binary", store=self._attachment_store(params))
+        if "key" in params:
+            result["Key"] = params["key"]
+        else:
+            result["Handle"] = params["handle"]
+        return result
+
+    def handle_get_attachment(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        message = self._message_from_params(params)
+        attachment_id = params["attachment_id"]
+        for att in message.attachments:
+            if att.id == attachment_id:
+                return attachment_content_to_dict(att, raw=self.framing == "binary", store=self._attachment_store(params))
+        raise ValueError(f"Attachment not found: {attachment_id}")
+
+    def handle_close_mailbox(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"released": self.registry.release(params.get("mailbox"))}
+
+    def handle_release(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        handles = params.get("handles") or []
+        released = sum(1 for h in handles if self.registry.release(h))
+        return {"released": released, "cache": self.registry.stats()}
+
+    def handle_stats(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Timings since start (or the last ``reset``), handle cache and extraction cache counters."""
+        result: Dict[str, Any] = self.metrics.summary()
+        result["cache"] = self.registry.stats()
+        cache = self.extraction_cache
+        result["extraction_cache"] = None if cache is None else {"hits": cache.hits, "misses": cache.misses, "stale": cache.stale, "stored": cache.stored}
+        result["jobs"] = len(self._jobs)
+        if params.get("reset"):
+            self.metrics = Metrics()
+            if self._loop is not None:
+                activate(self.metrics)
+        return result
+
+    def _attachment_store(self, params: Dict[str, Any]) -> Optional[AttachmentStore]:
+        """The store named by ``attachments_dir``, if any: attachment content is written
+        there and returned as a ``Blob`` path instead of inline data."""
+        root = params.get("attachments_dir")
+        if not root:
+            return None
+        key = os.path.abspath(root)
+        with self._stores_lock:
+            store = self._stores.get(key)
+            if store is None:
+                store = self._stores[key] = AttachmentStore(Path(key))
+            return store
+
+    def _search_index(self, path: Path) -> SearchIndex:
+        key = os.path.abspath(path)
+        with self._indexes_lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = SearchIndex(Path(key), readonly=True)
+            return index
+
+    def handle_search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Query an index built by ``mailcombine.cli --index``; every hit comes with a
+        message handle that loads lazily on first use (get_message, exports)."""
+        query = params["query"]
+        hits = self._search_index(Path(params["index"])).search(
+            query, limit=int(params.get("limit", 50)), offset=int(params.get("offset", 0))
+        )
+        results = []
+        for hit in hits:
+            handle = source_handle("message", Path(hit["path"]), hit["locator"])
+            if handle not in self.registry:
+                self.registry.put(handle, MessageRef(Path(hit["path"]), hit["locator"]), REF_SIZE)
+            results.append(
+                {
+                    "Handle": handle,
+                    "Score": hit["score"],
+                    "Snippet": hit["snippet"],
+                    "Subject": hit["subject"],
+                    "Sender": hit["sender"],
+                    "SentAt": hit["date"] or None,
+                    "Source": hit["source"],
+                }
+            )
+        return {"Query": query, "Results": results}
+
+    def handle_list_summaries(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Header-only listing of .msg/.eml files and directories; each row comes with a
+        message handle that loads the full message lazily, like a search hit."""
+        paths = params.get("paths") or [params["path"]]
+        rows: List[Dict[str, Any]] = []
+        errors: List[Dict[str, str]] = []
+        for path in track(message_files([Path(p) for p in paths]), "summarize"):
+            try:
+                summary = load_message_summary(path)
+            except Exception as exc:
+                errors.append({"Path": str(path), "Error": str(exc)})
+                continue
+            handle = source_handle("message", path)
+            if handle not in self.registry:
+                self.registry.put(handle, MessageRef(path), REF_SIZE)
+            row = summary_to_dict(summary)
+            row["Handle"] = handle
+            rows.append(row)
+        return {"Total": len(rows), "Messages": rows, "Errors": errors}
+
+    def _messages_from_params(self, params: Dict[str, Any]) -> Iterable[Message]:
+        handles = params.get("handles")
+        if handles:
+            # Every handle is looked up before anything is loaded: loading referenced messages
+            # grows the registry, which could otherwise evict handles further down the list.
+            found = [(handle, self._lookup(handle)) for handle in handles]
+            expired = [handle for handle, obj in found if obj is None]
+            if expired:
+                raise ValueError(
+                    f"Unknown or expired handle(s): {', '.join(expired[:3])}{', ...' if len(expired) > 3 else ''} "
+                    f"({len(expired)} of {len(handles)}); reopen or search again, or raise {_CACHE_ENV} to keep more loaded"
+                )
+            return _HandleMessages(self, [obj for _, obj in found])
         message_dicts = params.get("messages")
         if message_dicts:
             return [dict_to_message(data) for data in message_dicts]
         paths = params.get("paths", [])
-        return [load_single_message(Path(p)) for p in paths]
+        return [load_single_message(Path(p), cache=self.extraction_cache) for p in track(paths, "load")]
 
     def handle_export_text(self, params: Dict[str, Any]) -> Dict[str, Any]:
         messages = self._messages_from_params(params)
@@ -87,7 +580,7 @@ class MailcoreJsonRpcServer:
         source = params.get("source", "")
         show_attachments = bool(params.get("show_attachments", False))
         encoding = params.get("encoding", "utf-8")
-        export_text(messages, dest, source_label=source, show_attachments=show_attachments, encoding=encoding)
+        export_text(track(messages, "export_text"), dest, source_label=source, show_attachments=show_attachments, encoding=encoding)
         return {"written": str(dest)}
 
     def handle_export_json(self, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -95,38 +588,53 @@ class MailcoreJsonRpcServer:
         dest = Path(params["dest"])
         source = params.get("source", "")
         output_text = Path(params.get("output_text", "")) if params.get("output_text") else Path()
-        export_json(messages, dest, source_label=source, output_text_path=output_text)
+        export_json(
+            track(messages, "export_json"), dest, source_label=source, output_text_path=output_text,
+            lines=bool(params.get("lines", False)), store=self._attachment_store(params),
+        )
         return {"written": str(dest)}
 
     def handle_export_hashes(self, params: Dict[str, Any]) -> Dict[str, Any]:
         messages = self._messages_from_params(params)
         dest = Path(params["dest"])
-        export_hashes(messages, dest)
+        export_hashes(track(messages, "export_hashes"), dest)
         return {"written": str(dest)}
 
+    def handle_export_sqlite(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        messages = self._messages_from_params(params)
+        dest = Path(params["dest"])
+        count = export_sqlite(track(messages, "export_sqlite"), dest)
+        return {"written": str(dest), "messages": count}
+
     def handle_export_bundle(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Write the text export plus, optionally, the JSON sidecar, hashes CSV and SQLite
+        database in a single pass: each message is converted once and written to every file."""
         messages = self._messages_from_params(params)
         if not messages:
             raise ValueError("No messages provided for export")
         source = params.get("source", "")
-        show_attachments = bool(params.get("show_attachments", False))
-        encoding = params.get("encoding", "utf-8")
         text_path = Path(params["text_path"])
-        export_text(messages, text_path, source_label=source, show_attachments=show_attachments, encoding=encoding)
         result = {"text": str(text_path)}
-        if params.get("write_json"):
+        store = self._attachment_store(params)
+        with ExportPipeline(store=store) as pipeline:
+            pipeline.add(TextSink(text_path, source_label=source, show_attachments=bool(params.get("show_attachments", False)), encoding=params.get("encoding", "utf-8")))
             json_path = params.get("json_path")
-            if json_path:
-                export_json(messages, Path(json_path), source_label=source, output_text_path=text_path)
+            if params.get("write_json") and json_path:
+                pipeline.add(JsonSink(Path(json_path), source_label=source, output_text_path=text_path, lines=bool(params.get("json_lines", False))))
                 result["json"] = json_path
-        if params.get("write_hashes"):
             hashes_path = params.get("hashes_path")
-            if hashes_path:
-                export_hashes(messages, Path(hashes_path))
+            if params.get("write_hashes") and hashes_path:
+                pipeline.add(HashCsvSink(Path(hashes_path), blobs=store is not None))
                 result["hashes"] = hashes_path
+            sqlite_path = params.get("sqlite_path")
+            if params.get("write_sqlite") and sqlite_path:
+                pipeline.add(SqliteSink(Path(sqlite_path)))
+                result["sqlite"] = sqlite_path
+            pipeline.export(track(messages, "export"))
+        if store is not None:
+            result["attachments"] = str(store.root)
         return result
 
-
 def main() -> None:
     server = MailcoreJsonRpcServer()
     server.serve_forever()
@@ -0,0 +1,254 @@
+"""Build small synthetic Unicode PSTs for the pstfile/adapter tests.
+
+The layout follows [MS-PST]: a header, NBT/BBT B-trees of two leaf pages under one
+intermediate page, heap-on-node property and table contexts, subnode trees and XBLOCK
+data trees for values over one block.
+"""
+import struct
+
+from mailcore.adapters.pstfile import _PERMUTE_ENCODE
+
+PAGE = 512
+
+class Builder:
+    def __init__(self, crypt=1):
+        self.crypt = crypt
+        self.blocks = {}   # bid -> bytes (already encoded)
+        self.nodes = {}    # nid -> (bidData, bidSub, parent)
+        self.next_bid = 4
+
+    def bid(self, internal=False):
+        b = self.next_bid
+        self.next_bid += 4
+        return b | (2 if internal else 0)
+
+    def data_block(self, data):
+        b = self.bid()
+        if self.crypt == 1:
+            data = data.translate(_PERMUTE_ENCODE)
+        self.blocks[b] = data
+        return b
+
+    def data_tree(self, data, chunk=8176):
+        if len(data) <= chunk:
+            return self.data_block(data)
+        bids = [self.data_block(data[i:i+chunk]) for i in range(0, len(data), chunk)]
+        b = self.bid(internal=True)
+        self.blocks[b] = struct.pack("<BBHI", 1, 1, len(bids), len(data)) + b"".join(struct.pack("<Q", x) for x in bids)
+        return b
+
+    def sub_tree(self, entries):  # entries: {nid: (bidData, bidSub)}
+        if not entries: return 0
+        b = self.bid(internal=True)
+        body = b"".join(struct.pack("<QQQ", nid, d, s) for nid, (d, s) in sorted(entries.items()))
+        self.blocks[b] = struct.pack("<BBHI", 2, 0, len(entries), 0) + body
+        return b
+
+
+class Heap:
+    def __init__(self, sig):
+        self.sig = sig
+        self.allocs = []
+    def alloc(self, data):
+        self.allocs.append(bytes(data))
+        return len(self.allocs) << 5
+    def build(self, user_root):
+        out = bytearray(12)
+        offs = [12]
+        for a in self.allocs:
+            out += a
+            offs.append(len(out))
+        if len(out) % 2: out += b"\0"
+        ib = len(out)
+        out += struct.pack("<HH", len(self.allocs), 0) + b"".join(struct.pack("<H", o) for o in offs)
+        struct.pack_into("<HBBII", out, 0, ib, 0xEC, self.sig, user_root, 0)
+        return bytes(out)
+
+
+def bth(heap, cb_key, cb_ent, records):
+    recs = b"".join(k + v for k, v in sorted(records))
+    root = heap.alloc(recs) if records else 0
+    return heap.alloc(struct.pack("<BBBBI", 0xB5, cb_key, cb_ent, 0, root))
+
+
+class Subs:
+    def __init__(self, b):
+        self.b = b; self.entries = {}; self.n = 1
+    def add(self, data, nid=None, sub=0):
+        if nid is None:
+            nid = (self.n << 5) | 0x1F; self.n += 1
+        self.entries[nid] = (self.b.data_tree(data), sub)
+        return nid
+
+
+def value(heap, subs, ptype, v):
+    if ptype == 0x0003: return v
+    if ptype == 0x000B: return int(bool(v))
+    if ptype == 0x001F: raw = v.encode("utf-16-le")
+    elif ptype == 0x0040: raw = struct.pack("<Q", v)
+    else: raw = v
+    if len(raw) > 3580:
+        return subs.add(raw)
+    return heap.alloc(raw) if raw else 0
+
+
+def pc(b, props, subs=None):
+    """props: {id: (ptype, value)} -> node data bid"""
+    heap = Heap(0xBC)
+    subs = subs or Subs(b)
+    recs = []
+    for pid, (pt, v) in props.items():
+        recs.append((struct.pack("<H", pid), struct.pack("<HI", pt, value(heap, subs, pt, v))))
+    root = bth(heap, 2, 6, recs)
+    return b.data_tree(heap.build(root)), subs
+
+
+def tc(b, columns, rows, subs=None):
+    """columns: [(pid, ptype)] (excluding row id); rows: [dict pid->value incl 0x67F2]"""
+    heap = Heap(0x7C)
+    subs = subs or Subs(b)
+    cols = [(0x67F2, 0x0003), (0x67F3, 0x0003)] + list(columns)
+    size = {0x0003: 4, 0x001F: 4, 0x0102: 4, 0x0040: 8, 0x000B: 1}
+    layout = []; ib = 0
+    for width in (8, 4, 2, 1):
+        for i, (pid, pt) in enumerate(cols):
+            if size[pt] == width:
+                layout.append((i, pid, pt, ib, width)); ib += width
+    ends = ib
+    ceb = (len(cols) + 7) // 8
+    row_size = ib + ceb
+    rgib = (sum(w for *_, w in layout if w >= 4), sum(w for *_, w in layout if w >= 2), ends, row_size)
+    matrix = bytearray()
+    index_recs = []
+    for r_i, row in enumerate(rows):
+        buf = bytearray(row_size)
+        for i, pid, pt, off, w in layout:
+            if pid not in row: continue
+            v = row[pid]
+            if pt in (0x001F, 0x0102): struct.pack_into("<I", buf, off, value(heap, subs, pt, v))
+            elif pt == 0x0040: struct.pack_into("<Q", buf, off, v)
+            elif pt == 0x000B: buf[off] = int(bool(v))
+            else: struct.pack_into("<I", buf, off, v)
+            buf[ends + i // 8] |= 1 << (7 - i % 8)
+        matrix += buf
+        index_recs.append((struct.pack("<I", row[0x67F2]), struct.pack("<I", r_i)))
+    hid_rows = heap.alloc(matrix) if rows else 0
+    idx = bth(heap, 4, 4, index_recs)
+    info = struct.pack("<BB4HIII", 0x7C, len(cols), *rgib, idx, hid_rows, 0)
+    for i, pid, pt, off, w in sorted(layout):
+        info += struct.pack("<IHBB", (pid << 16) | pt, off, w, i)
+    root = heap.alloc(info)
+    return b.data_tree(heap.build(root)), subs
+
+
+def ft(y):  # year -> FILETIME
+    from datetime import datetime, timezone
+    d = datetime(y, 3, 4, 5, 6, 7, tzinfo=timezone.utc) - datetime(1601, 1, 1, tzinfo=timezone.utc)
+    return (d.days * 86400 + d.seconds) * 10**7
+
+
+def build(path, crypt=1, n_messages=3, big=20000, broken=(), lost_folder=False):
+    """Write a store with an "Inbox" of ``n_messages`` messages to ``path``.
+
+    Message 0 has an HTML body and an attachment spanning several blocks, message 1 a
+    prefixed subject and no attachment, message 2 a body in an XBLOCK. The nodes of the
+    messages whose indexes are in ``broken`` are left out of the NBT. ``lost_folder``
+    lists a second root folder whose node does not exist.
+    """
+    b = Builder(crypt)
+    # root folder 0x122 with one child folder "Inbox" 0x8022
+    inbox = (0x400 << 5) | 2
+    d, _ = pc(b, {0x3001: (0x001F, "")}); b.nodes[0x122] = (d, 0, 0)
+    rows = [{0x67F2: inbox, 0x3001: "Inbox"}]
+    if lost_folder:
+        rows.append({0x67F2: (0x401 << 5) | 2, 0x3001: "Lost"})
+    d, _ = tc(b, [(0x3001, 0x001F)], rows); b.nodes[0x12D] = (d, 0, 0)
+    d, _ = tc(b, [], []); b.nodes[0x12E] = (d, 0, 0)
+    d, _ = pc(b, {0x3001: (0x001F, "Inbox"), 0x3602: (0x0003, n_messages)}); b.nodes[inbox] = (d, 0, 0x122)
+    d, _ = tc(b, [], []); b.nodes[(inbox & ~0x1F) | 0x0D] = (d, 0, 0)
+    msg_nids = []
+    for i in range(n_messages):
+        mnid = ((0x1000 + i) << 5) | 4
+        msg_nids.append(mnid)
+        subs = Subs(b)
+        body = f"Body of message {i}\r\nSecond line"
+        if i == 2:
+            body = "x" * 9000  # forces a subnode value spread over an XBLOCK
+        props = {
+            0x0037: (0x001F, f"\x01\x05RE: Subject {i}" if i == 1 else f"Subject {i}"),
+            0x0C1A: (0x001F, "Alice Sender"),
+            0x5D01: (0x001F, "alice@example.com"),
+            0x0039: (0x0040, ft(2020 + i)),
+            0x1000: (0x001F, body),
+            0x1035: (0x001F, f"<msg{i}@example.com>"),
+            0x0E04: (0x001F, "Bob"),
+        }
+        if i == 0:
+            props[0x1013] = (0x0102, b"<html><body><p>Hi &amp; bye</p></body></html>")
+        dmsg, subs = pc(b, props, subs)
+        # recipients
+        rd, _ = tc(b, [(0x3001, 0x001F), (0x39FE, 0x001F), (0x0C15, 0x0003)], [
+            {0x67F2: 1, 0x3001: "Bob", 0x39FE: "bob@example.com", 0x0C15: 1},
+            {0x67F2: 2, 0x3001: "Carol", 0x39FE: "carol@example.com", 0x0C15: 2},
+        ], subs)
+        subs.entries[0x692] = (rd, 0)
+        # attachments
+        att_rows = []
+        if i != 1:
+            anid = (0x10 << 5) | 5
+            att_subs = Subs(b)
+            payload = bytes(range(256)) * (big // 256) if i == 0 else b"small attachment"
+            ad, att_subs = pc(b, {
+                0x3707: (0x001F, f"file{i}.bin"),
+                0x370E: (0x001F, "application/octet-stream"),
+                0x3705: (0x0003, 1),
+                0x3701: (0x0102, payload),
+            }, att_subs)
+            subs.entries[anid] = (ad, b.sub_tree(att_subs.entries))
+            att_rows.append({0x67F2: anid, 0x3707: f"file{i}.bin"})
+        td, _ = tc(b, [(0x3707, 0x001F)], att_rows, subs)
+        subs.entries[0x671] = (td, 0)
+        if i not in broken:
+            b.nodes[mnid] = (dmsg, b.sub_tree(subs.entries), inbox)
+    d, _ = tc(b, [(0x0037, 0x001F)], [{0x67F2: n} for n in msg_nids]); b.nodes[(inbox & ~0x1F) | 0x0E] = (d, 0, 0)
+
+    # ---- lay out file ----
+    out = bytearray(b"\0" * 0x4400)
+    bbt_entries = []
+    for bid, data in sorted(b.blocks.items()):
+        ib = len(out)
+        out += data
+        pad = (-(len(data) + 16)) % 64
+        out += b"\0" * (pad + 16)
+        bbt_entries.append(struct.pack("<QQHHI", bid, ib, len(data), 1, 0))
+    def page(entries, cb_ent, level, ptype):
+        p = bytearray(PAGE)
+        body = b"".join(entries)
+        p[:len(body)] = body
+        p[488], p[489], p[490], p[491] = len(entries), 488 // cb_ent, cb_ent, level
+        p[496] = p[497] = ptype
+        return bytes(p)
+    def write_tree(entries, cb_ent, ptype, key_of):
+        # at least two leaf pages under one intermediate root, to exercise descent
+        per_page = min(488 // cb_ent, max(1, (len(entries) + 1) // 2))
+        chunks = [entries[i:i + per_page] for i in range(0, len(entries), per_page)] or [entries]
+        refs = []
+        for ch in chunks:
+            while len(out) % PAGE: out.append(0)
+            ib = len(out)
+            out.extend(page(ch, cb_ent, 0, ptype))
+            refs.append(struct.pack("<QQQ", key_of(ch[0]), 0, ib))
+        while len(out) % PAGE: out.append(0)
+        root = len(out)
+        out.extend(page(refs, 24, 1, ptype))
+        return root
+    bbt_root = write_tree(bbt_entries, 24, 0x80, lambda e: struct.unpack_from("<Q", e)[0])
+    nbt_entries = [struct.pack("<QQQII", nid, d, s, p, 0) for nid, (d, s, p) in sorted(b.nodes.items())]
+    nbt_root = write_tree(nbt_entries, 32, 0x81, lambda e: struct.unpack_from("<Q", e)[0])
+    out[0:4] = b"!BDN"
+    struct.pack_into("<HHH", out, 8, 0x4D53, 23, 19)
+    struct.pack_into("<Q", out, 224, nbt_root)
+    struct.pack_into("<Q", out, 240, bbt_root)
+    out[513] = crypt
+    open(path, "wb").write(out)
+
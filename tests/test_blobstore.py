@@ -0,0 +1,48 @@
+import os
+import time
+
+import pytest
+
+import pst_builder
+from mailcore.adapters.pst import iter_pst_messages
+from mailcore.adapters.pstfile import PstFile
+from mailcore.blobstore import AttachmentStore
+from mailcore.models import Attachment
+
+
+def test_pst_attachment_is_streamed_block_by_block(tmp_path, monkeypatch):
+    pst = tmp_path / "store.pst"
+    pst_builder.build(pst)
+    att = next(iter_pst_messages(pst)).attachments[0]
+    monkeypatch.setattr(PstFile, "attachment_data", lambda *a: pytest.fail("attachment read whole"))
+
+    store = AttachmentStore(tmp_path / "blobs")
+    rel = store.put_attachment(att)
+    expected = bytes(range(256)) * (20000 // 256)
+    assert (store.root / rel).read_bytes() == expected
+    with PstFile(pst) as reader:
+        _, msg_nid, att_nid = att.locator.split(":")
+        assert len(list(reader.iter_attachment_data(int(msg_nid), int(att_nid)))) > 1
+    # Stored once; the second put finds the digest.
+    att.sha256 = rel.rsplit("/", 1)[-1]
+    assert store.put_attachment(att) == rel and store.written == 1 and store.reused == 1
+
+
+def test_empty_attachment_gets_no_blob(tmp_path):
+    store = AttachmentStore(tmp_path / "blobs")
+    assert store.put_attachment(Attachment(id="0", filename="empty.bin", size=0, data=b"")) is None
+    assert store.written == 0
+
+
+def test_stale_temporary_files_are_removed_on_open(tmp_path):
+    root = tmp_path / "blobs"
+    root.mkdir()
+    stale, live = root / ".incoming-stale", root / ".incoming-live"
+    stale.write_bytes(b"partial")
+    live.write_bytes(b"partial")
+    old = time.time() - 2 * 3600
+    os.utime(stale, (old, old))
+    AttachmentStore(root)
+    assert not stale.exists()
+    # A fresh one may belong to a writer that is still running.
+    assert live.exists()
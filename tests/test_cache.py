@@ -0,0 +1,35 @@
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.message import EmailMessage
+
+import pytest
+
+import mailcombine.cli
+from mailcombine.cache import ExtractionCache
+
+
+def last_used(db):
+    with sqlite3.connect(str(db)) as conn:
+        return dict(conn.execute("SELECT path, last_used FROM records"))
+
+
+def test_worker_cache_hits_reach_the_database(tmp_path, monkeypatch):
+    msg = EmailMessage()
+    msg["Subject"] = "cached"
+    msg.set_content("body")
+    path = tmp_path / "m.eml"
+    path.write_bytes(bytes(msg))
+    db = tmp_path / "cache.sqlite"
+    monkeypatch.setattr(mailcombine.cli, "_cache", ExtractionCache(db))
+    assert mailcombine.cli._load_record(str(path))[0]["subject"] == "cached"
+    mailcombine.cli._cache.close()
+    with sqlite3.connect(str(db)) as conn:
+        conn.execute("UPDATE records SET last_used = 0")
+    monkeypatch.setattr(mailcombine.cli, "_cache", ExtractionCache(db))
+
+    # A hit in a worker is only recorded in memory until the cache is closed.
+    with ProcessPoolExecutor(max_workers=1, **mailcombine.cli._pool_args()) as pool:
+        assert pool.submit(mailcombine.cli._load_record, str(path)).result()[0]["subject"] == "cached"
+    mailcombine.cli._cache.close()
+    assert list(last_used(db).values()) == [pytest.approx(time.time(), abs=60)]
@@ -0,0 +1,47 @@
+from email.message import EmailMessage
+
+import pytest
+
+import mailcore.api
+import mailcore.content
+from mailcore import load_single_message
+from mailcore.content import attachment_bytes
+from mailcore.legacy import message_to_record
+
+
+@pytest.fixture
+def eml(tmp_path):
+    msg = EmailMessage()
+    msg["From"] = "alice@example.com"
+    msg["To"] = "bob@example.com"
+    msg["Subject"] = "attachments"
+    msg["Message-ID"] = "<content-1@example.com>"
+    msg.set_content("body")
+    msg.add_attachment(b"", maintype="application", subtype="octet-stream", filename="empty.bin")
+    msg.add_attachment(b"one", maintype="application", subtype="octet-stream", filename="one.bin")
+    msg.add_attachment(b"two", maintype="application", subtype="octet-stream", filename="two.bin")
+    path = tmp_path / "m.eml"
+    path.write_bytes(bytes(msg))
+    return path
+
+
+def test_kept_content_includes_empty_attachments(eml):
+    message = load_single_message(eml, keep_attachment_data=True)
+    assert [att.data for att in message.attachments] == [b"", b"one", b"two"]
+
+
+def test_empty_attachment_is_not_reread(eml, monkeypatch):
+    message = load_single_message(eml)
+    monkeypatch.setattr(mailcore.content, "read_attachment_bytes", lambda *a: pytest.fail("source re-read"))
+    assert attachment_bytes(message.attachments[0]) == b""
+
+
+def test_message_to_record_reads_source_once(eml, monkeypatch):
+    message = load_single_message(eml)
+    loads = []
+    real = mailcore.api.load_single_message
+    monkeypatch.setattr(mailcore.api, "load_single_message", lambda *a, **kw: loads.append(a) or real(*a, **kw))
+    monkeypatch.setattr(mailcore.content, "read_attachment_bytes", lambda *a: pytest.fail("per-attachment re-read"))
+    record = message_to_record(message, include_content=True)
+    assert len(loads) == 1
+    assert [att["content_base64"] for att in record["attachments"]] == [None, "b25l", "dHdv"]
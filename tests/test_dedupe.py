@@ -0,0 +1,42 @@
+import csv
+import re
+from email.message import EmailMessage
+
+import pytest
+
+import mailcombine.cli
+
+
+@pytest.fixture
+def inbox(tmp_path):
+    # a, c and e share their bytes; so do b and d.
+    inp = tmp_path / "in"
+    inp.mkdir()
+    for name, n in zip("abcdef", [0, 1, 0, 1, 0, 2]):
+        msg = EmailMessage()
+        msg["Subject"] = f"message {n}"
+        msg.set_content("body")
+        (inp / f"{name}.eml").write_bytes(bytes(msg))
+    return inp
+
+
+def test_sha256_duplicates_are_reported_in_input_order(inbox, tmp_path, capsys):
+    out = tmp_path / "out.txt"
+    assert mailcombine.cli.main(["-i", str(inbox), "-o", str(out), "--dedupe", "sha256", "--jobs", "2"]) == 0
+    log = capsys.readouterr().out
+    assert re.findall(r"\(\.eml (\d)/6\)", log) == list("123456")
+    # Every "Duplicate of" line follows the line naming its own file.
+    pairs = re.findall(r"\(\.eml \d/6\) .*?(\w)\.eml\n\[INFO\]   Duplicate of .*?(\w)\.eml", log)
+    assert pairs == [("c", "a"), ("d", "b"), ("e", "a")]
+    with open(tmp_path / "out_duplicates.csv", newline="", encoding="utf-8") as fh:
+        rows = list(csv.reader(fh))[1:]
+    assert [(row[3][-5], row[2][-5]) for row in rows] == pairs
+    assert re.findall(r"^SUBJECT: (.*)$", out.read_text(encoding="utf-8"), re.M) == ["message 0", "message 1", "message 2"]
+
+
+def test_sha256_duplicates_are_not_parsed(inbox, tmp_path, monkeypatch):
+    parsed = []
+    real = mailcombine.cli._load_record
+    monkeypatch.setattr(mailcombine.cli, "_load_record", lambda path, *a: parsed.append(path[-5]) or real(path, *a))
+    assert mailcombine.cli.main(["-i", str(inbox), "-o", str(tmp_path / "out.txt"), "--dedupe", "sha256"]) == 0
+    assert parsed == ["a", "b", "f"]
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from mailcombine.htmltext import HtmlToText, html_to_text
+
+
+def feed_chunks(html: str, size: int) -> str:
+    converter = HtmlToText()
+    for i in range(0, len(html), size):
+        converter.feed(html[i:i + size])
+    return converter.close()
+
+
+@pytest.mark.parametrize("html, expected", [
+    ("<p>one<br>two</p><div>three</div>", "one\ntwo\n\nthree"),
+    ("a &amp; b &lt; c&nbsp;d", "a & b < c d"),
+    ("<table><tr><td>1</td><td>2</td></tr></table>", "1 2"),
+    ("<pre>  x\n  y</pre>z", "x\n  y\nz"),
+    ("a < b", "a < b"),
+    ("a<style>p{}</style>b</p>c", "ab\n\nc"),
+    ("<title>t</title>body", "body"),
+])
+def test_well_formed(html, expected):
+    assert html_to_text(html) == expected
+
+
+@pytest.mark.parametrize("html, expected", [
+    # An unterminated comment ends at the next '>'; the tags after it are still tags.
+    ("<!-- a > <b>bold</b> text and more", "bold text and more"),
+    ("x <!-- a > hello <i>there</i> world", "x hello there world"),
+    ("a<!-- never closed", "a"),
+    # A '<' without any '>' after it is text.
+    ('a <b class="x', 'a <b class="x'),
+    ("a</scr", "a</scr"),
+    # An unclosed script swallows the rest of the document.
+    ('a<script>var x = "<b>"; b', "a"),
+    ("a<script>x</script >b", "ab"),
+])
+def test_malformed(html, expected):
+    assert html_to_text(html) == expected
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+@pytest.mark.parametrize("html", [
+    "<!-- a > <b>bold</b> text and more",
+    "x <!-- a > hello <i>there</i> world",
+    "a<!-- x -->b<!-- y -- > z",
+    'a <b class="x y z" <i>c</i> d',
+    "a<script>if (a < b) {}</script>b<script>never closed",
+    "<p>caf&eacute; &amp; bar&#33;</p><pre>  a  </pre>",
+])
+def test_chunked_matches_whole(html, size):
+    assert feed_chunks(html, size) == html_to_text(html)
+
+
+def test_chunked_random():
+    atoms = ["<b>", "</b>", "<p>", "<br>", "<!--", "-->", "<script>", "</script>", "<pre>", "</pre>",
+             "<td>", "a", " ", "\n", "&amp;", "&lt", "&#", "65;", "<", ">", "</", "<!doctype html>"]
+    rnd = random.Random(0)
+    for _ in range(2000):
+        html = "".join(rnd.choice(atoms) for _ in range(rnd.randint(0, 20)))
+        assert feed_chunks(html, rnd.randint(1, 5)) == html_to_text(html), html
+
+
+def test_unterminated_tag_fed_in_small_chunks_is_not_rescanned():
+    # Quadratic rescanning would make this take minutes.
+    html = "<a " + "x" * 200_000 + " <b>text</b>"
+    assert feed_chunks(html, 16) == html_to_text(html)
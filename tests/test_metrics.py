@@ -0,0 +1,26 @@
+from mailcombine.metrics import RESERVOIR, Metrics
+
+
+def test_long_runs_keep_bounded_samples_and_exact_totals():
+    metrics = Metrics()
+    n = 3 * RESERVOIR
+    for i in range(n):
+        metrics.add("parse_eml", (i + 1) / 1000)
+    metrics.span("readpst", 2.0)
+
+    assert len(metrics._stages["parse_eml"].reservoir) == RESERVOIR
+    stage = metrics.summary()["stages"]["parse_eml"]
+    assert stage["count"] == n
+    assert stage["total_s"] == round(n * (n + 1) / 2000, 4)
+    assert stage["max_ms"] == n
+    # The reservoir is a uniform sample, so the median lands near the middle.
+    assert abs(stage["p50_ms"] - n / 2) < n / 10
+    assert metrics.summary()["spans"]["readpst"]["p99_ms"] == 2000.0
+
+
+def test_short_runs_keep_exact_percentiles():
+    metrics = Metrics()
+    for ms in range(1, 101):
+        metrics.add("hash", ms / 1000)
+    stage = metrics.summary()["stages"]["hash"]
+    assert (stage["p50_ms"], stage["p90_ms"], stage["p99_ms"], stage["max_ms"]) == (51.0, 91.0, 100.0, 100.0)
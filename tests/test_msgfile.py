@@ -0,0 +1,63 @@
+import struct
+
+import pytest
+
+import mailcore.adapters.msg as msg_adapter
+from benchmarks.corpus import generate
+from mailcore.adapters.msg import read_msg_attachment, read_msg_record
+from mailcore.adapters.msgfile import MsgFile, MsgFormatError
+
+# Offset of the FAT sector count in a compound file header.
+N_FAT = 0x2C
+
+
+@pytest.fixture(scope="module")
+def msgs(tmp_path_factory):
+    dest = tmp_path_factory.mktemp("corpus")
+    generate(dest, messages=12, seed=3, msg_share=1.0, readpst_share=0.0, max_attachment_kb=96)
+    return sorted(dest.rglob("*.msg"))
+
+
+def with_short_fat(path, dest):
+    """A copy of ``path`` whose header claims a single FAT sector, so later sectors have no entry."""
+    data = bytearray(path.read_bytes())
+    assert struct.unpack_from("<I", data, N_FAT)[0] > 1
+    struct.pack_into("<I", data, N_FAT, 1)
+    dest.write_bytes(bytes(data))
+    return dest
+
+
+def test_lean_reader_matches_extract_msg(msgs, monkeypatch):
+    lean = [read_msg_record(path, keep_content=True) for path in msgs]
+    monkeypatch.setenv("MAILCORE_MSG_BACKEND", "extract_msg")
+    assert lean == [read_msg_record(path, keep_content=True) for path in msgs]
+
+
+def test_attachment_streams_in_mini_and_regular_sectors(msgs):
+    sizes = []
+    for path in msgs:
+        with MsgFile(path) as msg:
+            for n, storage in enumerate(msg.attachments()):
+                data = msg.binary(0x3701, storage)
+                assert len(data) == msg.binary_size(0x3701, storage)
+                assert read_msg_attachment(path, f"attachment:{n}") == data
+                sizes.append((len(data), msg.cfb.mini_cutoff))
+    assert any(size < cutoff for size, cutoff in sizes) and any(size >= cutoff for size, cutoff in sizes)
+
+
+def test_chain_past_the_allocation_table_is_a_format_error(msgs, tmp_path):
+    bad = with_short_fat(msgs[-2], tmp_path / "bad.msg")
+    with MsgFile(bad) as msg:
+        largest = max(msg.attachments(), key=lambda storage: msg.binary_size(0x3701, storage))
+        with pytest.raises(MsgFormatError, match="no allocation table entry"):
+            msg.binary(0x3701, largest)
+
+
+def test_corrupt_allocation_table_falls_back_to_extract_msg(msgs, tmp_path, monkeypatch):
+    bad = with_short_fat(msgs[-2], tmp_path / "bad.msg")
+    fallback = []
+    real = msg_adapter.extract_from_msg
+    monkeypatch.setattr(msg_adapter, "extract_from_msg", lambda path, **kw: fallback.append(path) or real(path, **kw))
+    record = read_msg_record(bad)
+    assert fallback == [bad]
+    assert record["subject"] == read_msg_record(msgs[-2])["subject"]
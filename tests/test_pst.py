@@ -0,0 +1,115 @@
+import dataclasses
+import logging
+
+import pytest
+
+import mailcore.adapters.pst
+import pst_builder
+from mailcore.adapters.pst import iter_pst_messages, load_pst_mailbox, load_pst_message, pst_message_key
+from mailcore.adapters.pstfile import PstFile
+from mailcore.legacy import message_to_record
+
+
+@pytest.fixture
+def pst(tmp_path):
+    path = tmp_path / "store.pst"
+    pst_builder.build(path)
+    return path
+
+
+@pytest.mark.parametrize("crypt", [0, 1])
+def test_pstfile_reads_folders_and_messages(tmp_path, crypt):
+    path = tmp_path / "store.pst"
+    pst_builder.build(path, crypt=crypt)
+    with PstFile(path) as store:
+        folders = list(store.iter_folders())
+        assert [f.path for f in folders] == ["/", "/Inbox"]
+        nids = folders[1].message_nids
+        assert len(nids) == 3
+        messages = [store.message(nid) for nid in nids]
+        # The raw subject keeps its prefix marker; the adapter strips it.
+        assert [m.props[0x0037] for m in messages] == ["Subject 0", "\x01\x05RE: Subject 1", "Subject 2"]
+        # The attachment of message 0 spans several data blocks, the body of message 2 an XBLOCK.
+        assert store.read_attachment(messages[0].attachments[0]) == bytes(range(256)) * (20000 // 256)
+        assert messages[2].props[0x1000] == "x" * 9000
+        assert [r[0x39FE] for r in messages[0].recipients] == ["bob@example.com", "carol@example.com"]
+
+
+def test_native_messages_point_at_the_store(pst):
+    messages = list(iter_pst_messages(pst))
+    assert [m.subject for m in messages] == ["Subject 0", "RE: Subject 1", "Subject 2"]
+    for message in messages:
+        assert message.source_path == pst
+        assert message.locator.startswith("pst:")
+        record = message_to_record(message, include_content=False)
+        assert record["file"] == message.locator[len("pst:"):]
+        assert record["source_sha256"]
+
+
+def test_native_digest_ignores_where_the_store_is(tmp_path):
+    first, second = tmp_path / "a.pst", tmp_path / "b.pst"
+    pst_builder.build(first)
+    pst_builder.build(second)
+    digests = [[m.hashes[0].value for m in iter_pst_messages(p)] for p in (first, second)]
+    assert digests[0] == digests[1]
+    assert len(set(digests[0])) == 3
+
+
+def test_unreadable_message_is_reported_and_skipped(tmp_path):
+    path = tmp_path / "store.pst"
+    pst_builder.build(path, broken=(1,))
+    errors = []
+    messages = list(iter_pst_messages(path, on_error=lambda where, exc: errors.append(where)))
+    assert [m.subject for m in messages] == ["Subject 0", "Subject 2"]
+    assert len(errors) == 1 and errors[0].startswith("/Inbox/")
+
+    mailbox = load_pst_mailbox(path, on_error=lambda where, exc: errors.append(where))
+    assert len(errors) == 2
+    assert sorted(m.subject for m in mailbox.all_messages()) == ["Subject 0", "Subject 2"]
+
+
+def test_unreadable_folder_is_reported_and_skipped(tmp_path, caplog):
+    path = tmp_path / "store.pst"
+    pst_builder.build(path, lost_folder=True)
+    with caplog.at_level(logging.WARNING, logger="mailcore.adapters.pst"):
+        messages = list(iter_pst_messages(path))
+    assert len(messages) == 3
+    assert "Skipping unreadable /" in caplog.text
+
+
+def test_unreadable_folder_raises_without_callback(tmp_path):
+    path = tmp_path / "store.pst"
+    pst_builder.build(path, lost_folder=True)
+    with PstFile(path) as store, pytest.raises(Exception):
+        list(store.iter_folders())
+
+
+def test_message_key_does_not_depend_on_read_order(pst):
+    messages = list(iter_pst_messages(pst))
+    assert [pst_message_key(m) for m in messages] == [m.locator for m in messages]
+    # Messages read through readpst have no locator and are keyed by content.
+    loose = [dataclasses.replace(m, locator=None, source=f"tmp/{n}.eml") for n, m in enumerate(messages)]
+    keys = [pst_message_key(m) for m in loose]
+    assert keys == [pst_message_key(dataclasses.replace(m, source="elsewhere")) for m in loose]
+    assert len(set(keys)) == 3 and all(k.startswith("sha256:") for k in keys)
+
+
+def test_load_by_locator_walks_the_folders_once(pst, monkeypatch):
+    walks = []
+    real = PstFile.iter_folders
+    monkeypatch.setattr(PstFile, "iter_folders", lambda self, *a, **kw: walks.append(1) or real(self, *a, **kw))
+    messages = list(iter_pst_messages(pst))
+    walks.clear()
+    for message in messages:
+        loaded = load_pst_message(pst, message.locator)
+        assert (loaded.subject, loaded.source) == (message.subject, message.source)
+    assert len(walks) == 1
+    with pytest.raises(KeyError):
+        load_pst_message(pst, "pst:12345")
+
+
+def test_load_by_content_key_for_readpst_stores(pst, monkeypatch):
+    loose = [dataclasses.replace(m, locator=None) for m in iter_pst_messages(pst)]
+    monkeypatch.setattr(mailcore.adapters.pst, "_iter_readpst_messages", lambda path: iter(loose))
+    key = pst_message_key(loose[1])
+    assert load_pst_message(pst, key) is loose[1]
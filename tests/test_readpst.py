@@ -0,0 +1,86 @@
+import sys
+
+import pytest
+
+import mailcombine.extractors
+import mailcore.adapters.pst
+from mailcombine.extractors import iter_eml_paths_from_pst_streaming
+from mailcore.adapters.pst import iter_pst_messages
+
+# Stands in for readpst: writes each message slowly, in two halves, the way a large
+# message trickles out of the real one, then exits with the given code. Every file gets
+# the same mtime, as on a filesystem with coarse timestamps.
+FAKE_READPST = """\
+import os, sys, time
+from pathlib import Path
+out = Path(sys.argv[sys.argv.index("-o") + 1])
+for folder, count in [("Inbox", 11), ("Inbox/Sub", 2), ("Sent", 2)]:
+    (out / folder).mkdir(parents=True, exist_ok=True)
+    for n in range(1, count + 1):
+        path = out / folder / f"{n}.eml"
+        with open(path, "w") as f:
+            f.write(f"Subject: {folder} {n}\\n\\n")
+            f.flush()
+            os.utime(path, ns=(0, 0))
+            time.sleep(0.02)
+            f.write("END\\n")
+        os.utime(path, ns=(0, 0))
+sys.exit(EXIT_CODE)
+"""
+
+
+@pytest.fixture
+def fake_readpst(tmp_path, monkeypatch):
+    def install(exit_code=0):
+        script = tmp_path / "readpst"
+        script.write_text(f"#!{sys.executable}\n" + FAKE_READPST.replace("EXIT_CODE", str(exit_code)))
+        script.chmod(0o755)
+        monkeypatch.setattr(mailcombine.extractors, "_stage_readpst_to_temp", lambda: script)
+    return install
+
+
+def consume(tmp_path):
+    temp_root = tmp_path / "work"
+    temp_root.mkdir()
+    names = []
+    for p in iter_eml_paths_from_pst_streaming(tmp_path / "store.pst", temp_root, poll_interval=0.01):
+        # Every yielded file is complete, even though the consumer is faster than readpst.
+        assert p.read_text().endswith("END\n"), p
+        names.append(p.read_text().splitlines()[0])
+        p.unlink()
+    return names
+
+
+def test_streaming_yields_only_finished_files_in_write_order(tmp_path, fake_readpst):
+    fake_readpst()
+    assert consume(tmp_path) == (
+        [f"Subject: Inbox {n}" for n in range(1, 12)]
+        + ["Subject: Inbox/Sub 1", "Subject: Inbox/Sub 2", "Subject: Sent 1", "Subject: Sent 2"]
+    )
+
+
+def test_streaming_raises_when_readpst_fails(tmp_path, fake_readpst):
+    fake_readpst(exit_code=3)
+    with pytest.raises(RuntimeError, match=r"readpst failed \(3\)"):
+        consume(tmp_path)
+
+
+def test_unparseable_message_is_reported_and_skipped(tmp_path, fake_readpst, monkeypatch):
+    fake_readpst()
+    monkeypatch.setenv("MAILCORE_PST_BACKEND", "readpst")
+    real = mailcore.adapters.pst.extract_from_eml
+    parsed = []
+
+    def extract(path, **kwargs):
+        parsed.append(path)
+        if path.parts[-2:] == ("Inbox", "3.eml"):
+            raise ValueError("damaged")
+        return real(path, **kwargs)
+
+    monkeypatch.setattr(mailcore.adapters.pst, "extract_from_eml", extract)
+    errors = []
+    messages = list(iter_pst_messages(tmp_path / "store.pst", on_error=lambda where, exc: errors.append((where, str(exc)))))
+    assert len(messages) == 14 and "Inbox 3" not in [m.subject for m in messages]
+    assert [(where[-len("Inbox/3.eml"):], exc) for where, exc in errors] == [("Inbox/3.eml", "damaged")]
+    # The failed message's temporary file went with the rest.
+    assert len(parsed) == 15 and not any(p.exists() for p in parsed)
@@ -0,0 +1,108 @@
+import functools
+import gc
+import re
+
+import pytest
+
+import mailcombine.cli
+import pst_builder
+from mailcombine.journal import RunJournal
+from mailcore.adapters import iter_pst_messages
+from mailcore.index import SearchIndex
+
+
+class Interrupted(BaseException):
+    pass
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Checkpoint after every source so an interruption leaves something to resume.
+    monkeypatch.setattr(mailcombine.cli, "RunJournal", functools.partial(RunJournal, interval=0))
+    inp = tmp_path / "in"
+    inp.mkdir()
+    pst_builder.build(inp / "store.pst", n_messages=6)
+    return inp
+
+
+def read_in(monkeypatch, *, reverse=False, stop_after=None):
+    """Make the CLI read stores in the given order, optionally dying part way through."""
+    def fake(path, **kwargs):
+        messages = list(iter_pst_messages(path, **kwargs))
+        for n, message in enumerate(reversed(messages) if reverse else messages):
+            if n == stop_after:
+                raise Interrupted
+            yield message
+
+    monkeypatch.setattr(mailcombine.cli, "iter_pst_messages", fake)
+
+
+def subjects(out):
+    return re.findall(r"^SUBJECT: (.*)$", out.read_text(encoding="utf-8"), re.M)
+
+
+def test_resume_does_not_depend_on_read_order(store, tmp_path, monkeypatch):
+    out = tmp_path / "out.txt"
+    argv = ["-i", str(store), "-o", str(out), "--resume"]
+    read_in(monkeypatch, stop_after=3)
+    with pytest.raises(Interrupted):
+        mailcombine.cli.main(argv)
+    assert len(subjects(out)) == 3
+
+    # readpst may hand the messages over in a different order on the next run.
+    read_in(monkeypatch, reverse=True)
+    assert mailcombine.cli.main(argv) == 0
+    assert sorted(subjects(out)) == ["RE: Subject 1", "Subject 0", "Subject 2", "Subject 3", "Subject 4", "Subject 5"]
+
+
+def test_resumed_run_matches_an_uninterrupted_one(store, tmp_path, monkeypatch):
+    reference = tmp_path / "ref.txt"
+    assert mailcombine.cli.main(["-i", str(store), "-o", str(reference)]) == 0
+
+    out = tmp_path / "out.txt"
+    argv = ["-i", str(store), "-o", str(out), "--resume"]
+    read_in(monkeypatch, stop_after=2)
+    with pytest.raises(Interrupted):
+        mailcombine.cli.main(argv)
+    read_in(monkeypatch)
+    assert mailcombine.cli.main(argv) == 0
+
+    def body(path):
+        return [line for line in path.read_text(encoding="utf-8").splitlines() if not line.startswith("# Created")]
+
+    assert body(out) == body(reference)
+    assert not (tmp_path / "out.txt.journal").exists()
+
+
+def indexed(path):
+    index = SearchIndex(path, readonly=True)
+    try:
+        return index.count(), index.search("subject:subject AND 3")
+    finally:
+        index.close()
+
+
+def test_index_run_is_searchable(store, tmp_path):
+    index_path = tmp_path / "out.index.sqlite"
+    assert mailcombine.cli.main(["-i", str(store), "-o", str(tmp_path / "out.txt"), "--index", str(index_path)]) == 0
+    count, hits = indexed(index_path)
+    assert count == 6
+    assert [(hit["subject"], hit["path"]) for hit in hits] == [("Subject 3", str(store / "store.pst"))]
+    assert hits[0]["locator"].startswith("pst:")
+
+
+def test_interrupted_index_run_resumes_with_every_message(store, tmp_path, monkeypatch):
+    out = tmp_path / "out.txt"
+    index_path = tmp_path / "out.index.sqlite"
+    argv = ["-i", str(store), "-o", str(out), "--resume", "--index", str(index_path)]
+    read_in(monkeypatch, stop_after=4)
+    with pytest.raises(Interrupted):
+        mailcombine.cli.main(argv)
+    # A killed process never commits its open transaction.
+    gc.collect()
+
+    read_in(monkeypatch)
+    assert mailcombine.cli.main(argv) == 0
+    count, hits = indexed(index_path)
+    assert count == 6
+    assert [hit["subject"] for hit in hits] == ["Subject 3"]
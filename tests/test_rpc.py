@@ -0,0 +1,71 @@
+import io
+import json
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+from mailcore.service.framing import read_message
+from mailcore.service.registry import REF_SIZE
+from mailcore.service.rpc import MailcoreJsonRpcServer
+
+
+@pytest.fixture
+def emls(tmp_path):
+    paths = []
+    for n in range(5):
+        msg = EmailMessage()
+        msg["From"] = "alice@example.com"
+        msg["To"] = "bob@example.com"
+        msg["Subject"] = f"message {n}"
+        msg["Message-ID"] = f"<rpc-{n}@example.com>"
+        msg.set_content("body " * 2000)
+        path = tmp_path / f"{n}.eml"
+        path.write_bytes(bytes(msg))
+        paths.append(path)
+    return paths
+
+
+def test_export_by_handle_outlives_registry_eviction(emls, tmp_path):
+    # Room for the five references, not for a single loaded message.
+    server = MailcoreJsonRpcServer(cache_bytes=REF_SIZE * 5)
+    handles = [row["Handle"] for row in server.handle_list_summaries({"paths": [str(p) for p in emls]})["Messages"]]
+    text = tmp_path / "out.txt"
+    server.handle_export_bundle({"handles": handles, "text_path": str(text)})
+    assert text.read_text(encoding="utf-8").count("SUBJECT: message") == 5
+    # The export did not push the remaining references out.
+    assert all(h in server.registry for h in handles)
+
+
+def test_export_with_expired_handle_fails_before_writing(emls, tmp_path):
+    server = MailcoreJsonRpcServer()
+    handles = [row["Handle"] for row in server.handle_list_summaries({"paths": [str(p) for p in emls]})["Messages"]]
+    server.handle_release({"handles": handles[1:2]})
+    text = tmp_path / "out.txt"
+    with pytest.raises(ValueError, match=r"expired handle\(s\).*\(1 of 5\)"):
+        server.handle_export_bundle({"handles": handles, "text_path": str(text)})
+    assert not text.exists()
+
+
+def test_hello_reply_precedes_the_switch_to_binary_framing():
+    hello = {"jsonrpc": "2.0", "id": 1, "method": "hello", "params": {"framing": "binary"}}
+    out = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+    server = MailcoreJsonRpcServer(instream=io.TextIOWrapper(io.BytesIO(json.dumps(hello).encode() + b"\n")), outstream=out)
+    note = {"jsonrpc": "2.0", "method": "progress", "params": {"stage": "load"}}
+    real = server.handlers["hello"]
+    notifier = threading.Thread(target=server._send, args=(note,))
+
+    def hello_with_progress(params):
+        # A job reports progress after hello has been handled, before its reply is out.
+        result = real(params)
+        notifier.start()
+        notifier.join(0.2)
+        return result
+
+    server.handlers["hello"] = hello_with_progress
+    server.serve_forever()
+    notifier.join()
+    out.flush()
+    raw = io.BytesIO(out.buffer.getvalue())
+    assert json.loads(raw.readline())["result"]["framing"] == "binary"
+    assert read_message(raw) == note
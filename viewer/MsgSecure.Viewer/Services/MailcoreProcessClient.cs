@@ -85,9 +85,14 @@ namespace MsgSecure.Viewer.Services
 
         public Task ExportBundleAsync(IEnumerable<MessageDto> messages, ExportOptionsDto options)
         {
+            var messageList = messages.ToList();
+            // Messages loaded through the backend carry server-side handles; sending those
+            // avoids shipping bodies and attachment data back over the pipe.
+            bool useHandles = messageList.Count > 0 && messageList.All(m => !string.IsNullOrEmpty(m.Handle));
             var payload = new
             {
-                messages,
+                messages = useHandles ? null : messageList,
+                handles = useHandles ? messageList.Select(m => m.Handle!).ToList() : null,
                 text_path = options.TextPath,
                 source = options.SourceLabel,
                 show_attachments = options.IncludeAttachmentsInText,
@@ -149,6 +154,11 @@ namespace MsgSecure.Viewer.Services
                         : $"RPC server terminated unexpectedly: {stderr}");
                 }
                 var envelope = JsonNode.Parse(responseLine)!.AsObject();
+                if (envelope.ContainsKey("method") && !envelope.ContainsKey("id"))
+                {
+                    // Server notification (e.g. "progress"); not a response to this request.
+                    continue;
+                }
                 var responseIdNode = envelope["id"];
                 int responseId = responseIdNode is null ? -1 : responseIdNode.GetValue<int>();
                 if (envelope.TryGetPropertyValue("error", out var errorNode))
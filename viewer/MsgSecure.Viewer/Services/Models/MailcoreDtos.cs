@@ -33,6 +33,7 @@ namespace MsgSecure.Viewer.Services.Models
     public class MessageDto
     {
         public string Id { get; set; } = string.Empty;
+        public string? Handle { get; set; }
         public string Source { get; set; } = string.Empty;
         public string? SourcePath { get; set; }
         public string Subject { get; set; } = string.Empty;